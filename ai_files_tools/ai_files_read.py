@@ -12,6 +12,8 @@ except ImportError:
 import sys
 import string
 
+from ai_files_tools.ai_files_index import get_index_for
+
 def get_drives():
     """获取系统中所有可用的盘符（Windows）"""
     drives = []
@@ -307,8 +309,7 @@ def resolve_desktop_entry_path_by_name(name):
 
 def find_in_desktop_tree(name, extensions=None):
     """保留用于桌面递归查找"""
-    # 逻辑同原版，不再赘述，但可以考虑复用 search 模块的逻辑
-    # 为了保持最小改动，暂时保留原实现逻辑
+    # 与 search 模块共用文件名索引，匹配规则同原版
     if not name:
         return None
     desktop_path = resolve_desktop_path()
@@ -329,16 +330,25 @@ def find_in_desktop_tree(name, extensions=None):
         else:
             normalized_extensions = {str(extensions).lower()}
 
+    def matches(file_lower):
+        if normalized_extensions and os.path.splitext(file_lower)[1] not in normalized_extensions:
+            return False
+        file_compact = file_lower.replace(" ", "")
+        return (file_lower == target_lower or
+                os.path.splitext(file_lower)[0] == os.path.splitext(target_lower)[0] or
+                file_compact == target_compact)
+
+    # 优先查询文件名索引（浅层优先），索引未就绪时回退到遍历
+    index = get_index_for(desktop_path, default_roots=[desktop_path])
+    if index is not None:
+        for path in index.find(lambda lower_name, is_dir: not is_dir and matches(lower_name)):
+            if os.path.isfile(path):
+                return path
+        return None
+
     for root, dirs, files in os.walk(desktop_path):
         # 简化匹配逻辑...
         for filename in files:
-            file_lower = filename.lower()
-            if normalized_extensions and os.path.splitext(file_lower)[1] not in normalized_extensions:
-                continue
-            
-            file_compact = file_lower.replace(" ", "")
-            if (file_lower == target_lower or 
-                os.path.splitext(file_lower)[0] == os.path.splitext(target_lower)[0] or
-                file_compact == target_compact):
+            if matches(filename.lower()):
                 return os.path.join(root, filename)
     return None
@@ -0,0 +1,314 @@
+"""
+监控记录存储（网页监控与软件监控共用）。
+模块职责：
+1) 已结束的记录按开始日期追加到每日分段 konwledge_store/YYYY-MM-DD.jsonl，写入后不再修改。
+2) 仍在进行中的记录单独保存在 konwledge_store/open.json，只有它会被整体重写，大小与打开的窗口数相关而与历史总量无关。
+3) 压缩任务把早于本月的每日分段合并为月分段 YYYY-MM.jsonl，并按记录 id 去重（进程中断可能造成重复追加）。
+4) 读取时按分段文件签名缓存已解析的内容，只重新读取发生变化的分段。
+5) 首次使用时把旧版 konwledge.json（整段 JSON 列表）迁移为分段存储，原文件改名保留。
+清空通过 epoch 文件通知监控进程重置内存中的打开记录。
+"""
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+STORE_DIR_NAME = "konwledge_store"
+LEGACY_FILE_NAME = "konwledge.json"
+LEGACY_MIGRATED_SUFFIX = ".migrated"
+OPEN_FILE_NAME = "open.json"
+EPOCH_FILE_NAME = "epoch"
+SEGMENT_SUFFIX = ".jsonl"
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _segment_key(record: Dict[str, Any]) -> str:
+    """
+    记录所属的每日分段名（按开始日期），开始时间缺失时归入当天。
+    """
+    start = str(record.get("start_time") or "")[:10]
+    try:
+        datetime.strptime(start, "%Y-%m-%d")
+    except ValueError:
+        start = datetime.now().strftime("%Y-%m-%d")
+    return start
+
+
+def _read_jsonl(path: str) -> List[Dict[str, Any]]:
+    records = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict):
+                    records.append(record)
+    except OSError:
+        return []
+    return records
+
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def new_record_id() -> str:
+    return uuid.uuid4().hex
+
+
+class MonitorStore:
+    """
+    单个监控数据目录（web_konwledge 或 soft_konwledge）的记录存储，线程安全。
+    """
+
+    def __init__(self, data_dir: str) -> None:
+        self.data_dir = data_dir
+        self.store_dir = os.path.join(data_dir, STORE_DIR_NAME)
+        self.legacy_file = os.path.join(data_dir, LEGACY_FILE_NAME)
+        self.open_file = os.path.join(self.store_dir, OPEN_FILE_NAME)
+        self.epoch_file = os.path.join(self.store_dir, EPOCH_FILE_NAME)
+        self._lock = threading.RLock()
+        # 分段名 -> (文件签名, 记录列表)
+        self._segments: Dict[str, Tuple[Tuple[int, int], List[Dict[str, Any]]]] = {}
+        self._open_text: Optional[str] = None
+        self._migrated = False
+
+    def load_all(self) -> List[Dict[str, Any]]:
+        """
+        返回全部记录：已结束的记录按分段顺序在前，进行中的记录在后；同一 id 只保留一份。
+        """
+        with self._lock:
+            self._migrate_legacy()
+            records = []
+            seen = set()
+            for name in self._segment_names():
+                for record in self._load_segment(name):
+                    record_id = record.get("id")
+                    if record_id:
+                        if record_id in seen:
+                            continue
+                        seen.add(record_id)
+                    records.append(record)
+            for record in self._read_open():
+                if record.get("id") not in seen:
+                    records.append(record)
+            return records
+
+    def signature(self) -> Tuple:
+        """
+        存储内容的签名（各文件名、修改时间与大小），调用方可据此判断缓存是否失效。
+        """
+        entries = []
+        try:
+            with os.scandir(self.store_dir) as items:
+                for item in items:
+                    if item.name.endswith(SEGMENT_SUFFIX) or item.name in (OPEN_FILE_NAME, EPOCH_FILE_NAME):
+                        try:
+                            stat = item.stat()
+                        except OSError:
+                            continue
+                        entries.append((item.name, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            pass
+        entries.sort()
+        return (_file_signature(self.legacy_file), tuple(entries))
+
+    def append_closed(self, records: Iterable[Dict[str, Any]]) -> None:
+        """
+        把已结束的记录追加到各自的每日分段（仅追加，不改写已有内容）。
+        """
+        grouped: Dict[str, List[str]] = {}
+        for record in records:
+            grouped.setdefault(_segment_key(record), []).append(json.dumps(record, ensure_ascii=False) + "\n")
+        if not grouped:
+            return
+        with self._lock:
+            os.makedirs(self.store_dir, exist_ok=True)
+            for name, lines in grouped.items():
+                with open(os.path.join(self.store_dir, name + SEGMENT_SUFFIX), "a", encoding="utf-8") as f:
+                    f.writelines(lines)
+
+    def save_open(self, records: Iterable[Dict[str, Any]]) -> bool:
+        """
+        保存当前进行中的记录，内容与上次写入相同时不写盘。返回是否写入。
+        """
+        text = json.dumps(list(records), ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if text == self._open_text and os.path.exists(self.open_file):
+                return False
+            os.makedirs(self.store_dir, exist_ok=True)
+            _write_atomic(self.open_file, text)
+            self._open_text = text
+            return True
+
+    def recover_open(self) -> int:
+        """
+        监控进程启动时调用：上次未正常结束的进行中记录按其最后状态归档，返回归档条数。
+        """
+        with self._lock:
+            self._migrate_legacy()
+            leftovers = self._read_open()
+            if not leftovers:
+                return 0
+            pending = []
+            for record in leftovers:
+                # 进程在追加与重写 open.json 之间中断时，记录可能已经归档
+                archived_ids = {item.get("id") for item in self._load_segment(_segment_key(record))}
+                if not record.get("id") or record.get("id") not in archived_ids:
+                    pending.append(record)
+            self.append_closed(pending)
+            self.save_open([])
+            return len(pending)
+
+    def clear(self) -> None:
+        """
+        清空全部记录（含旧版文件），并更新 epoch 通知监控进程丢弃内存中的打开记录。
+        """
+        with self._lock:
+            for name in self._segment_names():
+                try:
+                    os.remove(os.path.join(self.store_dir, name + SEGMENT_SUFFIX))
+                except OSError:
+                    pass
+            self._segments.clear()
+            self._migrated = True
+            for path in (self.open_file, self.legacy_file):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._open_text = None
+            os.makedirs(self.store_dir, exist_ok=True)
+            _write_atomic(self.epoch_file, str(self.epoch() + 1))
+
+    def epoch(self) -> int:
+        """
+        清空次数计数；监控进程发现其变化时应重置内存状态。
+        """
+        try:
+            with open(self.epoch_file, "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def compact(self, today: Optional[datetime] = None) -> int:
+        """
+        把早于本月的每日分段合并为月分段（去重并按开始时间排序），返回合并的分段数。
+        """
+        current_month = (today or datetime.now()).strftime("%Y-%m")
+        with self._lock:
+            by_month: Dict[str, List[str]] = {}
+            for name in self._segment_names():
+                if len(name) == 10 and name[:7] < current_month:
+                    by_month.setdefault(name[:7], []).append(name)
+            merged = 0
+            for month, names in by_month.items():
+                month_path = os.path.join(self.store_dir, month + SEGMENT_SUFFIX)
+                records = _read_jsonl(month_path)
+                for name in names:
+                    records.extend(_read_jsonl(os.path.join(self.store_dir, name + SEGMENT_SUFFIX)))
+                unique = []
+                seen = set()
+                for record in records:
+                    record_id = record.get("id")
+                    if record_id and record_id in seen:
+                        continue
+                    seen.add(record_id)
+                    unique.append(record)
+                unique.sort(key=lambda item: str(item.get("start_time") or ""))
+                _write_atomic(month_path, "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in unique))
+                for name in names:
+                    try:
+                        os.remove(os.path.join(self.store_dir, name + SEGMENT_SUFFIX))
+                    except OSError:
+                        pass
+                    self._segments.pop(name, None)
+                merged += len(names)
+            return merged
+
+    def _segment_names(self) -> List[str]:
+        try:
+            names = [name[:-len(SEGMENT_SUFFIX)] for name in os.listdir(self.store_dir) if name.endswith(SEGMENT_SUFFIX)]
+        except OSError:
+            return []
+        return sorted(names)
+
+    def _load_segment(self, name: str) -> List[Dict[str, Any]]:
+        path = os.path.join(self.store_dir, name + SEGMENT_SUFFIX)
+        signature = _file_signature(path)
+        if signature is None:
+            self._segments.pop(name, None)
+            return []
+        cached = self._segments.get(name)
+        if cached and cached[0] == signature:
+            return cached[1]
+        records = _read_jsonl(path)
+        self._segments[name] = (signature, records)
+        return records
+
+    def _read_open(self) -> List[Dict[str, Any]]:
+        try:
+            with open(self.open_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return []
+        return [item for item in data if isinstance(item, dict)] if isinstance(data, list) else []
+
+    def _migrate_legacy(self) -> None:
+        if self._migrated:
+            return
+        self._migrated = True
+        if not os.path.exists(self.legacy_file):
+            return
+        try:
+            with open(self.legacy_file, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+            data = json.loads(content) if content else []
+        except (OSError, ValueError):
+            return
+        records = []
+        for record in data if isinstance(data, list) else []:
+            if isinstance(record, dict):
+                record = dict(record)
+                record.setdefault("id", new_record_id())
+                records.append(record)
+        self.append_closed(records)
+        try:
+            os.replace(self.legacy_file, self.legacy_file + LEGACY_MIGRATED_SUFFIX)
+        except OSError as e:
+            print(f"旧版监控数据改名失败：{e}")
+        self.compact()
+
+
+_stores: Dict[str, MonitorStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_monitor_store(data_dir: str) -> MonitorStore:
+    """
+    获取数据目录对应的共享存储实例。
+    """
+    key = os.path.normcase(os.path.abspath(data_dir))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = MonitorStore(data_dir)
+            _stores[key] = store
+        return store
@@ -18,6 +18,14 @@ CONFIG_FILE = os.path.join(DATA_DIR, "monitor_config.json")
 CHECK_INTERVAL = 2
 SAVE_INTERVAL = 10
 
+project_root = os.path.dirname(os.path.dirname(DATA_DIR))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from ai_konwledge.monitor_store import get_monitor_store, new_record_id
+
+store = get_monitor_store(DATA_DIR)
+
 _process_cache = {}
 
 
@@ -33,23 +41,22 @@ def is_monitoring_enabled():
 
 
 def load_data():
-    if not os.path.exists(DATA_FILE):
-        return []
     try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            content = f.read().strip()
-            if not content:
-                return []
-            return json.loads(content)
-    except (json.JSONDecodeError, IOError):
+        return store.load_all()
+    except Exception:
         return []
 
 
 def save_data(data):
     try:
-        os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        store.save_open(data)
+    except Exception:
+        pass
+
+
+def archive_records(records):
+    try:
+        store.append_closed(records)
     except Exception:
         pass
 
@@ -159,6 +166,7 @@ def get_all_app_windows_info():
 
 def build_record(info, current_time):
     return {
+        "id": new_record_id(),
         "title": info.get("title", ""),
         "app_name": info.get("app_name", ""),
         "process_name": info.get("process_name", ""),
@@ -215,31 +223,30 @@ def main():
         return
 
     print(f"开始监控软件使用... (检查间隔: {CHECK_INTERVAL}s)")
-    print(f"数据文件路径: {DATA_FILE}")
-    current_data = load_data()
+    print(f"数据目录: {store.store_dir}")
+    store.recover_open()
+    store.compact()
+    compact_date = datetime.now().date()
     open_records = {}
     state_cache = {}
     last_save_time = time.time()
-    last_data_mtime = os.path.getmtime(DATA_FILE) if os.path.exists(DATA_FILE) else None
+    last_epoch = store.epoch()
     try:
         while True:
             if not is_monitoring_enabled():
                 current_time = datetime.now()
                 for key, record in list(open_records.items()):
                     close_record(record, current_time, state_cache, key)
+                archive_records(list(open_records.values()))
                 open_records.clear()
-                save_data(current_data)
+                save_data([])
                 time.sleep(CHECK_INTERVAL)
                 continue
-            if os.path.exists(DATA_FILE):
-                current_mtime = os.path.getmtime(DATA_FILE)
-                if last_data_mtime is None or current_mtime > last_data_mtime:
-                    disk_data = load_data()
-                    if not disk_data:
-                        current_data = []
-                        open_records = {}
-                        state_cache = {}
-                    last_data_mtime = current_mtime
+            epoch = store.epoch()
+            if epoch != last_epoch:
+                open_records = {}
+                state_cache = {}
+                last_epoch = epoch
             info = get_active_app_info()
             windows_info = get_all_app_windows_info()
             current_time = datetime.now()
@@ -249,30 +256,34 @@ def main():
                 if key and key not in windows_map:
                     windows_map[key] = item
             current_keys = set(windows_map.keys())
+            closed = []
             for key in list(open_records.keys()):
                 if key not in current_keys:
                     close_record(open_records[key], current_time, state_cache, key)
-                    open_records.pop(key, None)
+                    closed.append(open_records.pop(key))
             for key in current_keys:
                 if key not in open_records:
-                    record = build_record(windows_map[key], current_time)
-                    open_records[key] = record
-                    current_data.append(record)
+                    open_records[key] = build_record(windows_map[key], current_time)
             front_key = _build_key(info) if info else None
             for key, record in open_records.items():
                 new_state = "front" if key == front_key else "background"
                 update_record_state(record, current_time, new_state, state_cache, key)
-            if time.time() - last_save_time > SAVE_INTERVAL:
-                if current_data:
-                    save_data(current_data)
-                    last_save_time = time.time()
+            if closed:
+                archive_records(closed)
+            if closed or time.time() - last_save_time > SAVE_INTERVAL:
+                save_data(list(open_records.values()))
+                last_save_time = time.time()
+            if current_time.date() != compact_date:
+                store.compact()
+                compact_date = current_time.date()
             time.sleep(CHECK_INTERVAL)
     except KeyboardInterrupt:
         print("\n停止监控。")
         current_time = datetime.now()
         for key, record in list(open_records.items()):
             close_record(record, current_time, state_cache, key)
-        save_data(current_data)
+        archive_records(list(open_records.values()))
+        save_data([])
         print("数据已保存。")
 
 
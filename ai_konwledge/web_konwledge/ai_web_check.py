@@ -1,19 +1,33 @@
 import os
 import json
+import sys
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
 DATA_DIR = os.path.dirname(os.path.abspath(__file__))
 KONWLEDGE_FILE = os.path.join(DATA_DIR, "konwledge.json")
+project_root = os.path.dirname(os.path.dirname(DATA_DIR))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+try:
+    from ai_konwledge.monitor_store import get_monitor_store
+except ImportError:
+    get_monitor_store = None
 
 # 缓存索引，避免频繁读取与重复解析
 _CACHE = {
-    "mtime": None,
+    "signature": None,
     "indexed_records": []
 }
 
 
 def _load_history() -> List[Dict[str, Any]]:
+    if get_monitor_store is not None:
+        try:
+            return get_monitor_store(DATA_DIR).load_all()
+        except Exception:
+            return []
     if not os.path.exists(KONWLEDGE_FILE):
         return []
     try:
@@ -55,16 +69,19 @@ def _build_indexed_records(records: List[Dict[str, Any]]) -> List[Dict[str, Any]
 
 def _get_indexed_records() -> List[Dict[str, Any]]:
     """
-    获取索引化记录，文件变更时自动重建索引。
+    获取索引化记录，存储内容变更时自动重建索引。
     """
     try:
-        mtime = os.path.getmtime(KONWLEDGE_FILE) if os.path.exists(KONWLEDGE_FILE) else None
+        if get_monitor_store is not None:
+            signature = get_monitor_store(DATA_DIR).signature()
+        else:
+            signature = os.path.getmtime(KONWLEDGE_FILE) if os.path.exists(KONWLEDGE_FILE) else None
     except Exception:
-        mtime = None
-    if _CACHE["mtime"] != mtime:
+        signature = None
+    if _CACHE["signature"] != signature:
         records = _load_history()
         _CACHE["indexed_records"] = _build_indexed_records(records)
-        _CACHE["mtime"] = mtime
+        _CACHE["signature"] = signature
     return _CACHE["indexed_records"]
 
 
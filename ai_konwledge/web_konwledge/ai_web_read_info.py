@@ -1,10 +1,19 @@
 import os
 import json
+import sys
 from datetime import datetime
 from typing import List, Dict, Any
 
 DATA_DIR = os.path.dirname(os.path.abspath(__file__))
 KONWLEDGE_FILE = os.path.join(DATA_DIR, "konwledge.json")
+project_root = os.path.dirname(os.path.dirname(DATA_DIR))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+try:
+    from ai_konwledge.monitor_store import get_monitor_store
+except ImportError:
+    get_monitor_store = None
 FAVORITES_FILE = os.path.join(DATA_DIR, "favorites.json")
 
 
@@ -24,6 +33,15 @@ def _load_json_list(path: str) -> List[Dict[str, Any]]:
     return []
 
 
+def _load_records() -> List[Dict[str, Any]]:
+    if get_monitor_store is None:
+        return _load_json_list(KONWLEDGE_FILE)
+    try:
+        return get_monitor_store(DATA_DIR).load_all()
+    except Exception:
+        return []
+
+
 def _parse_time(value: str) -> datetime | None:
     if not value:
         return None
@@ -34,7 +52,7 @@ def _parse_time(value: str) -> datetime | None:
 
 
 def read_web_info(limit: int = 0, date: str = "", include_favorites: bool = True) -> Dict[str, Any]:
-    records = _load_json_list(KONWLEDGE_FILE)
+    records = _load_records()
     if date:
         filtered = []
         for item in records:
@@ -19,6 +19,14 @@ CONFIG_FILE = os.path.join(DATA_DIR, "monitor_config.json")
 CHECK_INTERVAL = 2  # 检查间隔（秒）
 SAVE_INTERVAL = 10   # 自动保存间隔（秒）
 
+project_root = os.path.dirname(os.path.dirname(DATA_DIR))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from ai_konwledge.monitor_store import get_monitor_store, new_record_id
+
+store = get_monitor_store(DATA_DIR)
+
 def is_monitoring_enabled():
     """检查监控开关状态"""
     if not os.path.exists(CONFIG_FILE):
@@ -31,25 +39,24 @@ def is_monitoring_enabled():
         return True
 
 def load_data():
-    """加载现有知识库数据"""
-    if not os.path.exists(DATA_FILE):
-        return []
+    """加载现有知识库数据（已结束的记录与进行中的记录）"""
     try:
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            if not content:
-                return []
-            return json.loads(content)
-    except (json.JSONDecodeError, IOError):
+        return store.load_all()
+    except Exception as e:
+        print(f"读取数据失败: {e}")
         return []
 
 def save_data(data):
-    """保存数据到知识库"""
+    """保存进行中的记录；内容未变化时不写盘"""
+    try:
+        store.save_open(data)
+    except IOError as e:
+        print(f"保存数据失败: {e}")
+
+def archive_records(records):
+    """已结束的记录追加到当天的分段"""
     try:
-        # 确保目录存在
-        os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        store.append_closed(records)
     except IOError as e:
         print(f"保存数据失败: {e}")
 
@@ -189,6 +196,7 @@ def get_all_browser_windows_info():
 
 def build_record(info, current_time):
     return {
+        "id": new_record_id(),
         "url": info["url"],
         "title": info["title"],
         "browser_type": info["browser_type"],
@@ -233,19 +241,19 @@ def main():
         return
 
     print(f"开始运行网页监控系统...")
-    print(f"数据文件路径: {DATA_FILE}")
-    
-    current_data = load_data()
+    print(f"数据目录: {store.store_dir}")
+
+    # 上次退出时未结束的记录按最后保存的状态归档，再合并过去月份的每日分段
+    recovered = store.recover_open()
+    if recovered:
+        print(f"已归档上次未结束的记录 {recovered} 条。")
+    store.compact()
+    compact_date = datetime.now().date()
+
     open_records = {}
     state_cache = {}
     last_save_time = time.time()
-    last_data_mtime = os.path.getmtime(DATA_FILE) if os.path.exists(DATA_FILE) else None
-    
-    # 如果已有数据，尝试恢复上下文（可选，这里简单起见重新开始或接续）
-    if current_data:
-        # 检查最后一条是否是未完成的会话（例如没有 end_time 或 duration）
-        # 这里假设 konwledge.json 记录的是已完成的片段或包含持续时间
-        pass
+    last_epoch = store.epoch()
 
     try:
         while True:
@@ -253,20 +261,18 @@ def main():
                 current_time = datetime.now()
                 for url, record in list(open_records.items()):
                     close_record(record, current_time, state_cache, url)
+                archive_records(list(open_records.values()))
                 open_records.clear()
-                save_data(current_data)
+                save_data([])
                 time.sleep(CHECK_INTERVAL)
                 continue
 
-            if os.path.exists(DATA_FILE):
-                current_mtime = os.path.getmtime(DATA_FILE)
-                if last_data_mtime is None or current_mtime > last_data_mtime:
-                    disk_data = load_data()
-                    if not disk_data:
-                        current_data = []
-                        open_records = {}
-                        state_cache = {}
-                    last_data_mtime = current_mtime
+            # 知识库被清空时丢弃内存中的进行中记录
+            epoch = store.epoch()
+            if epoch != last_epoch:
+                open_records = {}
+                state_cache = {}
+                last_epoch = epoch
 
             info = get_active_browser_info()
             windows_info = get_all_browser_windows_info()
@@ -278,28 +284,32 @@ def main():
                     windows_map[url] = item
             current_urls = set(windows_map.keys())
 
+            closed = []
             for url in list(open_records.keys()):
                 if url not in current_urls:
                     close_record(open_records[url], current_time, state_cache, url)
-                    open_records.pop(url, None)
+                    closed.append(open_records.pop(url))
 
             for url in current_urls:
                 if url not in open_records:
-                    record = build_record(windows_map[url], current_time)
-                    open_records[url] = record
-                    current_data.append(record)
+                    open_records[url] = build_record(windows_map[url], current_time)
 
             front_url = info.get("url") if info else None
             for url, record in open_records.items():
                 new_state = "front" if url == front_url else "background"
                 update_record_state(record, current_time, new_state, state_cache, url)
-            
-            # 定时保存
-            if time.time() - last_save_time > SAVE_INTERVAL:
-                if current_data:
-                    save_data(current_data)
-                    last_save_time = time.time()
-            
+
+            # 关闭的记录立即追加归档；进行中的记录定时保存
+            if closed:
+                archive_records(closed)
+            if closed or time.time() - last_save_time > SAVE_INTERVAL:
+                save_data(list(open_records.values()))
+                last_save_time = time.time()
+
+            if current_time.date() != compact_date:
+                store.compact()
+                compact_date = current_time.date()
+
             time.sleep(CHECK_INTERVAL)
 
     except KeyboardInterrupt:
@@ -307,7 +317,8 @@ def main():
         current_time = datetime.now()
         for url, record in list(open_records.items()):
             close_record(record, current_time, state_cache, url)
-        save_data(current_data)
+        archive_records(list(open_records.values()))
+        save_data([])
         print("数据已保存。")
 
 if __name__ == "__main__":
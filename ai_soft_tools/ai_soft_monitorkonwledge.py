@@ -1,19 +1,40 @@
 import json
 import os
+import sys
 from datetime import datetime
 from typing import Dict, Any, List
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_FILE = os.path.join(BASE_DIR, "ai_konwledge", "soft_konwledge", "konwledge.json")
-CONFIG_FILE = os.path.join(BASE_DIR, "ai_konwledge", "soft_konwledge", "monitor_config.json")
+DATA_DIR = os.path.join(BASE_DIR, "ai_konwledge", "soft_konwledge")
+DATA_FILE = os.path.join(DATA_DIR, "konwledge.json")
+CONFIG_FILE = os.path.join(DATA_DIR, "monitor_config.json")
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+try:
+    from ai_konwledge.monitor_store import get_monitor_store
+except ImportError:
+    # 服务端没有监控存储模块，退回读取旧版单文件
+    get_monitor_store = None
 
 # 缓存索引，提升检索完整性与性能
 _CACHE = {
-    "mtime": None,
+    "signature": None,
     "indexed_records": []
 }
 
+
+def _get_store():
+    return get_monitor_store(DATA_DIR) if get_monitor_store else None
+
+
 def load_knowledge() -> List[Dict[str, Any]]:
+    store = _get_store()
+    if store is not None:
+        try:
+            return store.load_all()
+        except Exception:
+            return []
     if not os.path.exists(DATA_FILE):
         return []
     try:
@@ -56,16 +77,20 @@ def _build_indexed_records(records: List[Dict[str, Any]]) -> List[Dict[str, Any]
 
 def _get_indexed_records() -> List[Dict[str, Any]]:
     """
-    获取索引化记录，文件变更时自动重建。
+    获取索引化记录，存储内容变更时自动重建。
     """
+    store = _get_store()
     try:
-        mtime = os.path.getmtime(DATA_FILE) if os.path.exists(DATA_FILE) else None
+        if store is not None:
+            signature = store.signature()
+        else:
+            signature = os.path.getmtime(DATA_FILE) if os.path.exists(DATA_FILE) else None
     except Exception:
-        mtime = None
-    if _CACHE["mtime"] != mtime:
+        signature = None
+    if _CACHE["signature"] != signature:
         records = load_knowledge()
         _CACHE["indexed_records"] = _build_indexed_records(records)
-        _CACHE["mtime"] = mtime
+        _CACHE["signature"] = signature
     return _CACHE["indexed_records"]
 
 
@@ -144,9 +169,13 @@ def query_soft_knowledge(query_type: str = "recent", limit: int = 0, keyword: st
 
 def clear_soft_knowledge() -> Dict[str, Any]:
     try:
-        os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump([], f, ensure_ascii=False)
+        store = _get_store()
+        if store is not None:
+            store.clear()
+        else:
+            os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
+            with open(DATA_FILE, "w", encoding="utf-8") as f:
+                json.dump([], f, ensure_ascii=False)
         return {"message": "知识库已成功清空。"}
     except Exception as e:
         return {"error": f"清空知识库失败: {str(e)}"}
@@ -12,6 +12,11 @@ try:
 except Exception:
     get_default_sequence_name = None
 
+from ani.pet_state_bus import get_pet_state_bus
+
+# 状态更新来源标识，动画窗口据此区分指令来源
+STATE_SOURCE = "pet_control"
+
 
 def _get_registry_path() -> str:
     return os.path.join(project_root, "ani", "ani_test", "animation_registry.json")
@@ -35,30 +40,8 @@ def _get_sequences() -> list:
     return list(sequences.keys()) if isinstance(sequences, dict) else []
 
 
-def _get_state_path() -> str:
-    return os.path.join(project_root, "ani", "animation_state.json")
-
-
 def _load_state() -> dict:
-    path = _get_state_path()
-    if not os.path.exists(path):
-        return {}
-    try:
-        with open(path, "r", encoding="utf-8") as file:
-            data = json.load(file)
-        return data if isinstance(data, dict) else {}
-    except Exception:
-        return {}
-
-
-def _save_state(data: dict) -> None:
-    path = _get_state_path()
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    try:
-        with open(path, "w", encoding="utf-8") as file:
-            json.dump(data, file, ensure_ascii=False, separators=(",", ":"))
-    except Exception:
-        return None
+    return get_pet_state_bus().get_state()
 
 
 def _normalize_play_mode(value: str) -> str:
@@ -99,14 +82,16 @@ def set_pet_animation(sequence_name: str, play_mode: str = "manual",
             "message": "动画名称不存在",
             "available_sequences": available_sequences
         }
-    state = _load_state()
-    state["current_sequence"] = sequence_name
-    state["play_mode"] = _normalize_play_mode(play_mode)
+    delta = {
+        "current_sequence": sequence_name,
+        "play_mode": _normalize_play_mode(play_mode)
+    }
     if isinstance(random_weights, dict) and random_weights:
-        state["random_weights"] = random_weights
+        delta["random_weights"] = random_weights
     if isinstance(random_interval, dict) and random_interval:
-        state["random_interval"] = random_interval
-    _save_state(state)
+        delta["random_interval"] = random_interval
+    # 通过状态总线即时推送给动画窗口，快照文件由总线负责写入
+    state = get_pet_state_bus().update(delta, source=STATE_SOURCE)
     return {
         "success": True,
         "current_sequence": sequence_name,
@@ -12,10 +12,12 @@ if project_root not in sys.path:
 
 try:
     from history_data.history_data import load_history, save_history
+    from history_data.task_store import get_task_store
 except ImportError as e:
     print(f"警告：ai_task_manager 无法导入 history_data：{e}")
     def load_history(): return []
     def save_history(data): pass
+    def get_task_store(): raise RuntimeError("任务存储不可用")
 
 def _generate_id():
     """生成唯一的任务ID。"""
@@ -31,29 +33,32 @@ def _normalize_date(value):
             return None
     return None
 
+def _new_task(content, scheduled_date, now):
+    return {
+        "id": _generate_id(),
+        "content": content,
+        "status": "pending",
+        "created_at": now,
+        "last_updated": now,
+        "scheduled_date": scheduled_date,
+        "children": []
+    }
+
+def _task_date_matches(task, target_str):
+    task_date = task.get('scheduled_date') or target_str
+    return task_date == target_str
+
 def get_task_list(filter_status=None):
     """
     获取任务列表。
     参数：
         filter_status (str, optional): 'pending'、'completed' 或 'all'。
     """
-    tasks = load_history()
-    # 确保每个任务都有 ID，如果没有则生成并保存
-    modified = False
-    for t in tasks:
-        if 'id' not in t:
-            t['id'] = _generate_id()
-            modified = True
-        if 'children' not in t:
-            t['children'] = []
-            modified = True
-        if 'scheduled_date' not in t or not t.get('scheduled_date'):
-            t['scheduled_date'] = datetime.date.today().isoformat()
-            modified = True
-            
-    if modified:
-        save_history(tasks)
-        
+    store = get_task_store()
+    # 为缺少日期的任务补齐当天日期（ID 与 children 由存储层保证）
+    store.fill_missing_dates(datetime.date.today().isoformat())
+    tasks = store.load_tree()
+
     if filter_status and filter_status != 'all':
         return [t for t in tasks if t.get('status') == filter_status]
     return tasks
@@ -65,46 +70,7 @@ def add_task(content, parent_id=None):
         content (str): 任务内容
         parent_id (str, optional): 父任务ID，提供则添加为子任务。
     """
-    tasks = load_history()
-    now = datetime.datetime.now().isoformat()
-    new_task = {
-        "id": _generate_id(),
-        "content": content,
-        "status": "pending",
-        "created_at": now,
-        "last_updated": now,
-        "scheduled_date": datetime.date.today().isoformat(),
-        "children": []
-    }
-    
-    if parent_id:
-        # 查找父任务并添加
-        parent_found = False
-        
-        # 递归查找父任务的辅助函数
-        def find_and_add(task_list):
-            nonlocal parent_found
-            for t in task_list:
-                if t.get('id') == parent_id:
-                    if 'children' not in t:
-                        t['children'] = []
-                    t['children'].append(new_task)
-                    parent_found = True
-                    return True
-                # 递归查找子任务
-                if 'children' in t and find_and_add(t['children']):
-                    return True
-            return False
-
-        find_and_add(tasks)
-        
-        if not parent_found:
-            return {"status": "error", "message": f"未找到父任务 ID：{parent_id}"}
-    else:
-        tasks.append(new_task)
-        
-    save_history(tasks)
-    return {"status": "success", "message": "任务已添加。", "task": new_task}
+    return add_task_by_date(content, datetime.date.today(), parent_id=parent_id)
 
 def update_task(task_id, content=None, status=None):
     """
@@ -114,28 +80,19 @@ def update_task(task_id, content=None, status=None):
         content (str, optional): 新内容
         status (str, optional): 新状态（'pending' 或 'completed'）
     """
-    tasks = load_history()
-    task_found = None
+    store = get_task_store()
     now = datetime.datetime.now().isoformat()
+    fields = {"last_updated": now}
+    if content is not None:
+        fields['content'] = content
+    if status is not None:
+        fields['status'] = status
+
+    with store.transaction() as conn:
+        updated = store.update_task(conn, task_id, fields)
 
-    def find_and_update(task_list):
-        nonlocal task_found
-        for t in task_list:
-            if t.get('id') == task_id:
-                if content is not None:
-                    t['content'] = content
-                if status is not None:
-                    t['status'] = status
-                t['last_updated'] = now
-                task_found = t
-                return True
-            if 'children' in t and find_and_update(t['children']):
-                return True
-        return False
-
-    if find_and_update(tasks):
-        save_history(tasks)
-        return {"status": "success", "message": "任务已更新。", "task": task_found}
+    if updated is not None:
+        return {"status": "success", "message": "任务已更新。", "task": store.get_task(task_id)}
     else:
         return {"status": "error", "message": f"未找到任务 ID：{task_id}"}
 
@@ -145,177 +102,99 @@ def delete_task(task_id):
     参数：
         task_id (str): 任务ID
     """
-    tasks = load_history()
-    deleted = False
-
-    def find_and_delete(task_list):
-        nonlocal deleted
-        for i, t in enumerate(task_list):
-            if t.get('id') == task_id:
-                del task_list[i]
-                deleted = True
-                return True
-            if 'children' in t and find_and_delete(t['children']):
-                return True
-        return False
-
-    if find_and_delete(tasks):
-        save_history(tasks)
+    store = get_task_store()
+    with store.transaction() as conn:
+        deleted = store.delete_task(conn, task_id)
+
+    if deleted:
         return {"status": "success", "message": "任务已删除。"}
     else:
         return {"status": "error", "message": f"未找到任务 ID：{task_id}"}
 
 def add_task_by_date(content, scheduled_date, parent_id=None):
-    tasks = load_history()
+    store = get_task_store()
     now = datetime.datetime.now().isoformat()
     target_date = _normalize_date(scheduled_date) or datetime.date.today()
-    new_task = {
-        "id": _generate_id(),
-        "content": content,
-        "status": "pending",
-        "created_at": now,
-        "last_updated": now,
-        "scheduled_date": target_date.isoformat(),
-        "children": []
-    }
+    new_task = _new_task(content, target_date.isoformat(), now)
 
-    if parent_id:
-        parent_found = False
-
-        def find_and_add(task_list):
-            nonlocal parent_found
-            for t in task_list:
-                if t.get('id') == parent_id:
-                    if 'children' not in t:
-                        t['children'] = []
-                    t['children'].append(new_task)
-                    parent_found = True
-                    return True
-                if 'children' in t and find_and_add(t['children']):
-                    return True
-            return False
-
-        find_and_add(tasks)
-
-        if not parent_found:
+    with store.transaction() as conn:
+        if parent_id and not store.exists(conn, parent_id):
             return {"status": "error", "message": f"未找到父任务 ID：{parent_id}"}
-    else:
-        tasks.append(new_task)
+        store.insert_task(conn, new_task, parent_id=parent_id or None)
 
-    save_history(tasks)
     return {"status": "success", "message": "任务已添加。", "task": new_task}
 
 def get_tasks_by_date(scheduled_date, filter_status=None):
     target_date = _normalize_date(scheduled_date)
     if not target_date:
         return []
-    tasks = get_task_list(filter_status=filter_status or 'all')
-    target_str = target_date.isoformat()
-
-    def filter_recursive(task_list):
-        result = []
-        for t in task_list:
-            task_date = t.get('scheduled_date') or target_str
-            if task_date == target_str:
-                copied = dict(t)
-                if 'children' in t:
-                    copied['children'] = filter_recursive(t['children'])
-                result.append(copied)
-        return result
-
-    return filter_recursive(tasks)
+    store = get_task_store()
+    store.fill_missing_dates(datetime.date.today().isoformat())
+    tasks = store.get_tasks_by_date(target_date.isoformat())
+    if filter_status and filter_status != 'all':
+        return [t for t in tasks if t.get('status') == filter_status]
+    return tasks
 
 def update_task_by_date(task_id, scheduled_date, content=None, status=None):
-    tasks = load_history()
-    task_found = None
+    store = get_task_store()
     now = datetime.datetime.now().isoformat()
     target_date = _normalize_date(scheduled_date)
     if not target_date:
         return {"status": "error", "message": "日期格式不正确"}
     target_str = target_date.isoformat()
-
-    def find_and_update(task_list):
-        nonlocal task_found
-        for t in task_list:
-            if t.get('id') == task_id:
-                task_date = t.get('scheduled_date') or target_str
-                if task_date != target_str:
-                    return False
-                if content is not None:
-                    t['content'] = content
-                if status is not None:
-                    t['status'] = status
-                t['scheduled_date'] = target_str
-                t['last_updated'] = now
-                task_found = t
-                return True
-            if 'children' in t and find_and_update(t['children']):
-                return True
-        return False
-
-    if find_and_update(tasks):
-        save_history(tasks)
-        return {"status": "success", "message": "任务已更新。", "task": task_found}
+    fields = {"scheduled_date": target_str, "last_updated": now}
+    if content is not None:
+        fields['content'] = content
+    if status is not None:
+        fields['status'] = status
+
+    with store.transaction() as conn:
+        current = store.get_task(task_id, with_children=False)
+        updated = None
+        if current is not None and _task_date_matches(current, target_str):
+            updated = store.update_task(conn, task_id, fields)
+
+    if updated is not None:
+        return {"status": "success", "message": "任务已更新。", "task": store.get_task(task_id)}
     return {"status": "error", "message": f"未找到指定日期的任务 ID：{task_id}"}
 
 def delete_task_by_date(task_id, scheduled_date):
-    tasks = load_history()
-    deleted = False
+    store = get_task_store()
     target_date = _normalize_date(scheduled_date)
     if not target_date:
         return {"status": "error", "message": "日期格式不正确"}
     target_str = target_date.isoformat()
 
-    def find_and_delete(task_list):
-        nonlocal deleted
-        for i, t in enumerate(task_list):
-            if t.get('id') == task_id:
-                task_date = t.get('scheduled_date') or target_str
-                if task_date != target_str:
-                    return False
-                del task_list[i]
-                deleted = True
-                return True
-            if 'children' in t and find_and_delete(t['children']):
-                return True
-        return False
-
-    if find_and_delete(tasks):
-        save_history(tasks)
+    with store.transaction() as conn:
+        current = store.get_task(task_id, with_children=False)
+        deleted = False
+        if current is not None and _task_date_matches(current, target_str):
+            deleted = store.delete_task(conn, task_id)
+
+    if deleted:
         return {"status": "success", "message": "任务已删除。"}
     return {"status": "error", "message": f"未找到指定日期的任务 ID：{task_id}"}
 
 def delete_tasks_batch(task_ids):
     """
-    批量删除任务。
+    批量删除任务（单个事务内完成）。
     参数：
         task_ids (list[str]): 任务ID列表
     """
     if not task_ids:
         return {"status": "success", "message": "没有需要删除的任务。"}
 
-    tasks = load_history()
+    store = get_task_store()
     deleted_count = 0
     not_found_ids = []
 
-    def delete_one_in_memory(current_tasks, target_id):
-        for i, t in enumerate(current_tasks):
-            if t.get('id') == target_id:
-                del current_tasks[i]
-                return True
-            if 'children' in t and delete_one_in_memory(t['children'], target_id):
-                return True
-        return False
-
-    for tid in task_ids:
-        if delete_one_in_memory(tasks, tid):
-            deleted_count += 1
-        else:
-            not_found_ids.append(tid)
+    with store.transaction() as conn:
+        for tid in task_ids:
+            if store.delete_task(conn, tid):
+                deleted_count += 1
+            else:
+                not_found_ids.append(tid)
 
-    if deleted_count > 0:
-        save_history(tasks)
-        
     return {
         "status": "success" if not not_found_ids else "partial_success",
         "message": f"已删除 {deleted_count} 个任务。",
@@ -324,41 +203,30 @@ def delete_tasks_batch(task_ids):
 
 def update_tasks_batch(updates):
     """
-    批量更新任务。
+    批量更新任务（单个事务内完成）。
     参数：
         updates (list[dict]): 更新信息列表，每项包含 id/content/status。
     """
     if not updates:
         return {"status": "success", "message": "没有提供更新内容。"}
-        
-    tasks = load_history()
+
+    store = get_task_store()
     updated_count = 0
     now = datetime.datetime.now().isoformat()
-    
-    # 建立 ID 到 update 信息的映射，方便查找
+
+    # 建立 ID 到 update 信息的映射，同一 ID 以最后一项为准
     update_map = {u.get('id'): u for u in updates if u.get('id')}
-    
-    def update_recursive(task_list):
-        nonlocal updated_count
-        for t in task_list:
-            tid = t.get('id')
-            if tid in update_map:
-                u = update_map[tid]
-                if 'content' in u and u['content'] is not None:
-                    t['content'] = u['content']
-                if 'status' in u and u['status'] is not None:
-                    t['status'] = u['status']
-                t['last_updated'] = now
+
+    with store.transaction() as conn:
+        for tid, u in update_map.items():
+            fields = {"last_updated": now}
+            if 'content' in u and u['content'] is not None:
+                fields['content'] = u['content']
+            if 'status' in u and u['status'] is not None:
+                fields['status'] = u['status']
+            if store.update_task(conn, tid, fields) is not None:
                 updated_count += 1
-            
-            if 'children' in t:
-                update_recursive(t['children'])
 
-    update_recursive(tasks)
-    
-    if updated_count > 0:
-        save_history(tasks)
-        
     return {
         "status": "success",
         "message": f"已更新 {updated_count} 个任务。"
@@ -366,7 +234,7 @@ def update_tasks_batch(updates):
 
 def add_tasks_batch(tasks=None, tasks_list=None):
     """
-    批量添加任务。
+    批量添加任务（单个事务内完成）。
     参数：
         tasks (list[str] or list[dict]): 任务列表
         tasks_list (list[str] or list[dict]): 兼容旧参数的任务列表
@@ -375,32 +243,39 @@ def add_tasks_batch(tasks=None, tasks_list=None):
     if not task_items:
         return {"status": "success", "message": "没有需要添加的任务。", "tasks": []}
 
-    tasks = load_history()
+    store = get_task_store()
     now = datetime.datetime.now().isoformat()
     added_tasks = []
     today_str = datetime.date.today().isoformat()
-    
-    for item in task_items:
-        content = item
-        if isinstance(item, dict):
-            content = item.get('content', '')
-            
-        # 批量任务默认绑定到当天日期，确保 UI 可按日渲染
-        new_task = {
-            "id": _generate_id(),
-            "content": content,
-            "status": "pending",
-            "created_at": now,
-            "last_updated": now,
-            "scheduled_date": today_str,
-            "children": []
-        }
-        tasks.append(new_task)
-        added_tasks.append(new_task)
-        
-    save_history(tasks)
+
+    with store.transaction() as conn:
+        for item in task_items:
+            content = item
+            if isinstance(item, dict):
+                content = item.get('content', '')
+
+            # 批量任务默认绑定到当天日期，确保 UI 可按日渲染
+            new_task = _new_task(content, today_str, now)
+            store.insert_task(conn, new_task)
+            added_tasks.append(new_task)
+
     return {"status": "success", "message": f"已添加 {len(added_tasks)} 个任务。", "tasks": added_tasks}
 
+def _move_one(store, conn, task_id, new_parent_id):
+    """
+    在事务内移动单个任务，返回 "moved" / "task_not_found" / "parent_not_found"。
+    新父任务不存在或是任务自身的子孙时，任务移动到顶层。
+    """
+    if not store.exists(conn, task_id):
+        return "task_not_found"
+    if new_parent_id:
+        if store.exists(conn, new_parent_id) and store.move_task(conn, task_id, new_parent_id):
+            return "moved"
+        store.move_task(conn, task_id, None)
+        return "parent_not_found"
+    store.move_task(conn, task_id, None)
+    return "moved"
+
 def move_task(task_id, new_parent_id=None):
     """
     移动任务（修改父子关系）。
@@ -408,116 +283,48 @@ def move_task(task_id, new_parent_id=None):
         task_id (str): 要移动的任务ID
         new_parent_id (str, optional): 新的父任务ID，None 表示移动到顶层。
     """
-    tasks = load_history()
-    task_to_move = None
-
-    # 先找到并移除该任务
-    def find_and_extract(task_list):
-        nonlocal task_to_move
-        for i, t in enumerate(task_list):
-            if t.get('id') == task_id:
-                task_to_move = t
-                del task_list[i]
-                return True
-            if 'children' in t and find_and_extract(t['children']):
-                return True
-        return False
-
-    if not find_and_extract(tasks):
-        return {"status": "error", "message": f"未找到任务 ID：{task_id}"}
+    store = get_task_store()
+    with store.transaction() as conn:
+        result = _move_one(store, conn, task_id, new_parent_id)
 
-    # 插入到新位置
-    if new_parent_id:
-        parent_found = False
-        def find_and_insert(task_list):
-            nonlocal parent_found
-            for t in task_list:
-                if t.get('id') == new_parent_id:
-                    if 'children' not in t:
-                        t['children'] = []
-                    t['children'].append(task_to_move)
-                    parent_found = True
-                    return True
-                if 'children' in t and find_and_insert(t['children']):
-                    return True
-            return False
-            
-        find_and_insert(tasks)
-        if not parent_found:
-            # 如果找不到新父节点，回退操作以防任务丢失
-            tasks.append(task_to_move)
-            save_history(tasks)
-            return {"status": "error", "message": f"未找到新父任务 ID：{new_parent_id}，已移动到顶层。"}
-    else:
-        # 移动到顶层
-        tasks.append(task_to_move)
-
-    save_history(tasks)
+    if result == "task_not_found":
+        return {"status": "error", "message": f"未找到任务 ID：{task_id}"}
+    if result == "parent_not_found":
+        return {"status": "error", "message": f"未找到新父任务 ID：{new_parent_id}，已移动到顶层。"}
     return {"status": "success", "message": "任务已移动。"}
 
 def move_tasks_batch(moves):
     """
-    批量移动任务。
+    批量移动任务（单个事务内完成）。
     参数：
         moves (list[dict]): 每项包含 task_id/new_parent_id。
     """
     if not moves:
         return {"status": "success", "message": "没有需要移动的任务。", "moved": 0}
 
-    tasks = load_history()
+    store = get_task_store()
     moved_count = 0
     not_found_tasks = []
     not_found_parents = []
     invalid_items = []
 
-    def find_and_extract(task_list, target_id):
-        for i, t in enumerate(task_list):
-            if t.get('id') == target_id:
-                return task_list.pop(i)
-            if 'children' in t:
-                found = find_and_extract(t['children'], target_id)
-                if found:
-                    return found
-        return None
-
-    def find_task(task_list, target_id):
-        for t in task_list:
-            if t.get('id') == target_id:
-                return t
-            if 'children' in t:
-                found = find_task(t['children'], target_id)
-                if found:
-                    return found
-        return None
-
-    for move in moves:
-        if not isinstance(move, dict):
-            invalid_items.append(move)
-            continue
-        task_id = move.get('task_id') or move.get('id')
-        new_parent_id = move.get('new_parent_id')
-        if not task_id:
-            invalid_items.append(move)
-            continue
-        task_to_move = find_and_extract(tasks, task_id)
-        if not task_to_move:
-            not_found_tasks.append(task_id)
-            continue
-        if new_parent_id:
-            parent_task = find_task(tasks, new_parent_id)
-            if not parent_task:
-                tasks.append(task_to_move)
-                not_found_parents.append(new_parent_id)
+    with store.transaction() as conn:
+        for move in moves:
+            if not isinstance(move, dict):
+                invalid_items.append(move)
                 continue
-            if 'children' not in parent_task or parent_task['children'] is None:
-                parent_task['children'] = []
-            parent_task['children'].append(task_to_move)
-        else:
-            tasks.append(task_to_move)
-        moved_count += 1
-
-    if moved_count > 0:
-        save_history(tasks)
+            task_id = move.get('task_id') or move.get('id')
+            new_parent_id = move.get('new_parent_id')
+            if not task_id:
+                invalid_items.append(move)
+                continue
+            result = _move_one(store, conn, task_id, new_parent_id)
+            if result == "task_not_found":
+                not_found_tasks.append(task_id)
+            elif result == "parent_not_found":
+                not_found_parents.append(new_parent_id)
+            else:
+                moved_count += 1
 
     status = "success" if not not_found_tasks and not not_found_parents and not invalid_items else "partial_success"
     return {
@@ -537,31 +344,9 @@ def save_ui_pending_tasks(ui_task_list, current_date=None):
     参数：
         ui_task_list (list[dict]): 来自 UI 的任务数据列表。
     """
-    # 1. 读取现有所有数据
-    current_data = load_history()
-    
-    def normalize_date(value):
-        if isinstance(value, datetime.date):
-            return value
-        if isinstance(value, str):
-            try:
-                return datetime.date.fromisoformat(value)
-            except ValueError:
-                return None
-        return None
-
-    normalized_current_date = normalize_date(current_date)
-
-    # 2. 保留非当前日期的数据，当前日期以 UI 结果为准
-    preserved_tasks = []
-    if normalized_current_date:
-        for t in current_data:
-            task_date = normalize_date(t.get('scheduled_date'))
-            task_date = task_date or normalized_current_date
-            if task_date != normalized_current_date:
-                preserved_tasks.append(t)
-    
-    # 3. 构建新的任务列表（包含已完成与未完成）
+    normalized_current_date = _normalize_date(current_date)
+
+    # 1. 构建新的任务列表（包含已完成与未完成）
     new_tasks = []
     now = datetime.datetime.now().isoformat()
     default_scheduled_date = normalized_current_date.isoformat() if normalized_current_date else datetime.date.today().isoformat()
@@ -578,10 +363,16 @@ def save_ui_pending_tasks(ui_task_list, current_date=None):
             "children": task_data.get('children', [])
         }
         new_tasks.append(task_entry)
-        
-    # 4. 合并并保存
-    full_data = preserved_tasks + new_tasks
-    save_history(full_data)
+
+    # 2. 在同一事务中替换当前日期的顶层任务（未设置日期的视为当前日期），其他日期的数据不动
+    store = get_task_store()
+    with store.transaction() as conn:
+        if normalized_current_date:
+            store.delete_top_level_where_date(conn, normalized_current_date.isoformat(), include_undated=True)
+        else:
+            store.delete_all(conn)
+        for task_entry in new_tasks:
+            store.insert_task(conn, task_entry)
     
     return {"status": "success", "message": "任务已保存。"}
 
@@ -598,8 +389,9 @@ def archive_tasks(tasks_data):
     """
     if not tasks_data:
         return {"status": "success", "message": "没有需要归档的任务。"}
-        
-    history = load_history()
-    history.extend(tasks_data)
-    save_history(history)
+
+    store = get_task_store()
+    with store.transaction() as conn:
+        for task in tasks_data:
+            store.insert_task(conn, task)
     return {"status": "success", "message": f"已归档 {len(tasks_data)} 个任务。"}
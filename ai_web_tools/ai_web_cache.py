@@ -0,0 +1,247 @@
+"""
+网页内容缓存。
+模块职责：
+1) 按规范化 URL 缓存提取后的正文及 ETag / Last-Modified / 抓取时间，每个 URL 一个 JSON 文件。
+2) TTL 内直接返回缓存；过期后由调用方发起条件请求，304 时只刷新抓取时间，不重新下载正文。
+3) 磁盘总大小有上限，超出时按最近访问时间淘汰；最近用过的条目同时保留在内存中，重复读取不访问磁盘。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(current_dir, "web_cache")
+
+DEFAULT_TTL = 600
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+# 内存中保留的条目数
+MEMORY_ENTRIES = 128
+# 命中时更新文件时间（用于重启后的 LRU 顺序）的最小间隔，避免每次命中都写盘
+TOUCH_INTERVAL = 60
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    规范化 URL：协议与主机小写、去掉默认端口与片段、查询参数排序。
+    """
+    parts = urlsplit(str(url or "").strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+class WebContentCache:
+    """
+    网页正文的磁盘缓存，线程安全。
+    条目字段：url、text、etag、last_modified、fetched_at、max_chars（提取时的字符上限，0 为不限）、
+    truncated（正文因达到 max_chars 而提前结束；下载未完成的内容不应写入缓存）。
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, ttl: float = DEFAULT_TTL,
+                 max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # 摘要 -> [文件大小, 最近访问时间]，首次使用时由目录扫描建立
+        self._index: Optional[Dict[str, list]] = None
+        self._total_bytes = 0
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存条目（不判断是否过期），不存在时返回 None。
+        """
+        digest = self._digest(url)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(digest)
+            if entry is not None:
+                self._memory.move_to_end(digest)
+            else:
+                entry = self._read_entry(digest)
+                if entry is None:
+                    return None
+                self._remember(digest, entry)
+            self._touch(digest, now)
+            return entry
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - float(entry.get("fetched_at", 0)) < self.ttl
+
+    @staticmethod
+    def covers(entry: Dict[str, Any], max_chars: int) -> bool:
+        """
+        判断缓存的正文能否满足本次的字符上限（缓存时被截断且上限更小时不能满足）。
+        """
+        if not entry.get("truncated"):
+            return True
+        cached_limit = int(entry.get("max_chars") or 0)
+        return bool(max_chars) and 0 < max_chars <= cached_limit
+
+    @staticmethod
+    def validators(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        生成条件请求头（If-None-Match / If-Modified-Since）。
+        """
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url: str, text: str, etag: Optional[str] = None, last_modified: Optional[str] = None,
+            max_chars: int = 0, truncated: bool = False) -> Dict[str, Any]:
+        """
+        写入或覆盖缓存条目。
+        """
+        entry = {
+            "url": normalize_url(url),
+            "text": text,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+            "max_chars": max_chars,
+            "truncated": truncated,
+        }
+        with self._lock:
+            self._write_entry(self._digest(url), entry)
+        return entry
+
+    def mark_revalidated(self, url: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        条件请求返回 304 时调用：刷新抓取时间并持久化，正文不变。
+        """
+        entry = dict(entry)
+        entry["fetched_at"] = time.time()
+        with self._lock:
+            self._write_entry(self._digest(url), entry)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            for digest in list(self._ensure_index()):
+                self._remove(digest)
+
+    def _digest(self, url: str) -> str:
+        return hashlib.sha1(normalize_url(url).encode("utf-8")).hexdigest()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _ensure_index(self) -> Dict[str, list]:
+        if self._index is None:
+            index = {}
+            total = 0
+            try:
+                with os.scandir(self.cache_dir) as entries:
+                    for item in entries:
+                        if not item.name.endswith(".json"):
+                            continue
+                        try:
+                            stat = item.stat()
+                        except OSError:
+                            continue
+                        index[item.name[:-5]] = [stat.st_size, stat.st_mtime]
+                        total += stat.st_size
+            except OSError:
+                pass
+            self._index = index
+            self._total_bytes = total
+        return self._index
+
+    def _read_entry(self, digest: str) -> Optional[Dict[str, Any]]:
+        if digest not in self._ensure_index():
+            return None
+        try:
+            with open(self._path(digest), "r", encoding="utf-8") as file:
+                entry = json.load(file)
+        except Exception:
+            self._remove(digest)
+            return None
+        return entry if isinstance(entry, dict) else None
+
+    def _write_entry(self, digest: str, entry: Dict[str, Any]) -> None:
+        index = self._ensure_index()
+        path = self._path(digest)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(entry, file, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except Exception as e:
+            print(f"网页缓存写入失败：{e}")
+            return
+        old = index.get(digest)
+        self._total_bytes += size - (old[0] if old else 0)
+        index[digest] = [size, time.time()]
+        self._remember(digest, entry)
+        self._evict(keep=digest)
+
+    def _remember(self, digest: str, entry: Dict[str, Any]) -> None:
+        self._memory[digest] = entry
+        self._memory.move_to_end(digest)
+        while len(self._memory) > MEMORY_ENTRIES:
+            self._memory.popitem(last=False)
+
+    def _touch(self, digest: str, now: float) -> None:
+        record = self._ensure_index().get(digest)
+        if record is None:
+            return
+        if now - record[1] >= TOUCH_INTERVAL:
+            try:
+                os.utime(self._path(digest), (now, now))
+            except OSError:
+                pass
+        record[1] = now
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        if self._total_bytes <= self.max_bytes:
+            return
+        index = self._ensure_index()
+        for digest in sorted(index, key=lambda key: index[key][1]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if digest != keep:
+                self._remove(digest)
+
+    def _remove(self, digest: str) -> None:
+        record = self._ensure_index().pop(digest, None)
+        if record is not None:
+            self._total_bytes -= record[0]
+        self._memory.pop(digest, None)
+        try:
+            os.remove(self._path(digest))
+        except OSError:
+            pass
+
+
+_cache: Optional[WebContentCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_web_cache() -> WebContentCache:
+    """
+    获取进程级共享的网页内容缓存。
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = WebContentCache()
+    return _cache
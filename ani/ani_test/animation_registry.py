@@ -1,6 +1,12 @@
 import os
 import json
-from typing import Dict, List, Optional
+import threading
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .atlas_format import build_atlas_frame_refs
+except Exception:
+    from ani.ani_test.atlas_format import build_atlas_frame_refs
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(os.path.dirname(current_dir))
@@ -67,30 +73,54 @@ DEFAULT_REGISTRY = {
 }
 
 
-def _load_registry() -> Dict:
-    if not os.path.exists(REGISTRY_PATH):
+def _registry_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _load_registry(path: str = REGISTRY_PATH) -> Dict:
+    if not os.path.exists(path):
         return DEFAULT_REGISTRY
     try:
-        with open(REGISTRY_PATH, "r", encoding="utf-8") as file:
+        with open(path, "r", encoding="utf-8") as file:
             data = json.load(file)
         return data if isinstance(data, dict) else DEFAULT_REGISTRY
     except Exception:
         return DEFAULT_REGISTRY
 
 
-def get_default_sequence_name() -> Optional[str]:
-    data = _load_registry()
-    default_name = data.get("default")
-    return default_name if isinstance(default_name, str) else None
-
-
 def _resolve_frames_dir(frames_dir: str) -> str:
     if os.path.isabs(frames_dir):
         return frames_dir
     return os.path.join(project_root, frames_dir)
 
 
-def _build_frame_paths(config: Dict) -> List[str]:
+def _list_dir_names(directory: str, listing_cache: Dict[str, frozenset]) -> frozenset:
+    """
+    列出目录内的文件名（同一次编译内按目录缓存），用集合判断帧是否存在，代替逐帧 os.path.exists。
+    """
+    names = listing_cache.get(directory)
+    if names is None:
+        try:
+            names = frozenset(os.listdir(directory))
+        except OSError:
+            names = frozenset()
+        listing_cache[directory] = names
+    return names
+
+
+def _build_frame_paths(config: Dict, listing_cache: Optional[Dict[str, frozenset]] = None) -> List[str]:
+    # 配置了图集且图集有效时优先使用图集，否则回退到逐帧图片
+    atlas = config.get("atlas")
+    if atlas:
+        refs = build_atlas_frame_refs(_resolve_frames_dir(str(atlas)))
+        if refs:
+            return refs
+    if listing_cache is None:
+        listing_cache = {}
     frames_dir = _resolve_frames_dir(str(config.get("frames_dir", "")))
     pattern = str(config.get("pattern", "{index:02d}.png"))
     start = int(config.get("start", 1))
@@ -101,45 +131,133 @@ def _build_frame_paths(config: Dict) -> List[str]:
     for index in range(start, end + 1):
         name = pattern.format(index=index)
         path = os.path.join(frames_dir, name)
-        if os.path.exists(path):
+        # 模板可能包含子目录，此时按所在目录列出
+        names = _list_dir_names(os.path.dirname(path), listing_cache)
+        if os.path.basename(path) in names:
             paths.append(path)
     return paths
 
 
+def _build_animation_item(name: str, anim_config: Dict, frame_paths: List[str], overrides: Dict) -> Dict:
+    return {
+        "name": name,
+        "frame_paths": frame_paths,
+        "interval_ms": int(overrides.get("interval_ms", anim_config.get("interval_ms", 120))),
+        "loop": bool(overrides.get("loop", anim_config.get("loop", True)))
+    }
+
+
+class AnimationRegistry:
+    """
+    编译后的动画注册表：一次性解析全部动画与序列并缓存帧列表，查询为字典查找。
+    注册表文件的 mtime/大小变化时自动重新编译；帧图片增删后可调用 reload() 强制刷新。
+    """
+
+    def __init__(self, path: str = REGISTRY_PATH) -> None:
+        self.path = path
+        self._lock = threading.RLock()
+        self._signature = None
+        self._compiled = False
+        self._default_name: Optional[str] = None
+        self._items: Dict[str, List[Dict]] = {}
+        self._sequence_names: List[str] = []
+
+    def reload(self) -> None:
+        """
+        强制重新读取注册表并重新解析所有帧路径。
+        """
+        with self._lock:
+            self._compile(_registry_signature(self.path))
+
+    def get_sequence_items(self, name: str) -> List[Dict]:
+        """
+        返回序列（或单个动画）的播放项列表；返回的是副本，调用方可自由修改。
+        """
+        self._ensure_current()
+        return [dict(item) for item in self._items.get(name, [])]
+
+    def get_default_sequence_name(self) -> Optional[str]:
+        self._ensure_current()
+        return self._default_name
+
+    def get_sequence_names(self) -> List[str]:
+        self._ensure_current()
+        return list(self._sequence_names)
+
+    def _ensure_current(self) -> None:
+        signature = _registry_signature(self.path)
+        with self._lock:
+            if not self._compiled or signature != self._signature:
+                self._compile(signature)
+
+    def _compile(self, signature: Optional[Tuple[int, int]]) -> None:
+        data = _load_registry(self.path)
+        animations = data.get("animations", {})
+        sequences = data.get("sequences", {})
+        if not isinstance(animations, dict):
+            animations = {}
+        if not isinstance(sequences, dict):
+            sequences = {}
+
+        listing_cache: Dict[str, frozenset] = {}
+        frame_paths_by_name: Dict[str, List[str]] = {}
+        for anim_name, anim_config in animations.items():
+            if isinstance(anim_config, dict):
+                frame_paths_by_name[anim_name] = _build_frame_paths(anim_config, listing_cache)
+
+        items: Dict[str, List[Dict]] = {}
+        for anim_name, frame_paths in frame_paths_by_name.items():
+            if frame_paths:
+                items[anim_name] = [_build_animation_item(anim_name, animations[anim_name], frame_paths, {})]
+        # 序列与动画同名时序列优先
+        for sequence_name, sequence in sequences.items():
+            sequence_items = []
+            entries = sequence.get("items", []) if isinstance(sequence, dict) else []
+            for entry in entries:
+                if not isinstance(entry, dict):
+                    continue
+                anim_name = entry.get("name")
+                frame_paths = frame_paths_by_name.get(anim_name)
+                if not frame_paths:
+                    continue
+                sequence_items.append(_build_animation_item(anim_name, animations[anim_name], frame_paths, entry))
+            items[sequence_name] = sequence_items
+
+        default_name = data.get("default")
+        self._default_name = default_name if isinstance(default_name, str) else None
+        self._items = items
+        self._sequence_names = list(sequences.keys())
+        self._signature = signature
+        self._compiled = True
+
+
+_registry: Optional[AnimationRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_animation_registry() -> AnimationRegistry:
+    """
+    获取进程级共享的动画注册表实例。
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = AnimationRegistry()
+    return _registry
+
+
+def reload_registry() -> None:
+    get_animation_registry().reload()
+
+
+def get_default_sequence_name() -> Optional[str]:
+    return get_animation_registry().get_default_sequence_name()
+
+
+def get_sequence_names() -> List[str]:
+    return get_animation_registry().get_sequence_names()
+
+
 def get_sequence_items(name: str) -> List[Dict]:
-    data = _load_registry()
-    animations = data.get("animations", {})
-    sequences = data.get("sequences", {})
-    result_items = []
-
-    if name in sequences:
-        items = sequences.get(name, {}).get("items", [])
-        for item in items:
-            anim_name = item.get("name")
-            anim_config = animations.get(anim_name, {})
-            if not isinstance(anim_config, dict):
-                continue
-            frame_paths = _build_frame_paths(anim_config)
-            if not frame_paths:
-                continue
-            interval_ms = int(item.get("interval_ms", anim_config.get("interval_ms", 120)))
-            loop = bool(item.get("loop", anim_config.get("loop", True)))
-            result_items.append({
-                "name": anim_name,
-                "frame_paths": frame_paths,
-                "interval_ms": interval_ms,
-                "loop": loop
-            })
-        return result_items
-
-    anim_config = animations.get(name, {})
-    if isinstance(anim_config, dict):
-        frame_paths = _build_frame_paths(anim_config)
-        if frame_paths:
-            result_items.append({
-                "name": name,
-                "frame_paths": frame_paths,
-                "interval_ms": int(anim_config.get("interval_ms", 120)),
-                "loop": bool(anim_config.get("loop", True))
-            })
-    return result_items
+    return get_animation_registry().get_sequence_items(name)
@@ -49,6 +49,7 @@ class AnimationSequenceWidget(QWidget):
         self._play_current_item()
 
     def get_first_frame_size(self) -> QSize:
-        if self.player.pixmaps:
-            return self.player.pixmaps[0].size()
+        source_size = self.player.get_source_size()
+        if source_size.isValid():
+            return source_size
         return QSize(200, 200)
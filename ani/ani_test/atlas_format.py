@@ -0,0 +1,69 @@
+"""
+图集格式模块（不依赖 Qt，服务端也可导入）。
+图集 = 一张大图 + JSON 帧矩形；帧引用格式为 "<图集 JSON 路径>#<帧序号>"。
+
+图集 JSON 结构：
+{
+    "image": "atlas.png",
+    "source_size": [原始帧宽, 原始帧高],
+    "frames": [{"x": 0, "y": 0, "w": 256, "h": 342}, ...]
+}
+"""
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+
+ATLAS_SEPARATOR = "#"
+ATLAS_JSON_NAME = "atlas.json"
+ATLAS_IMAGE_NAME = "atlas.png"
+
+
+def make_atlas_ref(atlas_path: str, index: int) -> str:
+    """
+    构建图集帧引用字符串。
+    """
+    return f"{atlas_path}{ATLAS_SEPARATOR}{index}"
+
+
+def split_frame_ref(frame_ref: str) -> Tuple[str, Optional[int]]:
+    """
+    拆分帧引用，返回 (文件路径, 图集帧序号)；普通图片路径的帧序号为 None。
+    """
+    if isinstance(frame_ref, str) and ATLAS_SEPARATOR in frame_ref:
+        path, _, index_text = frame_ref.rpartition(ATLAS_SEPARATOR)
+        if path.lower().endswith(".json") and index_text.isdigit():
+            return path, int(index_text)
+    return frame_ref, None
+
+
+def load_atlas_description(atlas_path: str) -> Optional[Dict]:
+    """
+    读取图集描述，返回 {"image_path", "frames", "source_size"}；无效时返回 None。
+    frames 为 (x, y, w, h) 元组列表，source_size 为 (宽, 高) 或 None。
+    """
+    try:
+        with open(atlas_path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        frames: List[Tuple[int, int, int, int]] = [
+            (int(item["x"]), int(item["y"]), int(item["w"]), int(item["h"]))
+            for item in data.get("frames", [])
+        ]
+        source = data.get("source_size") or []
+        source_size = (int(source[0]), int(source[1])) if len(source) == 2 else None
+    except Exception:
+        return None
+    return {
+        "image_path": os.path.join(os.path.dirname(atlas_path), str(data.get("image", ATLAS_IMAGE_NAME))),
+        "frames": frames,
+        "source_size": source_size
+    }
+
+
+def build_atlas_frame_refs(atlas_path: str) -> List[str]:
+    """
+    返回图集中每一帧的引用；图集不存在或无效时返回空列表。
+    """
+    description = load_atlas_description(atlas_path)
+    if not description:
+        return []
+    return [make_atlas_ref(atlas_path, index) for index in range(len(description["frames"]))]
@@ -0,0 +1,182 @@
+"""
+帧图片缓存模块。
+提供进程级 LRU 帧缓存，按 路径 + 修改时间 + 缩放尺寸 缓存已解码的 QPixmap，
+并支持图集帧引用（格式见 atlas_format），避免切换动画时反复读盘解码。
+"""
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import os
+import sys
+
+from PyQt5.QtCore import QRect, QSize, Qt
+from PyQt5.QtGui import QImageReader, QPixmap
+
+try:
+    from .atlas_format import split_frame_ref, load_atlas_description
+except Exception:
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(os.path.dirname(current_dir))
+    if project_root not in sys.path:
+        sys.path.append(project_root)
+    from ani.ani_test.atlas_format import split_frame_ref, load_atlas_description
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+SizeKey = Optional[Tuple[int, int]]
+
+
+def _mtime_ns(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _fit_size(source: QSize, box: Tuple[int, int]) -> QSize:
+    """
+    计算等比缩放到指定尺寸范围内的结果尺寸。
+    """
+    size = QSize(source)
+    size.scale(QSize(max(1, box[0]), max(1, box[1])), Qt.KeepAspectRatio)
+    return QSize(max(1, size.width()), max(1, size.height()))
+
+
+class PixmapCache:
+    """
+    帧图片 LRU 缓存。
+    按像素字节数限制总占用；同一帧的不同缩放尺寸分别缓存。
+    只能在 GUI 线程中使用（QPixmap 的限制）。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, QPixmap]" = OrderedDict()
+        self._total_bytes = 0
+        self._atlases: Dict[str, tuple] = {}
+
+    def exists(self, frame_ref: str) -> bool:
+        """
+        判断帧是否存在（图集帧需序号在范围内）。
+        """
+        path, index = split_frame_ref(frame_ref)
+        if index is None:
+            return isinstance(path, str) and os.path.exists(path)
+        atlas = self._load_atlas(path)
+        return atlas is not None and 0 <= index < len(atlas[1])
+
+    def get(self, frame_ref: str, size: SizeKey = None) -> QPixmap:
+        """
+        获取帧图片。
+
+        Args:
+            frame_ref: 图片路径或图集帧引用。
+            size: 目标尺寸范围 (宽, 高)，按比例缩放到范围内；None 表示原始尺寸。
+
+        Returns:
+            QPixmap，读取失败时返回空 QPixmap。
+        """
+        path, index = split_frame_ref(frame_ref)
+        mtime = _mtime_ns(path)
+        if mtime is None:
+            return QPixmap()
+        key = (frame_ref, mtime, size)
+        pixmap = self._entries.get(key)
+        if pixmap is not None:
+            self._entries.move_to_end(key)
+            return pixmap
+        pixmap = self._load(path, index, size)
+        if not pixmap.isNull():
+            self._put(key, pixmap)
+        return pixmap
+
+    def source_size(self, frame_ref: str) -> QSize:
+        """
+        返回帧的原始尺寸（不解码整张图片）；图集帧返回生成图集前的原始帧尺寸。
+        """
+        path, index = split_frame_ref(frame_ref)
+        if index is None:
+            return QImageReader(path).size()
+        atlas = self._load_atlas(path)
+        if atlas is None or not (0 <= index < len(atlas[1])):
+            return QSize()
+        return atlas[2] if atlas[2].isValid() else atlas[1][index].size()
+
+    def set_max_bytes(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._atlases.clear()
+        self._total_bytes = 0
+
+    def _load(self, path: str, index: Optional[int], size: SizeKey) -> QPixmap:
+        if index is not None:
+            atlas = self._load_atlas(path)
+            if atlas is None or not (0 <= index < len(atlas[1])):
+                return QPixmap()
+            sheet = self.get(atlas[0])
+            frame = sheet.copy(atlas[1][index]) if not sheet.isNull() else QPixmap()
+            if size is None or frame.isNull():
+                return frame
+            target = _fit_size(frame.size(), size)
+            return frame.scaled(target, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+
+        reader = QImageReader(path)
+        if size is not None:
+            # 解码时直接缩放，避免保留全尺寸图像
+            source = reader.size()
+            if source.isValid():
+                reader.setScaledSize(_fit_size(source, size))
+        image = reader.read()
+        if image.isNull():
+            return QPixmap()
+        return QPixmap.fromImage(image)
+
+    def _load_atlas(self, atlas_path: str) -> Optional[tuple]:
+        """
+        读取图集描述，返回 (图集图片路径, 帧矩形列表, 原始帧尺寸)，按 JSON 修改时间缓存。
+        """
+        mtime = _mtime_ns(atlas_path)
+        if mtime is None:
+            return None
+        cached = self._atlases.get(atlas_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        description = load_atlas_description(atlas_path)
+        if description is None:
+            return None
+        rects = [QRect(x, y, w, h) for x, y, w, h in description["frames"]]
+        source = description["source_size"]
+        source_size = QSize(source[0], source[1]) if source else QSize()
+        atlas = (description["image_path"], rects, source_size)
+        self._atlases[atlas_path] = (mtime, atlas)
+        return atlas
+
+    def _put(self, key: tuple, pixmap: QPixmap) -> None:
+        self._entries[key] = pixmap
+        self._total_bytes += _pixmap_bytes(pixmap)
+        self._evict()
+
+    def _evict(self) -> None:
+        # 至少保留最近一项，避免单张超限图片反复解码
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            _key, pixmap = self._entries.popitem(last=False)
+            self._total_bytes -= _pixmap_bytes(pixmap)
+
+
+def _pixmap_bytes(pixmap: QPixmap) -> int:
+    return pixmap.width() * pixmap.height() * max(1, pixmap.depth() // 8)
+
+
+_cache: Optional[PixmapCache] = None
+
+
+def get_pixmap_cache() -> PixmapCache:
+    """
+    获取进程级共享的帧缓存实例。
+    """
+    global _cache
+    if _cache is None:
+        _cache = PixmapCache()
+    return _cache
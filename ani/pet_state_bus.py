@@ -0,0 +1,153 @@
+"""
+宠物状态总线。
+模块职责：
+1) 进程内共享宠物动画状态（当前序列、播放模式、随机配置、窗口位置等），更新以增量形式即时推送给订阅者。
+2) ani/animation_state.json 仅作为持久化快照：状态变化时写入，启动时读取。
+3) 快照被其他进程修改时，下一次读取会按文件签名重新加载，并通知订阅者。
+不依赖 Qt，服务端也可导入；界面侧订阅后需自行切换到 GUI 线程处理。
+"""
+import copy
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = os.path.join(current_dir, "animation_state.json")
+
+# 回调参数：(变化的字段, 更新后的完整状态副本, 更新来源)
+Subscriber = Callable[[Dict, Dict, Optional[str]], None]
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class PetStateBus:
+    """
+    宠物状态总线，线程安全。
+    """
+
+    def __init__(self, state_file: str = STATE_FILE) -> None:
+        self.state_file = state_file
+        self._lock = threading.RLock()
+        self._state: Dict = {}
+        self._snapshot_sig = None
+        self._loaded = False
+        self._subscribers: List[Subscriber] = []
+
+    def get_state(self) -> Dict:
+        """
+        返回当前状态的副本。
+        """
+        with self._lock:
+            self._refresh_from_snapshot()
+            return copy.deepcopy(self._state)
+
+    def update(self, delta: Dict, source: Optional[str] = None) -> Dict:
+        """
+        合并增量到状态中；有变化时写快照并通知订阅者（在调用方线程中回调）。
+
+        Args:
+            delta: 需要更新的顶层字段。
+            source: 更新来源标识，订阅者可据此忽略自己发出的更新。
+
+        Returns:
+            更新后的完整状态副本。
+        """
+        with self._lock:
+            self._refresh_from_snapshot()
+            changed = {key: copy.deepcopy(value) for key, value in delta.items() if self._state.get(key) != value}
+            if changed:
+                self._state.update(changed)
+                self._write_snapshot()
+            state = copy.deepcopy(self._state)
+        if changed:
+            self._notify(changed, state, source)
+        return state
+
+    def subscribe(self, callback: Subscriber) -> Callable[[], None]:
+        """
+        订阅状态变化，返回取消订阅的函数。
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def reload_snapshot(self) -> None:
+        """
+        检查快照文件是否被外部修改，若有变化则重新加载并通知订阅者。
+        """
+        with self._lock:
+            before = copy.deepcopy(self._state)
+            if not self._refresh_from_snapshot():
+                return
+            state = copy.deepcopy(self._state)
+        changed = {key: value for key, value in state.items() if before.get(key) != value}
+        if changed:
+            self._notify(changed, state, "snapshot")
+
+    def _refresh_from_snapshot(self) -> bool:
+        signature = _file_signature(self.state_file)
+        if self._loaded and signature == self._snapshot_sig:
+            return False
+        self._loaded = True
+        self._snapshot_sig = signature
+        if signature is None:
+            return False
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except Exception:
+            return False
+        if not isinstance(data, dict):
+            return False
+        self._state = data
+        return True
+
+    def _write_snapshot(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+            tmp_path = f"{self.state_file}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(self._state, file, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, self.state_file)
+        except Exception as e:
+            print(f"宠物状态快照保存失败：{e}")
+        # 自己写入的快照不需要再被当作外部修改重新加载
+        self._snapshot_sig = _file_signature(self.state_file)
+
+    def _notify(self, changed: Dict, state: Dict, source: Optional[str]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(changed, state, source)
+            except Exception as e:
+                print(f"宠物状态订阅回调失败：{e}")
+
+
+_bus: Optional[PetStateBus] = None
+_bus_lock = threading.Lock()
+
+
+def get_pet_state_bus() -> PetStateBus:
+    """
+    获取进程级共享的宠物状态总线。
+    """
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                _bus = PetStateBus()
+    return _bus
@@ -7,9 +7,7 @@
 import sys
 import os
 import json
-import uuid
 import types
-from datetime import datetime
 
 # 将项目根目录加入 sys.path
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -18,30 +16,9 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 from core.llm_client import call_llm
-
-try:
-    from ai_tools import ai_statistics
-except ImportError:
-    class MockStats:
-        """
-        统计模块缺失时的降级实现。
-        """
-
-        def calculate_history_stats(self):
-            """
-            返回空统计结果，确保聊天逻辑可运行。
-            """
-            return {"total_completed": 0, "total_uncompleted": 0}
-
-    ai_statistics = MockStats()
-
-try:
-    from tools import token_cal
-except ImportError:
-    class MockTokenCal:
-        def get_compact_memory_summary(self):
-            return ""
-    token_cal = MockTokenCal()
+from core.prompt_service import get_prompt_service, BASE_RESPONSIBILITY
+from core.memory_store import get_memory_store
+from core.context_packer import ROLE_MEMORY, pack_memory_records
 
 try:
     from ai_tools import skill_registry
@@ -64,21 +41,42 @@ class AIAgent:
         self.memory_path = memory_path or os.path.join(
             project_root, "core", "core_data", "core_chat_memory.json"
         )
-        self.skills_metadata_path = os.path.join(
-            project_root, "ai_tools", "skills_metadata.json"
-        )
-        self.skills_metadata_brief_path = os.path.join(
-            project_root, "ai_tools", "skills_metadata_brief.json"
-        )
-        self.full_skills_map = self._load_full_skills_map()
-        self._ensure_memory_file()
+        # 技能元数据与提示词片段由进程级服务统一缓存，多个 Agent 共享
+        self.prompt_service = get_prompt_service()
+        self.skills_metadata_path = self.prompt_service.skills_metadata_path
+        self.skills_metadata_brief_path = self.prompt_service.skills_metadata_brief_path
+        # 对话记忆按段追加存储，同一路径的 Agent 共享最近记录索引
+        self.memory_store = get_memory_store(self.memory_path)
         self._ensure_skills_brief_file()
 
-    def get_system_prompt(self):
+    @property
+    def full_skills_map(self):
+        """
+        技能名 -> 完整技能定义，元数据文件变化后自动刷新。
+        """
+        return self.prompt_service.get_full_skills_map()
+
+    def get_system_prompt(self, role_instruction=""):
+        """
+        生成稳定的系统提示词：底层职责 + 技能提示词 + 角色说明（不含统计与时间，保证前缀可缓存）。
+        """
+        return self.prompt_service.get_stable_prefix(role_instruction)
+
+    def get_volatile_prompt(self):
         """
-        生成系统提示词：底层职责 + 技能提示词 + 任务统计。
+        生成易变的上下文提示：任务统计、Token 统计与当前时间。
         """
-        return self._build_system_prompt()
+        return self.prompt_service.get_volatile_prompt()
+
+    def build_prompt_messages(self, user_content, role_instruction=""):
+        """
+        组装不带对话记忆的消息：稳定系统提示词在最前，易变上下文紧贴用户输入之前。
+        """
+        return [
+            {"role": "system", "content": self.get_system_prompt(role_instruction)},
+            {"role": "system", "content": self.get_volatile_prompt()},
+            {"role": "user", "content": user_content}
+        ]
 
     def chat(self, text, stream=True):
         """
@@ -145,53 +143,36 @@ class AIAgent:
 
     def clear_context(self):
         """
-        清空对话记忆文件。
+        清空对话记忆。
         """
-        self._save_json(self.memory_path, [])
+        self.memory_store.clear()
 
-    def _ensure_memory_file(self):
+    def _load_memory(self, limit=None):
         """
-        确保存储目录与记忆文件存在。
+        读取最近 limit 条对话记忆；limit 为空时读取全部历史（含归档段，仅用于低频场景）。
         """
-        memory_dir = os.path.dirname(self.memory_path)
-        if not os.path.exists(memory_dir):
-            os.makedirs(memory_dir, exist_ok=True)
-        if not os.path.exists(self.memory_path):
-            self._save_json(self.memory_path, [])
-
-    def _load_memory(self):
-        """
-        读取对话记忆列表。
-        """
-        data = self._read_json(self.memory_path, default=[])
-        return data if isinstance(data, list) else []
+        return self.memory_store.last(limit)
 
     def _append_memory(self, question, response):
         """
         追加一条对话记录。
         """
-        records = self._load_memory()
-        records.append({
-            "dialog_id": str(uuid.uuid4()),
-            "question": question,
-            "response": response,
-            "time": datetime.now().isoformat()
-        })
-        self._save_json(self.memory_path, records)
+        self.memory_store.append(question, response)
 
     def _build_messages(self, user_text, use_memory=True):
         """
         组合系统提示词与历史上下文消息。
+        顺序为：稳定系统提示词 -> 历史对话 -> 易变上下文 -> 当前输入，使前缀在多次调用间保持一致。
         """
-        system_prompt = self._build_system_prompt()
-        messages = [{"role": "system", "content": system_prompt}]
+        messages = [{"role": "system", "content": self.get_system_prompt()}]
 
         if use_memory:
-            history = self._load_memory()
-            if self.max_history and len(history) > self.max_history:
-                history = history[-self.max_history:]
+            # 在最近 max_history 条内按 token 预算挑选，放不下的记录以摘要形式保留
+            packed = pack_memory_records(self._load_memory(self.max_history or None), ROLE_MEMORY, user_text)
+            if packed.summary:
+                messages.append({"role": "system", "content": f"[其余历史对话摘要]\n{packed.summary}"})
 
-            for record in history:
+            for record in packed.selected:
                 question = str(record.get("question", "")).strip()
                 answer = str(record.get("response", "")).strip()
                 if question:
@@ -199,62 +180,27 @@ class AIAgent:
                 if answer:
                     messages.append({"role": "assistant", "content": answer})
 
+        messages.append({"role": "system", "content": self.get_volatile_prompt()})
         messages.append({"role": "user", "content": user_text})
         return messages
 
-    def _build_system_prompt(self):
-        """
-        汇总底层职责、技能提示词与统计信息，实时获取当前时间。
-        """
-        base_prompt = self._build_base_responsibility_prompt()
-        skills_prompt = self._build_skills_prompt()
-        stats_prompt = self._build_stats_prompt()
-        current_time = datetime.now().isoformat()
-        return f"{base_prompt}\n\n{skills_prompt}\n\n{stats_prompt}\n\n[当前时间：{current_time}]" 
-
     def _build_base_responsibility_prompt(self):
         """
         构建底层职责提示词（100 词以内中文）。
         """
-        return (
-            "你是桌面任务与文件助手，负责理解用户意图、回答问题、"
-            "必要时调用技能完成任务，并返回清晰结果；保持安全、简洁、准确。"
-            "你有上下文记忆，但只能回忆起过去有限时间内的对话记录，不能回忆起更早的内容。"
-        )
+        return BASE_RESPONSIBILITY
     
     def _build_stats_prompt(self):
         """
         生成任务统计提示词。
         """
-        stats_data = ai_statistics.calculate_history_stats()
-        total_tasks = stats_data.get("total_completed", 0) + stats_data.get("total_uncompleted", 0)
-        completed_tasks = stats_data.get("total_completed", 0)
-        pending_tasks = stats_data.get("total_uncompleted", 0)
-        task_summary = f"[当前任务统计：总计 {total_tasks}，已完成 {completed_tasks}，未完成 {pending_tasks}]"
-        token_summary = token_cal.get_compact_memory_summary()
-        if token_summary:
-            return f"{task_summary}\n{token_summary}"
-        return task_summary
+        return self.prompt_service.get_stats_prompt()
 
     def _build_skills_prompt(self):
         """
         构建技能提示词系统，明确何时调用技能与调用格式。
         """
-        metadata = self._read_json(self.skills_metadata_brief_path, default={})
-        skills = metadata.get("skills", []) if isinstance(metadata, dict) else []
-        system_instruction = metadata.get("system_instruction", "") if isinstance(metadata, dict) else ""
-        skills_text = self._format_brief_skills_list(skills)
-
-        tool_protocol = (
-            "当需要调用技能时，请只输出严格 JSON："
-            "{\"action\": \"call_skill\", \"name\": \"技能名\", \"arguments\": {参数}}。"
-            "如需多个技能，输出 {\"action\": \"call_skill\", \"tool_calls\": [..]}。"
-            "无须调用时输出正常回答。"
-        )
-
-        if system_instruction:
-            return f"{system_instruction}\n\n{tool_protocol}\n\n[技能清单]\n{skills_text}"
-        return f"{tool_protocol}\n\n[技能清单]\n{skills_text}"
+        return self.prompt_service.get_skills_prompt()
 
     def _format_skills_list(self, skills):
         """
@@ -274,13 +220,7 @@ class AIAgent:
         return "\n".join(lines) if lines else "- 暂无技能定义"
 
     def _format_brief_skills_list(self, skills):
-        lines = []
-        for skill in skills:
-            name = skill.get("name", "未命名")
-            description = skill.get("description", "")
-            line = f"- {name}: {description}"
-            lines.append(line)
-        return "\n".join(lines) if lines else "- 暂无技能定义"
+        return self.prompt_service.format_brief_skills_list(skills)
 
     def _stream_and_record(self, messages, question):
         """
@@ -360,19 +300,8 @@ class AIAgent:
         except Exception as exc:
             return {"status": "error", "message": str(exc)}
 
-    def _load_full_skills_map(self):
-        metadata = self._read_json(self.skills_metadata_path, default={})
-        skills = metadata.get("skills", []) if isinstance(metadata, dict) else []
-        skills_map = {}
-        for item in skills:
-            if isinstance(item, dict) and item.get("name"):
-                skills_map[item.get("name")] = item
-        return skills_map
-
     def _get_skill_schema(self, skill_name):
-        if not skill_name:
-            return None
-        return self.full_skills_map.get(skill_name)
+        return self.prompt_service.get_skill_schema(skill_name)
 
     def _enrich_tool_call_arguments(self, call, user_text):
         if not isinstance(call, dict):
@@ -465,26 +394,7 @@ class AIAgent:
             return default
 
     def _ensure_skills_brief_file(self):
-        metadata = self._read_json(self.skills_metadata_path, default={})
-        skills = metadata.get("skills", []) if isinstance(metadata, dict) else []
-        brief_skills = []
-        for skill in skills:
-            name = skill.get("name")
-            if not name:
-                continue
-            brief_skills.append({
-                "name": name,
-                "description": skill.get("description", "")
-            })
-
-        if not brief_skills:
-            return
-
-        brief_data = {"skills": brief_skills}
-        existing = self._read_json(self.skills_metadata_brief_path, default={})
-        existing_skills = existing.get("skills", []) if isinstance(existing, dict) else []
-        if existing_skills != brief_skills:
-            self._save_json(self.skills_metadata_brief_path, brief_data)
+        self.prompt_service.ensure_brief_file()
 
     def _save_json(self, path, data):
         """
@@ -0,0 +1,270 @@
+"""
+上下文打包器。
+模块职责：
+1) 用本地近似规则估算文本的 token 数（不调用分词接口）。
+2) 按“时间新近 + 与当前问题的相关度”为上下文片段排序，在给定 token 预算内挑选片段，保持原有顺序输出。
+3) 放不下的片段压缩为抽取式摘要附在末尾，而不是直接丢弃或从中间截断；最新的片段总是入选。
+4) 提供保持 JSON 结构的压缩（截短长字符串、省略长列表尾部），供执行器的步骤结果使用。
+各角色的预算可在 config.json 的 context_budget 中配置：{"planner": 1500, "executor": 3000, "memory": 2000}。
+"""
+import json
+import math
+import os
+import re
+import sys
+from collections import namedtuple
+from typing import Any, Callable, List, Optional, Sequence
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+try:
+    from tools.config_loader import get_context_budget_config
+except ImportError:
+    def get_context_budget_config():
+        return {}
+
+ROLE_PLANNER = "planner"
+ROLE_EXECUTOR = "executor"
+ROLE_MEMORY = "memory"
+
+DEFAULT_BUDGETS = {
+    ROLE_PLANNER: 1500,
+    ROLE_EXECUTOR: 3000,
+    ROLE_MEMORY: 2000,
+}
+
+# 近似分词比例：中日韩字符约 0.7 token/字，其余字符约 0.3 token/字（约 3.3 字符一个 token）
+_CJK_TOKENS_PER_CHAR = 0.7
+_OTHER_TOKENS_PER_CHAR = 0.3
+_CJK_PATTERN = re.compile("[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+_SPACE_PATTERN = re.compile(r"\s+")
+
+# 排序权重：新近度与相关度
+_RECENCY_WEIGHT = 0.6
+_RELEVANCE_WEIGHT = 0.4
+# 发生溢出时，摘要最多占用的预算比例
+_SUMMARY_SHARE = 0.2
+_SUMMARY_ITEM_CHARS = 40
+# 单条对话记忆最多占用的预算比例，超出时截短回答，保证最新一轮总能入选
+_RECORD_SHARE = 0.5
+
+# fragment：key 为调用方的原始对象，text 为参与估算与相关度计算的文本
+ContextFragment = namedtuple("ContextFragment", ["key", "text"])
+PackResult = namedtuple("PackResult", ["selected", "summary", "tokens"])
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    近似估算文本的 token 数，偏保守（宁可略多）。
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    other = len(_SPACE_PATTERN.sub(" ", text)) - cjk
+    return int(math.ceil(cjk * _CJK_TOKENS_PER_CHAR + max(0, other) * _OTHER_TOKENS_PER_CHAR))
+
+
+def clip_text(text: str, max_tokens: int, suffix: str = "…") -> str:
+    """
+    把文本截短到约 max_tokens 个 token 以内。
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) + 1 <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + suffix
+
+
+def _bigrams(text: str) -> set:
+    text = _SPACE_PATTERN.sub("", str(text or "").lower())
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def relevance_score(text: str, query_bigrams: set) -> float:
+    """
+    片段与查询的相关度：查询的字符二元组在片段中出现的比例（0~1）。
+    """
+    if not query_bigrams:
+        return 0.0
+    return len(query_bigrams & _bigrams(text)) / len(query_bigrams)
+
+
+def get_context_budget(role: str) -> int:
+    """
+    读取角色的 token 预算，未配置或配置无效时使用默认值。
+    """
+    value = get_context_budget_config().get(role)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_BUDGETS.get(role, DEFAULT_BUDGETS[ROLE_MEMORY])
+    return value if value > 0 else DEFAULT_BUDGETS.get(role, DEFAULT_BUDGETS[ROLE_MEMORY])
+
+
+def _default_summary(fragment: ContextFragment) -> str:
+    first_line = str(fragment.text or "").strip().split("\n", 1)[0]
+    return first_line[:_SUMMARY_ITEM_CHARS] + ("…" if len(first_line) > _SUMMARY_ITEM_CHARS else "")
+
+
+class ContextPacker:
+    """
+    按 token 预算挑选上下文片段。片段按时间先后传入（最后一个最新）。
+    """
+
+    def __init__(self, role: str, budget: Optional[int] = None) -> None:
+        self.role = role
+        self.budget = budget if budget is not None else get_context_budget(role)
+
+    def pack(
+        self,
+        fragments: Sequence[ContextFragment],
+        query: str = "",
+        summarize: Optional[Callable[[ContextFragment], str]] = None,
+    ) -> PackResult:
+        """
+        挑选片段。
+
+        Args:
+            fragments: 按时间先后排列的片段。
+            query: 当前问题，用于计算相关度；为空时只按新近度排序。
+            summarize: 溢出片段的单行摘要函数，默认取首行前若干字。
+
+        Returns:
+            PackResult(selected=入选片段（保持原顺序）, summary=溢出摘要文本（无溢出时为空）, tokens=估算用量)。
+        """
+        fragments = list(fragments)
+        if not fragments:
+            return PackResult([], "", 0)
+        costs = [estimate_tokens(fragment.text) for fragment in fragments]
+        total = sum(costs)
+        if total <= self.budget:
+            return PackResult(fragments, "", total)
+
+        query_bigrams = _bigrams(query)
+        count = len(fragments)
+        scores = []
+        for index, fragment in enumerate(fragments):
+            recency = (index + 1) / count
+            relevance = relevance_score(fragment.text, query_bigrams)
+            scores.append(_RECENCY_WEIGHT * recency + _RELEVANCE_WEIGHT * relevance)
+
+        available = self.budget - int(self.budget * _SUMMARY_SHARE)
+        chosen = set()
+        used = 0
+        # 最新片段优先占用预算，不会因为篇幅较长而被更早的短片段挤掉
+        newest = count - 1
+        order = [newest] + sorted(range(newest), key=lambda i: scores[i], reverse=True)
+        for index in order:
+            if used + costs[index] <= available:
+                chosen.add(index)
+                used += costs[index]
+
+        summarize = summarize or _default_summary
+        summary_lines = [summarize(fragments[i]) for i in range(count) if i not in chosen]
+        summary = clip_text("\n".join(line for line in summary_lines if line), self.budget - used)
+        selected = [fragments[i] for i in sorted(chosen)]
+        return PackResult(selected, summary, used + estimate_tokens(summary))
+
+
+def shrink_json(value: Any, max_tokens: int) -> Any:
+    """
+    在保持 JSON 结构的前提下压缩数据：逐步缩短长字符串、省略长列表尾部，直到估算用量不超过 max_tokens。
+    无法再压缩时返回最小化后的结果。
+    """
+    if estimate_tokens(json.dumps(value, ensure_ascii=False)) <= max_tokens:
+        return value
+    max_chars, max_items = 2000, 50
+    shrunk = value
+    while True:
+        shrunk = _shrink_value(value, max_chars, max_items)
+        if estimate_tokens(json.dumps(shrunk, ensure_ascii=False)) <= max_tokens:
+            return shrunk
+        if max_chars <= 16 and max_items <= 1:
+            return shrunk
+        max_chars = max(16, max_chars // 2)
+        max_items = max(1, max_items // 2)
+
+
+def _shrink_value(value: Any, max_chars: int, max_items: int) -> Any:
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else value[:max_chars] + "…"
+    if isinstance(value, dict):
+        return {key: _shrink_value(item, max_chars, max_items) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [_shrink_value(item, max_chars, max_items) for item in value[:max_items]]
+        if len(value) > max_items:
+            items.append(f"...(省略 {len(value) - max_items} 项)")
+        return items
+    return value
+
+
+def pack_json_entries(entries: List[Any], budget: int, weights: Optional[List[float]] = None,
+                      query: str = "") -> PackResult:
+    """
+    打包一组 JSON 条目（如执行器的前置步骤结果）：先按权重分配预算并结构化压缩各条目，再按预算挑选。
+    入选条目保持原顺序，序列化后仍是合法 JSON。
+    """
+    if not entries:
+        return PackResult([], "", 0)
+    weights = list(weights or [1.0] * len(entries))
+    total_weight = sum(weights) or 1.0
+    fragments = []
+    for entry, weight in zip(entries, weights):
+        text = json.dumps(entry, ensure_ascii=False)
+        share = max(64, int(budget * weight / total_weight))
+        if estimate_tokens(text) > share:
+            entry = shrink_json(entry, share)
+            text = json.dumps(entry, ensure_ascii=False)
+        fragments.append(ContextFragment(entry, text))
+    result = ContextPacker(ROLE_EXECUTOR, budget).pack(fragments, query)
+    return PackResult([fragment.key for fragment in result.selected], result.summary, result.tokens)
+
+
+def _record_text(record: Any) -> str:
+    question = str(record.get("question", "")).strip()
+    response = str(record.get("response", "")).strip()
+    return f"用户：{question}\n助手：{response}"
+
+
+def _record_summary(fragment: ContextFragment) -> str:
+    question = str(fragment.key.get("question", "")).strip().replace("\n", " ")
+    if len(question) > _SUMMARY_ITEM_CHARS:
+        question = question[:_SUMMARY_ITEM_CHARS] + "…"
+    return f"用户曾问：{question}" if question else ""
+
+
+def _clip_record(record: Any, max_tokens: int) -> Any:
+    """
+    超出 max_tokens 的记录返回截短回答后的副本（问题保留），否则原样返回。
+    """
+    if estimate_tokens(_record_text(record)) <= max_tokens:
+        return record
+    question_tokens = estimate_tokens(_record_text(dict(record, response="")))
+    clipped = dict(record)
+    clipped["response"] = clip_text(str(record.get("response", "")).strip(), max(16, max_tokens - question_tokens))
+    return clipped
+
+
+def pack_memory_records(records: List[Any], role: str, query: str = "") -> PackResult:
+    """
+    打包对话记忆记录（question/response 字典），溢出的记录摘要为“用户曾问：…”列表。
+    单条记录先截短到预算的一定比例，保证最新一轮对话不会因回答过长被整条丢弃。
+    返回的 selected 为入选的记录（被截短的记录为副本）。
+    """
+    packer = ContextPacker(role)
+    share = max(64, int(packer.budget * _RECORD_SHARE))
+    fragments = []
+    for record in records:
+        if isinstance(record, dict):
+            record = _clip_record(record, share)
+            fragments.append(ContextFragment(record, _record_text(record)))
+    result = packer.pack(fragments, query, summarize=_record_summary)
+    return PackResult([fragment.key for fragment in result.selected], result.summary, result.tokens)
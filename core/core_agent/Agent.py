@@ -6,10 +6,12 @@ import os
 import sys
 import json
 import queue
+import asyncio
 import threading
 import contextlib
+import contextvars
+import time
 import types
-from datetime import datetime, timedelta
 
 # 将项目根目录加入 sys.path，保证跨目录导入稳定
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -18,14 +20,21 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 from core.ai_agent import AIAgent
+from core.context_packer import ROLE_PLANNER, pack_memory_records
 from core.core_agent.agent_planner import AgentPlanner
 from core.core_agent.agent_excuter import AgentExecutor
 from core.core_agent.agent_reviewer import AgentReviewer
+from core.stream_tokens import (
+    PROGRESS_START, PROGRESS_END, FINAL_START, FINAL_END, strip_control_tokens
+)
+
+# 注入规划阶段的历史对话时长（秒）
+HISTORY_WINDOW_SECONDS = 3600
 
 
 class _QueueWriter:
     """
-    将输出写入队列与缓存，支持被 redirect_stdout 捕获。
+    将输出写入队列与缓存，作为当前会话 stdout 的路由目标。
     """
 
     def __init__(self, output_queue, buffer_list):
@@ -52,25 +61,98 @@ class _QueueWriter:
         return None
 
 
+# 当前上下文（线程/协程）的输出写入器；为空时输出到原始 stdout
+_current_writer = contextvars.ContextVar("agent_stdout_writer", default=None)
+_router_lock = threading.Lock()
+# 正在路由输出的会话数；归零时恢复原始 sys.stdout
+_router_users = 0
+
+
+class _StdoutRouter:
+    """
+    按上下文分发 stdout：多个会话在不同线程并发执行时，各自的 print 只进入各自的输出队列。
+    （contextlib.redirect_stdout 会替换进程级 sys.stdout，并发时会串流。）
+    原始 stdout 为 None（如 pythonw 启动）时，上下文外的输出直接丢弃，与原生 print 行为一致。
+    """
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+
+    def write(self, text):
+        writer = _current_writer.get()
+        if writer is not None:
+            return writer.write(text)
+        if self.fallback is None:
+            return len(text) if text else 0
+        return self.fallback.write(text)
+
+    def flush(self):
+        writer = _current_writer.get()
+        if writer is not None:
+            return writer.flush()
+        if self.fallback is None:
+            return None
+        return self.fallback.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.fallback, name)
+
+
+@contextlib.contextmanager
+def _route_stdout(writer):
+    """
+    在当前上下文内把 print 输出路由到 writer；仅在有会话路由输出期间替换 sys.stdout。
+    """
+    global _router_users
+    with _router_lock:
+        if _router_users == 0 and not isinstance(sys.stdout, _StdoutRouter):
+            sys.stdout = _StdoutRouter(sys.stdout)
+        _router_users += 1
+    token = _current_writer.set(writer)
+    try:
+        yield writer
+    finally:
+        _current_writer.reset(token)
+        with _router_lock:
+            _router_users -= 1
+            # 期间被其他代码替换过的 stdout 保持不动
+            if _router_users == 0 and isinstance(sys.stdout, _StdoutRouter):
+                sys.stdout = sys.stdout.fallback
+
+
+class _AsyncQueueAdapter:
+    """
+    以 queue.Queue 的 put 接口把数据从工作线程投递到 asyncio.Queue。
+    """
+
+    def __init__(self, loop, async_queue):
+        self.loop = loop
+        self.async_queue = async_queue
+
+    def put(self, item):
+        self.loop.call_soon_threadsafe(self.async_queue.put_nowait, item)
+
+
 class AgentSession:
     """
     Agent 会话：统一对外流式输出，并维护对话记忆。
     """
 
-    def __init__(self):
+    def __init__(self, memory_path=None):
         """
         初始化会话，创建规划器、执行器与记忆代理。
+        memory_path: 对话记忆文件路径，为空时使用默认的 core_chat_memory.json。
         """
         self.planner = AgentPlanner()
         self.executor = AgentExecutor()
         self.reviewer = AgentReviewer()
-        self.memory_agent = AIAgent()
+        self.memory_agent = AIAgent(memory_path=memory_path)
         self.tool_executed_in_last_chat = False
         self.max_review_rounds = 3
-        self.progress_start_token = "[[PROGRESS_START]]"
-        self.progress_end_token = "[[PROGRESS_END]]"
-        self.final_start_token = "[[FINAL_START]]"
-        self.final_end_token = "[[FINAL_END]]"
+        self.progress_start_token = PROGRESS_START
+        self.progress_end_token = PROGRESS_END
+        self.final_start_token = FINAL_START
+        self.final_end_token = FINAL_END
 
     def clear_context(self):
         """
@@ -117,13 +199,37 @@ class AgentSession:
 
         return _generator()
 
+    async def achat(self, text):
+        """
+        异步流式聊天入口：对话在工作线程中执行，输出经 asyncio.Queue 回传，
+        等待输出时不阻塞事件循环，供 FastAPI/WebSocket 等异步服务端使用。
+        """
+        loop = asyncio.get_running_loop()
+        async_queue = asyncio.Queue()
+        output_queue = _AsyncQueueAdapter(loop, async_queue)
+        buffer_list = []
+
+        def _worker():
+            try:
+                self._execute_turn(text, output_queue, buffer_list)
+            finally:
+                output_queue.put(None)
+
+        threading.Thread(target=_worker, daemon=True).start()
+
+        while True:
+            chunk = await async_queue.get()
+            if chunk is None:
+                break
+            yield chunk
+
     def _execute_turn(self, user_text, output_queue, buffer_list):
         """
         执行一轮对话流程：规划 -> 执行 -> 审查 -> 回答 -> 记忆写入。
         """
         writer = _QueueWriter(output_queue, buffer_list)
         try:
-            with contextlib.redirect_stdout(writer):
+            with _route_stdout(writer):
                 writer.write(self.progress_start_token)
                 # 构造包含历史记忆的用户输入，保证规划阶段具备上下文
                 enriched_text = self._build_enriched_user_text(user_text)
@@ -197,32 +303,20 @@ class AgentSession:
         """
         将历史对话记忆注入到当前用户输入中，供规划阶段读取上下文。
         """
-        history = self.memory_agent._load_memory()
+        # 只取最近 1 小时的记录：记忆存储按时间戳索引，无需加载并解析全部历史
+        since_ts = time.time() - HISTORY_WINDOW_SECONDS
+        history = self.memory_agent.memory_store.since(since_ts)
         if not history:
             return user_text
 
+        # 按规划阶段的 token 预算挑选记录，放不下的以摘要形式注入
+        packed = pack_memory_records(history, ROLE_PLANNER, user_text)
         history_lines = []
-        # 时间输出格式参考："time": "2026-02-17T00:56:02.771980"
-        now_time = datetime.now()
-        # 限定上下文历史时长为1小时
-        history_duration = timedelta(hours=1)
-
-        for record in history:
+        if packed.summary:
+            history_lines.append(f"（其余历史对话摘要）\n{packed.summary}")
+        for record in packed.selected:
             question = str(record.get("question", "")).strip()
             response = str(record.get("response", "")).strip()
-            time_text = str(record.get("time", "")).strip()
-            # 限定将超出上下文历史时长的记录过滤掉，不注入
-            if not time_text:
-                continue
-            try:
-                record_time = datetime.fromisoformat(time_text)
-            except Exception:
-                try:
-                    record_time = datetime.strptime(time_text, "%Y-%m-%d %H:%M:%S.%f")
-                except Exception:
-                    continue
-            if record_time < now_time - history_duration:
-                continue   
             if question:
                 history_lines.append(f"用户：{question}")
             if response:
@@ -238,16 +332,7 @@ class AgentSession:
         """
         清理流式控制标记，避免污染对话记忆。
         """
-        if not isinstance(text, str):
-            return str(text or "")
-        for token in [
-            self.progress_start_token,
-            self.progress_end_token,
-            self.final_start_token,
-            self.final_end_token
-        ]:
-            text = text.replace(token, "")
-        return text
+        return strip_control_tokens(text)
 
 
 def run_agent_terminal():
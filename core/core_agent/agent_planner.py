@@ -37,7 +37,7 @@ class AgentPlanner:
         生成规划并以流式方式输出思考过程文本（真流式）。
         execution_history: 上一轮的执行结果（包含 excute plan 和 step results），用于前置审查。
         """
-        system_prompt = self._build_system_prompt()
+        role_instruction = self._build_role_instruction()
         
         # 如果有执行历史，将其注入到用户输入上下文中
         final_user_text = user_text
@@ -56,10 +56,8 @@ class AgentPlanner:
         
         # 允许规划器调用信息获取类技能
         # 使用 call_core 接口，允许模型在生成最终 JSON 前先调用工具
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": final_user_text}
-        ]
+        # 稳定前缀（职责 + 技能 + 规划器说明）在前，统计与时间紧贴用户输入之前，便于命中前缀缓存
+        messages = self.agent.build_prompt_messages(final_user_text, role_instruction)
         
         # 注意：这里我们原本是直接 call_llm 生成 JSON。
         # 为了支持“规划器调用技能获取信息”，我们需要改用 agent.call_core 的逻辑，或者在这里手动处理 tool_calls。
@@ -210,9 +208,9 @@ class AgentPlanner:
         return text.replace('\\n', '\n').replace('\\"', '"').replace('\\\\', '\\').replace('\\t', '\t')
 
 
-    def _build_system_prompt(self):
+    def _build_role_instruction(self):
         """
-        构建规划器系统提示词。
+        构建规划器的角色说明，追加在共享的稳定系统提示词之后。
         """
         base_instruction = (
             "你是任务规划器，只负责理解用户需求并生成规划 JSON。"
@@ -232,11 +230,13 @@ class AgentPlanner:
             "3) \"excute plan\"：列表，每项包含 step ，desc 与 skill，"
             "其中 step 为执行的步骤序号，desc 为对任务的详细描述，skill 为需要调用的技能名称以及技能的参数。"
             "skill 字段必须包含技能名称与需要的参数，参数必须是 JSON 格式。"
+            "每项可选 depends_on 字段：列表，填写当前步骤依赖的前置步骤序号（需要使用其结果或必须在其之后执行），"
+            "无依赖的步骤填 []，它们会被并发执行；不确定时省略该字段，执行器将按顺序保守执行。"
             "4) \"thinking\"：文字，逐步建立解决方案的思考过程,专门针对excute plan中的每个步骤都要标注好步骤序号并换行显示。"
             "当不需要调用技能时，description 与 excute plan 可为空列表，但 thinking 仍需完整。"
         )
 
-        return f"{self.agent.get_system_prompt()}\n\n{base_instruction}\n{json_spec}"
+        return f"{base_instruction}\n{json_spec}"
 
     def _extract_plan_json(self, text):
         """
@@ -193,10 +193,7 @@ class AgentReviewer:
         return str(result or "")
 
     def _call_llm_stream(self, prompt: str):
-        messages = [
-            {"role": "system", "content": self.agent.get_system_prompt()},
-            {"role": "user", "content": prompt}
-        ]
+        messages = self.agent.build_prompt_messages(prompt)
         response_stream = call_llm(messages=messages, stream=True)
         if isinstance(response_stream, str):
             def _single():
@@ -1,5 +1,4 @@
 import os
-import requests
 import json
 import sys
 
@@ -22,6 +21,8 @@ except ImportError:
     def get_llm_config():
         return {}
 
+from core.llm_transport import TransportError, get_transport, get_async_transport, parse_sse_line
+
 
 def _record_usage_from_result(result):
     if not isinstance(result, dict):
@@ -31,27 +32,18 @@ def _record_usage_from_result(result):
         return
     token_cal.record_usage(usage)
 
-def call_llm(prompt=None, system_prompt="You are a helpful assistant.", messages=None, stream=False):
+def _build_request(prompt, system_prompt, messages, stream):
     """
-    调用 LLM API 处理 prompt。
-    参数：
-        prompt: 用户输入（如果提供了 messages，此参数会被忽略或作为最新一条用户消息追加）
-        system_prompt: 系统提示词（如果提供 messages 且 messages[0] 为 system，则可能被忽略）
-        messages: 完整的消息历史列表 [{"role": "user", "content": ...}, ...]
-        stream: 是否使用流式输出
+    根据配置与参数构造请求，返回 (api_url, headers, data, error_msg)。
     """
     config = get_llm_config()
-    
+
     api_key = config.get("api_key")
     model = config.get("model")
     base_url = config.get("base_url")
 
     if not all([api_key, model, base_url]):
-        msg = "错误：缺少配置项（api_key、model 或 base_url），请检查 config.json。"
-        if stream:
-            yield msg
-            return
-        return msg
+        return None, None, None, "错误：缺少配置项（api_key、model 或 base_url），请检查 config.json。"
 
     headers = {
         "Authorization": f"Bearer {api_key}",
@@ -86,39 +78,58 @@ def call_llm(prompt=None, system_prompt="You are a helpful assistant.", messages
     else:
         api_url = base_url
 
+    return api_url, headers, data, None
+
+
+def _extract_content(result):
+    if "choices" in result and len(result["choices"]) > 0:
+        return result["choices"][0]["message"]["content"]
+    return f"Error: Unexpected response format: {result}"
+
+
+def call_llm(prompt=None, system_prompt="You are a helpful assistant.", messages=None, stream=False, timeout=None):
+    """
+    调用 LLM API 处理 prompt。
+    参数：
+        prompt: 用户输入（如果提供了 messages，此参数会被忽略或作为最新一条用户消息追加）
+        system_prompt: 系统提示词（如果提供 messages 且 messages[0] 为 system，则可能被忽略）
+        messages: 完整的消息历史列表 [{"role": "user", "content": ...}, ...]
+        stream: 是否使用流式输出
+        timeout: 超时设置，数值或 (connect, read) 元组；为空时读取 config.json 的 llm 配置
+    """
+    api_url, headers, data, error_msg = _build_request(prompt, system_prompt, messages, stream)
+    if error_msg:
+        if stream:
+            yield error_msg
+            return
+        return error_msg
+
+    response = None
     try:
-        response = requests.post(api_url, headers=headers, json=data, timeout=30, stream=stream)
-        response.raise_for_status()
-        
+        # 复用进程级连接池，避免每次调用重复 TCP/TLS 握手
+        response = get_transport().post(api_url, headers, data, stream=stream, timeout=timeout)
+
         if stream:
             last_usage = None
             for line in response.iter_lines():
-                if line:
-                    line = line.decode('utf-8')
-                    if line.startswith("data: "):
-                        content = line[6:]  # Remove "data: "
-                        if content == "[DONE]":
-                            break
-                        try:
-                            json_data = json.loads(content)
-                            if isinstance(json_data, dict) and isinstance(json_data.get("usage"), dict):
-                                last_usage = json_data.get("usage")
-                            delta = json_data.get("choices", [{}])[0].get("delta", {})
-                            if "content" in delta:
-                                yield delta["content"]
-                        except json.JSONDecodeError:
-                            pass
+                is_done, json_data = parse_sse_line(line)
+                if is_done:
+                    break
+                if not isinstance(json_data, dict):
+                    continue
+                if isinstance(json_data.get("usage"), dict):
+                    last_usage = json_data.get("usage")
+                delta = json_data.get("choices", [{}])[0].get("delta", {})
+                if "content" in delta:
+                    yield delta["content"]
             if last_usage:
                 token_cal.record_usage(last_usage)
         else:
             result = response.json()
             _record_usage_from_result(result)
-            if "choices" in result and len(result["choices"]) > 0:
-                return result["choices"][0]["message"]["content"]
-            else:
-                return f"Error: Unexpected response format: {result}"
-            
-    except requests.exceptions.RequestException as e:
+            return _extract_content(result)
+
+    except TransportError as e:
         msg = f"HTTP 请求失败：{str(e)}"
         if stream:
             yield msg
@@ -128,3 +139,54 @@ def call_llm(prompt=None, system_prompt="You are a helpful assistant.", messages
         if stream:
             yield msg
         return msg
+    finally:
+        if response is not None:
+            response.close()
+
+
+async def acall_llm(prompt=None, system_prompt="You are a helpful assistant.", messages=None, stream=False, timeout=None):
+    """
+    call_llm 的 asyncio 版本，参数含义一致。
+    stream=True 时返回异步生成器（逐段 yield 文本，错误信息同样以文本 yield）；
+    stream=False 时直接返回完整回复文本。
+    """
+    if stream:
+        return _astream_llm(prompt, system_prompt, messages, timeout)
+
+    api_url, headers, data, error_msg = _build_request(prompt, system_prompt, messages, False)
+    if error_msg:
+        return error_msg
+    try:
+        result = await get_async_transport().post_json(api_url, headers, data, timeout=timeout)
+        _record_usage_from_result(result)
+        return _extract_content(result)
+    except TransportError as e:
+        return f"HTTP 请求失败：{str(e)}"
+    except Exception as e:
+        return f"错误：{str(e)}"
+
+
+async def _astream_llm(prompt, system_prompt, messages, timeout):
+    api_url, headers, data, error_msg = _build_request(prompt, system_prompt, messages, True)
+    if error_msg:
+        yield error_msg
+        return
+    try:
+        last_usage = None
+        async for line in get_async_transport().stream_lines(api_url, headers, data, timeout=timeout):
+            is_done, json_data = parse_sse_line(line)
+            if is_done:
+                break
+            if not isinstance(json_data, dict):
+                continue
+            if isinstance(json_data.get("usage"), dict):
+                last_usage = json_data.get("usage")
+            delta = json_data.get("choices", [{}])[0].get("delta", {})
+            if "content" in delta:
+                yield delta["content"]
+        if last_usage:
+            token_cal.record_usage(last_usage)
+    except TransportError as e:
+        yield f"HTTP 请求失败：{str(e)}"
+    except Exception as e:
+        yield f"错误：{str(e)}"
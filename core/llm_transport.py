@@ -0,0 +1,344 @@
+"""
+模块职责：
+1) 为 LLM 调用提供进程级共享的 HTTP 连接池（keep-alive），避免每次调用重复握手。
+2) 安装 httpx + h2 时优先使用 HTTP/2，否则回退到 requests.Session 连接池。
+3) 统一连接/读取超时配置，支持调用方按调用点覆盖。
+4) 提供 asyncio 版本的传输接口，供异步服务端复用。
+"""
+
+import asyncio
+import importlib.util
+import json
+import threading
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    requests = None
+    HTTPAdapter = None
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    from tools.config_loader import get_llm_config
+except ImportError:
+    def get_llm_config():
+        return {}
+
+
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 30.0
+DEFAULT_POOL_SIZE = 16
+
+
+class TransportError(Exception):
+    """
+    传输层统一异常：屏蔽 requests / httpx 的异常差异。
+    """
+
+
+def _http2_available():
+    """
+    判断当前环境是否支持 HTTP/2（需要 httpx 与 h2）。
+    """
+    return httpx is not None and importlib.util.find_spec("h2") is not None
+
+
+def resolve_timeout(timeout=None):
+    """
+    解析超时配置，返回 (connect, read) 元组。
+    timeout 可为 None（读取 config.json 默认值）、单个数值或 (connect, read) 元组。
+    """
+    if isinstance(timeout, (tuple, list)) and len(timeout) == 2:
+        return float(timeout[0]), float(timeout[1])
+    if isinstance(timeout, (int, float)):
+        return float(timeout), float(timeout)
+    config = get_llm_config()
+    try:
+        connect = float(config.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT))
+    except (TypeError, ValueError):
+        connect = DEFAULT_CONNECT_TIMEOUT
+    try:
+        read = float(config.get("read_timeout", DEFAULT_READ_TIMEOUT))
+    except (TypeError, ValueError):
+        read = DEFAULT_READ_TIMEOUT
+    return connect, read
+
+
+def _pool_size():
+    try:
+        return max(int(get_llm_config().get("pool_size", DEFAULT_POOL_SIZE)), 1)
+    except (TypeError, ValueError):
+        return DEFAULT_POOL_SIZE
+
+
+def _use_http2():
+    return bool(get_llm_config().get("http2", True)) and _http2_available()
+
+
+class _Response:
+    """
+    响应包装：对外只暴露 json / iter_lines / close，屏蔽底层库差异。
+    """
+
+    def __init__(self, raw, closer=None):
+        self._raw = raw
+        self._closer = closer
+
+    def json(self):
+        try:
+            return self._raw.json()
+        except ValueError as exc:
+            raise TransportError(f"响应不是合法 JSON：{exc}") from exc
+
+    def iter_lines(self):
+        """
+        逐行返回解码后的文本行（空行跳过）。
+        """
+        try:
+            if httpx is not None and isinstance(self._raw, httpx.Response):
+                for line in self._raw.iter_lines():
+                    if line:
+                        yield line
+                return
+            for line in self._raw.iter_lines():
+                if line:
+                    yield line.decode("utf-8") if isinstance(line, bytes) else line
+        except Exception as exc:
+            raise TransportError(str(exc)) from exc
+
+    def close(self):
+        if self._closer is not None:
+            self._closer()
+            self._closer = None
+
+
+class LLMTransport:
+    """
+    同步传输层：持有长连接池，线程安全，可被多个 Agent 共享。
+    """
+
+    def __init__(self, pool_size=None, http2=None):
+        self.pool_size = pool_size or _pool_size()
+        self.http2 = _use_http2() if http2 is None else (bool(http2) and _http2_available())
+        self._lock = threading.Lock()
+        self._client = None
+
+    def _get_client(self):
+        """
+        懒加载底层客户端，首次调用时创建连接池。
+        """
+        if self._client is not None:
+            return self._client
+        with self._lock:
+            if self._client is not None:
+                return self._client
+            if self.http2 or requests is None:
+                if httpx is None:
+                    raise TransportError("未安装 requests 或 httpx，无法发起 HTTP 请求")
+                limits = httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size
+                )
+                self._client = httpx.Client(http2=self.http2, limits=limits)
+            else:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._client = session
+            return self._client
+
+    def post(self, url, headers, payload, stream=False, timeout=None):
+        """
+        发送 POST 请求并返回 _Response；HTTP 错误统一抛出 TransportError。
+        """
+        connect, read = resolve_timeout(timeout)
+        client = self._get_client()
+        try:
+            if httpx is not None and isinstance(client, httpx.Client):
+                httpx_timeout = httpx.Timeout(read, connect=connect)
+                if stream:
+                    ctx = client.stream("POST", url, headers=headers, json=payload, timeout=httpx_timeout)
+                    raw = ctx.__enter__()
+                    try:
+                        raw.raise_for_status()
+                    except Exception:
+                        ctx.__exit__(None, None, None)
+                        raise
+                    return _Response(raw, closer=lambda: ctx.__exit__(None, None, None))
+                raw = client.post(url, headers=headers, json=payload, timeout=httpx_timeout)
+                raw.raise_for_status()
+                return _Response(raw)
+
+            raw = client.post(url, headers=headers, json=payload, timeout=(connect, read), stream=stream)
+            try:
+                raw.raise_for_status()
+            except Exception:
+                raw.close()
+                raise
+            return _Response(raw, closer=raw.close)
+        except TransportError:
+            raise
+        except Exception as exc:
+            raise TransportError(str(exc)) from exc
+
+    def close(self):
+        """
+        关闭连接池（进程退出或重新加载配置时调用）。
+        """
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+
+class AsyncLLMTransport:
+    """
+    异步传输层：安装 httpx 时使用 AsyncClient；否则把同步传输放到线程中执行。
+    """
+
+    def __init__(self, sync_transport=None, pool_size=None, http2=None):
+        self.pool_size = pool_size or _pool_size()
+        self.http2 = _use_http2() if http2 is None else (bool(http2) and _http2_available())
+        self._sync_transport = sync_transport
+        self._clients = {}
+
+    def _get_client(self):
+        """
+        AsyncClient 绑定事件循环，因此按循环分别缓存。
+        """
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(id(loop))
+        if client is None:
+            limits = httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size
+            )
+            client = httpx.AsyncClient(http2=self.http2, limits=limits)
+            self._clients[id(loop)] = client
+        return client
+
+    async def post_json(self, url, headers, payload, timeout=None):
+        """
+        非流式请求，返回解析后的 JSON。
+        """
+        if httpx is None:
+            response = await asyncio.to_thread(
+                self._sync_transport.post, url, headers, payload, False, timeout
+            )
+            return response.json()
+        connect, read = resolve_timeout(timeout)
+        try:
+            raw = await self._get_client().post(
+                url, headers=headers, json=payload, timeout=httpx.Timeout(read, connect=connect)
+            )
+            raw.raise_for_status()
+            return raw.json()
+        except Exception as exc:
+            raise TransportError(str(exc)) from exc
+
+    async def stream_lines(self, url, headers, payload, timeout=None):
+        """
+        流式请求，异步逐行返回文本行。
+        """
+        if httpx is None:
+            async for line in self._stream_lines_in_thread(url, headers, payload, timeout):
+                yield line
+            return
+        connect, read = resolve_timeout(timeout)
+        try:
+            async with self._get_client().stream(
+                "POST", url, headers=headers, json=payload,
+                timeout=httpx.Timeout(read, connect=connect)
+            ) as raw:
+                raw.raise_for_status()
+                async for line in raw.aiter_lines():
+                    if line:
+                        yield line
+        except Exception as exc:
+            raise TransportError(str(exc)) from exc
+
+    async def _stream_lines_in_thread(self, url, headers, payload, timeout):
+        """
+        无 httpx 时的降级方案：后台线程读取同步流，通过 asyncio.Queue 回传。
+        """
+        loop = asyncio.get_running_loop()
+        line_queue = asyncio.Queue()
+        done = object()
+
+        def _worker():
+            response = None
+            try:
+                response = self._sync_transport.post(url, headers, payload, True, timeout)
+                for line in response.iter_lines():
+                    loop.call_soon_threadsafe(line_queue.put_nowait, line)
+            except Exception as exc:
+                loop.call_soon_threadsafe(line_queue.put_nowait, exc)
+            finally:
+                if response is not None:
+                    response.close()
+                loop.call_soon_threadsafe(line_queue.put_nowait, done)
+
+        threading.Thread(target=_worker, daemon=True).start()
+        while True:
+            item = await line_queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item if isinstance(item, TransportError) else TransportError(str(item))
+            yield item
+
+    async def aclose(self):
+        clients = list(self._clients.values())
+        self._clients = {}
+        for client in clients:
+            await client.aclose()
+
+
+_transport = None
+_async_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """
+    获取进程级共享的同步传输实例。
+    """
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = LLMTransport()
+    return _transport
+
+
+def get_async_transport():
+    """
+    获取进程级共享的异步传输实例。
+    """
+    global _async_transport
+    if _async_transport is None:
+        with _transport_lock:
+            if _async_transport is None:
+                _async_transport = AsyncLLMTransport(sync_transport=get_transport())
+    return _async_transport
+
+
+def parse_sse_line(line):
+    """
+    解析一行 SSE 数据，返回 (is_done, json_data)；无法解析时 json_data 为 None。
+    """
+    if not line.startswith("data: "):
+        return False, None
+    content = line[6:]
+    if content == "[DONE]":
+        return True, None
+    try:
+        return False, json.loads(content)
+    except json.JSONDecodeError:
+        return False, None
@@ -0,0 +1,339 @@
+"""
+对话记忆存储。
+模块职责：
+1) 以 JSONL 追加写入对话记录，每条记录写入时即附带数值时间戳（ts），读取时无需再解析 ISO 时间。
+2) 活动段超过大小或时间上限后轮转为归档段，归档段默认全部保留，单次读写的开销与历史总量无关。
+3) 内存中保留最近若干条记录的有序索引，“最近 N 条”“某时刻之后”查询直接命中，超出范围时才按段倒序读取归档。
+4) 首次使用时把旧版 JSON 列表格式的记忆文件导入为 JSONL。
+5) 存储实例按路径共享、弱引用缓存，使用它的 Agent 全部释放后随之回收（服务端会话被淘汰时不再常驻内存）。
+归档段数量上限可在 config.json 中配置：{"memory": {"max_archives": 30}}，为 0 或未配置时不删除归档。
+不依赖 Qt，服务端也可导入。
+"""
+import json
+import os
+import threading
+import time
+import sys
+import uuid
+import weakref
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+try:
+    from tools.config_loader import get_memory_config
+except ImportError:
+    def get_memory_config():
+        return {}
+
+# 活动段轮转条件：超过该字节数，或首条记录早于该秒数
+DEFAULT_MAX_SEGMENT_BYTES = 1024 * 1024
+DEFAULT_MAX_SEGMENT_AGE = 7 * 24 * 3600
+# 保留的归档段数量，超出后删除最旧的段；0 表示全部保留
+DEFAULT_MAX_ARCHIVES = 0
+# 内存中常驻的最近记录条数
+DEFAULT_TAIL_SIZE = 200
+
+ACTIVE_SUFFIX = ".jsonl"
+ARCHIVE_DIR_SUFFIX = "_archive"
+LEGACY_IMPORTED_SUFFIX = ".imported"
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _parse_time(text) -> Optional[float]:
+    """
+    将旧记录的 ISO 时间文本转为时间戳，仅在导入或遇到缺少 ts 的记录时使用。
+    """
+    text = str(text or "").strip()
+    if not text:
+        return None
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(text, "%Y-%m-%d %H:%M:%S.%f").timestamp()
+    except ValueError:
+        return None
+
+
+def _record_ts(record: Dict) -> Optional[float]:
+    ts = record.get("ts")
+    if isinstance(ts, (int, float)):
+        return float(ts)
+    return _parse_time(record.get("time"))
+
+
+def _read_segment(path: str) -> List[Tuple[float, Dict]]:
+    """
+    读取一个段文件，返回按写入顺序排列的 (时间戳, 记录)；损坏的行（如写入中断）直接跳过。
+    """
+    entries = []
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(record, dict):
+                    continue
+                ts = _record_ts(record)
+                entries.append((ts if ts is not None else 0.0, record))
+    except OSError:
+        return []
+    return entries
+
+
+class ChatMemoryStore:
+    """
+    单个记忆文件对应的存储，线程安全。
+    memory_path 沿用旧版 .json 路径作为标识：活动段为同名 .jsonl，归档段位于同名 _archive 目录。
+    """
+
+    def __init__(
+        self,
+        memory_path: str,
+        max_segment_bytes: int = DEFAULT_MAX_SEGMENT_BYTES,
+        max_segment_age: float = DEFAULT_MAX_SEGMENT_AGE,
+        max_archives: int = DEFAULT_MAX_ARCHIVES,
+        tail_size: int = DEFAULT_TAIL_SIZE,
+    ) -> None:
+        self.memory_path = memory_path
+        base, _ext = os.path.splitext(memory_path)
+        self.active_path = base + ACTIVE_SUFFIX
+        self.archive_dir = base + ARCHIVE_DIR_SUFFIX
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.max_archives = max_archives
+        self._lock = threading.RLock()
+        self._tail: deque = deque(maxlen=max(1, tail_size))
+        # 尾部索引是否已覆盖全部历史（为 True 时查询无需再读归档段）
+        self._tail_complete = False
+        self._active_first_ts: Optional[float] = None
+        self._active_sig = None
+        self._loaded = False
+
+    def append(self, question: str, response: str) -> Dict:
+        """
+        追加一条对话记录，返回写入的记录。
+        """
+        now = time.time()
+        record = {
+            "dialog_id": str(uuid.uuid4()),
+            "question": question,
+            "response": response,
+            "time": datetime.fromtimestamp(now).isoformat(),
+            "ts": now,
+        }
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._refresh()
+            if self._should_rotate(now):
+                self._rotate()
+            os.makedirs(os.path.dirname(self.active_path) or ".", exist_ok=True)
+            with open(self.active_path, "a", encoding="utf-8") as file:
+                file.write(line)
+            self._active_sig = _file_signature(self.active_path)
+            if self._active_first_ts is None:
+                self._active_first_ts = now
+            if len(self._tail) == self._tail.maxlen:
+                self._tail_complete = False
+            self._tail.append((now, record))
+        return dict(record)
+
+    def last(self, count: Optional[int] = None) -> List[Dict]:
+        """
+        返回最近 count 条记录（按时间正序）；count 为空时返回全部历史（会读取归档段）。
+        """
+        if count is not None and count <= 0:
+            return []
+        with self._lock:
+            self._refresh()
+            if count is not None and (count <= len(self._tail) or self._tail_complete):
+                return [dict(record) for _ts, record in list(self._tail)[-count:]]
+        collected = []
+        for _ts, record in self._iter_newest_first():
+            collected.append(dict(record))
+            if count is not None and len(collected) >= count:
+                break
+        collected.reverse()
+        return collected
+
+    def since(self, since_ts: float) -> List[Dict]:
+        """
+        返回时间戳不早于 since_ts 的记录（按时间正序）。
+        """
+        with self._lock:
+            self._refresh()
+            if self._tail_complete or (self._tail and self._tail[0][0] < since_ts):
+                collected = []
+                for ts, record in reversed(self._tail):
+                    if ts < since_ts:
+                        break
+                    collected.append(dict(record))
+                collected.reverse()
+                return collected
+        collected = []
+        for ts, record in self._iter_newest_first():
+            if ts < since_ts:
+                break
+            collected.append(dict(record))
+        collected.reverse()
+        return collected
+
+    def clear(self) -> None:
+        """
+        清空全部记忆（活动段与归档段）。
+        """
+        with self._lock:
+            for path in [self.active_path] + self._archive_paths():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._tail.clear()
+            self._tail_complete = True
+            self._active_first_ts = None
+            self._active_sig = None
+            self._loaded = True
+
+    def _refresh(self) -> None:
+        """
+        首次访问时加载尾部索引；活动段被其他进程改写后重新加载。
+        """
+        if not self._loaded:
+            self._import_legacy()
+        signature = _file_signature(self.active_path)
+        if self._loaded and signature == self._active_sig:
+            return
+        self._loaded = True
+        self._active_sig = signature
+        entries = _read_segment(self.active_path) if signature is not None else []
+        self._active_first_ts = entries[0][0] if entries else None
+        self._tail.clear()
+        self._tail_complete = True
+        archives = self._archive_paths()
+        # 活动段不足以填满尾部索引时，从最新的归档段补齐
+        while len(entries) < self._tail.maxlen and archives:
+            entries = _read_segment(archives.pop()) + entries
+        if len(entries) > self._tail.maxlen or archives:
+            self._tail_complete = False
+        self._tail.extend(entries[-self._tail.maxlen:])
+
+    def _should_rotate(self, now: float) -> bool:
+        if self._active_sig is None:
+            return False
+        if self._active_sig[1] >= self.max_segment_bytes:
+            return True
+        return self._active_first_ts is not None and now - self._active_first_ts >= self.max_segment_age
+
+    def _rotate(self) -> None:
+        """
+        把活动段移入归档目录，段名取首条记录的时间，保证按名称排序即按时间排序。
+        """
+        first_ts = self._active_first_ts if self._active_first_ts is not None else time.time()
+        stamp = datetime.fromtimestamp(first_ts).strftime("%Y%m%d-%H%M%S-%f")
+        name = os.path.splitext(os.path.basename(self.active_path))[0]
+        os.makedirs(self.archive_dir, exist_ok=True)
+        target = os.path.join(self.archive_dir, f"{name}-{stamp}{ACTIVE_SUFFIX}")
+        try:
+            os.replace(self.active_path, target)
+        except OSError as e:
+            print(f"对话记忆归档失败：{e}")
+            return
+        self._active_sig = None
+        self._active_first_ts = None
+        if not self.max_archives or self.max_archives <= 0:
+            return
+        archives = self._archive_paths()
+        for path in archives[:max(0, len(archives) - self.max_archives)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _archive_paths(self) -> List[str]:
+        try:
+            names = sorted(name for name in os.listdir(self.archive_dir) if name.endswith(ACTIVE_SUFFIX))
+        except OSError:
+            return []
+        return [os.path.join(self.archive_dir, name) for name in names]
+
+    def _iter_newest_first(self) -> Iterator[Tuple[float, Dict]]:
+        """
+        从活动段开始按段倒序遍历全部记录，只在尾部索引不够用时调用。
+        """
+        with self._lock:
+            paths = self._archive_paths() + [self.active_path]
+        for path in reversed(paths):
+            for entry in reversed(_read_segment(path)):
+                yield entry
+
+    def _import_legacy(self) -> None:
+        """
+        旧版记忆文件（JSON 列表）存在时导入到活动段，随后改名保留，避免重复导入。
+        """
+        if self.memory_path == self.active_path or not os.path.exists(self.memory_path):
+            return
+        try:
+            with open(self.memory_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except Exception:
+            data = None
+        if isinstance(data, list) and data:
+            lines = []
+            for record in data:
+                if not isinstance(record, dict):
+                    continue
+                record = dict(record)
+                ts = _record_ts(record)
+                record["ts"] = ts if ts is not None else 0.0
+                lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+            os.makedirs(os.path.dirname(self.active_path) or ".", exist_ok=True)
+            with open(self.active_path, "a", encoding="utf-8") as file:
+                file.writelines(lines)
+        try:
+            os.replace(self.memory_path, self.memory_path + LEGACY_IMPORTED_SUFFIX)
+        except OSError as e:
+            print(f"旧版对话记忆改名失败：{e}")
+
+
+# 弱引用：不再被任何 Agent 持有的存储（如已淘汰的服务端会话）连同尾部索引一起回收
+_stores: "weakref.WeakValueDictionary[str, ChatMemoryStore]" = weakref.WeakValueDictionary()
+_stores_lock = threading.Lock()
+
+
+def _configured_max_archives() -> int:
+    try:
+        return max(0, int(get_memory_config().get("max_archives", DEFAULT_MAX_ARCHIVES)))
+    except (TypeError, ValueError):
+        return DEFAULT_MAX_ARCHIVES
+
+
+def get_memory_store(memory_path: str) -> ChatMemoryStore:
+    """
+    获取记忆文件对应的共享存储实例，同一路径的多个 Agent 共用同一份尾部索引。
+    """
+    key = os.path.normcase(os.path.abspath(memory_path))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = ChatMemoryStore(memory_path, max_archives=_configured_max_archives())
+            _stores[key] = store
+        return store
@@ -0,0 +1,149 @@
+"""
+模块职责：
+1) 定义流式输出中的 [[...]] 控制标记（思考/进度/最终答案的起止）。
+2) 提供增量解析器：逐块输入文本，跨块保留未完整的标记，输出带类型的文本片段。
+3) 提供整段文本的标记清理，供对话记忆等非流式场景使用。
+桌面聊天面板、云端网页推送与 AgentSession 共用同一套标记定义与解析逻辑。
+"""
+
+from collections import namedtuple
+
+THOUGHT_START = "[[THOUGHT_START]]"
+THOUGHT_END = "[[THOUGHT_END]]"
+PROGRESS_START = "[[PROGRESS_START]]"
+PROGRESS_END = "[[PROGRESS_END]]"
+FINAL_START = "[[FINAL_START]]"
+FINAL_END = "[[FINAL_END]]"
+
+CONTROL_TOKENS = (THOUGHT_START, THOUGHT_END, PROGRESS_START, PROGRESS_END, FINAL_START, FINAL_END)
+
+# 片段类型：思考、进度、最终答案、普通文本
+KIND_THOUGHT = "thought"
+KIND_PROGRESS = "progress"
+KIND_FINAL = "final"
+KIND_TEXT = "text"
+
+StreamSegment = namedtuple("StreamSegment", ["kind", "text"])
+
+_MARKER_OPEN = "[["
+_MARKER_CLOSE = "]]"
+_MAX_TOKEN_LEN = max(len(token) for token in CONTROL_TOKENS)
+_TOKEN_SET = frozenset(CONTROL_TOKENS)
+
+
+def _is_token_prefix(text):
+    return any(token.startswith(text) for token in CONTROL_TOKENS)
+
+
+class ControlTokenStream:
+    """
+    控制标记的增量解析器（状态机），每个流式回复使用一个实例。
+    feed() 返回本块可确定的片段；被块边界截断的标记前缀会暂存到下一块，结束时调用 flush()。
+    每块只线性扫描一次 "[["，与标记种类数无关。
+    """
+
+    def __init__(self):
+        self.thought = False
+        self.progress = False
+        self.final = False
+        self._pending = ""
+
+    @property
+    def kind(self):
+        """
+        当前所处区段的片段类型（思考优先于进度）。
+        """
+        if self.thought:
+            return KIND_THOUGHT
+        if self.progress:
+            return KIND_PROGRESS
+        if self.final:
+            return KIND_FINAL
+        return KIND_TEXT
+
+    def feed(self, chunk):
+        """
+        输入一块文本，返回 StreamSegment 列表（相邻同类型片段已合并，不含控制标记）。
+        """
+        if not chunk:
+            return []
+        data = self._pending + chunk
+        self._pending = ""
+        segments = []
+        position = 0
+        length = len(data)
+        while position < length:
+            index = data.find(_MARKER_OPEN, position)
+            if index == -1:
+                # 末尾单个 "[" 可能是下一块标记的开头
+                end = length - 1 if data.endswith("[") else length
+                self._emit(segments, data[position:end])
+                self._pending = data[end:]
+                break
+            self._emit(segments, data[position:index])
+            close = data.find(_MARKER_CLOSE, index + 2, index + _MAX_TOKEN_LEN)
+            if close == -1:
+                tail = data[index:]
+                if len(tail) < _MAX_TOKEN_LEN and _is_token_prefix(tail):
+                    # 标记被块边界截断，暂存等待下一块
+                    self._pending = tail
+                    break
+                self._emit(segments, "[")
+                position = index + 1
+                continue
+            token = data[index:close + 2]
+            if token in _TOKEN_SET:
+                self._apply(token)
+                position = close + 2
+            else:
+                self._emit(segments, "[")
+                position = index + 1
+        return segments
+
+    def flush(self):
+        """
+        流结束时调用：把暂存的未完成前缀按普通文本输出。
+        """
+        segments = []
+        self._emit(segments, self._pending)
+        self._pending = ""
+        return segments
+
+    def _apply(self, token):
+        if token == THOUGHT_START:
+            self.thought = True
+        elif token == THOUGHT_END:
+            self.thought = False
+        elif token == PROGRESS_START:
+            self.progress = True
+        elif token == PROGRESS_END:
+            self.progress = False
+        elif token == FINAL_START:
+            self.final = True
+            self.thought = False
+            self.progress = False
+        elif token == FINAL_END:
+            self.final = False
+
+    def _emit(self, segments, text):
+        if not text:
+            return
+        kind = self.kind
+        if segments and segments[-1].kind == kind:
+            segments[-1] = StreamSegment(kind, segments[-1].text + text)
+        else:
+            segments.append(StreamSegment(kind, text))
+
+
+def strip_control_tokens(text):
+    """
+    移除整段文本中的全部控制标记，保留标记之间的内容。
+    """
+    if not isinstance(text, str):
+        return str(text or "")
+    if _MARKER_OPEN not in text:
+        return text
+    stream = ControlTokenStream()
+    parts = [segment.text for segment in stream.feed(text)]
+    parts.extend(segment.text for segment in stream.flush())
+    return "".join(parts)
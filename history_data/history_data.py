@@ -1,4 +1,3 @@
-import json
 import os
 import sys
 
@@ -8,20 +7,31 @@ project_root = os.path.dirname(current_dir)
 if project_root not in sys.path:
     sys.path.append(project_root)
 
+from history_data.task_store import get_task_store, DB_FILE
+
+# history_data.json 仅作为导入/交换文件，任务数据实际保存在 SQLite（HISTORY_DB）
 HISTORY_FILE = os.path.join(os.path.dirname(__file__), "history_data.json")
+HISTORY_DB = DB_FILE
 
 def load_history():
-    """加载历史数据"""
-    if not os.path.exists(HISTORY_FILE):
-        return []
+    """加载历史数据（完整任务树）"""
     try:
-        with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
+        return get_task_store().load_tree()
+    except Exception as e:
+        print(f"加载历史数据失败：{e}")
         return []
 
 def save_history(data):
-    """保存历史数据"""
-    os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
-    with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    """整体保存历史数据（单个任务的修改请使用 ai_task_manager 的增量接口）"""
+    get_task_store().replace_all(data)
+
+def get_history_version():
+    """返回任务数据版本号，任务数据每次写入后递增，可用于判断是否需要刷新"""
+    try:
+        return get_task_store().version()
+    except Exception:
+        return 0
+
+def export_history_json(path=None):
+    """将任务数据导出为 JSON 文件，默认覆盖 history_data.json"""
+    return get_task_store().export_json(path or HISTORY_FILE)
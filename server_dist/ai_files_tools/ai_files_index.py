@@ -0,0 +1,371 @@
+"""
+文件名索引：为桌面及配置的根目录维护常驻内存的文件名索引，供名称搜索复用。
+1) 后台线程首次全量扫描，之后按目录 mtime 差异增量重扫（只 stat 目录，不 stat 文件）。
+2) 文件名建立三字母（trigram）倒排索引，关键词长度 >= 3 时只校验候选项。
+3) 目录快照持久化到磁盘，重启后直接加载并做一次差异重扫，无需重新全量遍历。
+4) 索引尚未就绪时调用方回退到 os.walk，结果保持正确。
+5) 查询前只对查询范围（under 或根目录）向下 QUERY_REFRESH_DEPTH 层做差异重扫，刚在常用位置创建的文件
+   可以立即被找到；更深层的变化由后台周期重扫补齐，查询耗时与目录总数无关。
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+try:
+    from tools.config_loader import get_file_index_config
+except ImportError:
+    def get_file_index_config():
+        return {}
+
+INDEX_DIR = os.path.join(current_dir, "file_index")
+DEFAULT_REFRESH_INTERVAL = 30
+# 查询前差异重扫的目录深度（查询范围目录本身为第 0 层）
+QUERY_REFRESH_DEPTH = 2
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _is_under(path, root):
+    """
+    判断 path 是否位于 root 目录内（含 root 本身），按规范化后的绝对路径比较。
+    """
+    path = os.path.normcase(os.path.abspath(path))
+    root = os.path.normcase(os.path.abspath(root))
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+class FileIndex:
+    """
+    单个根目录的文件名索引，线程安全。
+    目录记录：目录路径 -> (mtime_ns, 子目录名列表, 文件名列表)；隐藏目录（以 . 开头）不收录。
+    """
+
+    def __init__(self, root, cache_path=None, refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        self.root = os.path.abspath(root)
+        digest = hashlib.sha1(os.path.normcase(self.root).encode("utf-8")).hexdigest()[:12]
+        self.cache_path = cache_path or os.path.join(INDEX_DIR, f"{digest}.json")
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._dirs = {}
+        self._names = {}
+        self._trigram_index = {}
+        self._ready = False
+        self._thread = None
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._ready
+
+    def start(self):
+        """
+        启动后台线程：加载快照 -> 差异重扫 -> 按间隔周期性重扫。
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=f"file-index:{self.root}", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        self._load_snapshot()
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"文件索引刷新失败（{self.root}）：{e}")
+            if not self.refresh_interval or self.refresh_interval <= 0:
+                return
+            time.sleep(self.refresh_interval)
+
+    def refresh(self, start=None, max_depth=None):
+        """
+        增量重扫：目录 mtime 未变化时沿用缓存的目录项，变化时重新列目录并更新索引。
+        start/max_depth: 只重扫 start 目录（默认根目录）向下 max_depth 层；为空时重扫整棵目录树。
+        返回本次发生变化的目录数量。
+        """
+        # 同一时刻只允许一个重扫，查询不受影响
+        with self._refresh_lock:
+            return self._refresh_locked(start, max_depth)
+
+    def _refresh_locked(self, start, max_depth):
+        full = start is None and max_depth is None
+        changed = 0
+        seen = set()
+        stack = [(start or self.root, 0)]
+        while stack:
+            directory, depth = stack.pop()
+            seen.add(directory)
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            cached = self._dirs.get(directory)
+            if cached is not None and cached[0] == mtime_ns:
+                subdirs = cached[1]
+            else:
+                listing = self._list_directory(directory)
+                if listing is None:
+                    continue
+                subdirs, files = listing
+                self._apply_listing(directory, mtime_ns, subdirs, files)
+                # 消失的子目录连同其缓存的整棵子树一并移除（局部重扫不会访问到它们）
+                if cached is not None:
+                    for name in set(cached[1]) - set(subdirs):
+                        changed += self._drop_subtree(os.path.join(directory, name))
+                changed += 1
+            if max_depth is None or depth < max_depth:
+                for name in subdirs:
+                    stack.append((os.path.join(directory, name), depth + 1))
+
+        if full:
+            # 本轮未访问到的目录已被删除或移出，清理其记录
+            removed = [directory for directory in self._dirs if directory not in seen]
+            for directory in removed:
+                self._apply_listing(directory, None, [], [])
+                changed += 1
+            self._ready = True
+        if changed:
+            self._save_snapshot()
+        return changed
+
+    def _drop_subtree(self, directory):
+        """
+        移除目录及其缓存子目录的记录（只操作内存，不访问磁盘），返回移除的目录数。
+        """
+        removed = 0
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            cached = self._dirs.get(current)
+            if cached is None:
+                continue
+            stack.extend(os.path.join(current, name) for name in cached[1])
+            self._apply_listing(current, None, [], [])
+            removed += 1
+        return removed
+
+    def search(self, keyword, under=None, limit=0):
+        """
+        按名称子串（不区分大小写）搜索，返回路径列表；浅层优先，同层按路径排序。
+        under: 只返回位于该目录内的结果。
+        """
+        keyword = str(keyword).strip().lower()
+        if not keyword:
+            return []
+        return self._query(lambda: self._match_keyword(keyword), under, limit)
+
+    def find(self, predicate, under=None, limit=0):
+        """
+        按自定义条件查找：predicate(lower_name, is_dir) 返回 True 即命中。
+        """
+        def match():
+            with self._lock:
+                return [path for path, (lower_name, is_dir) in self._names.items() if predicate(lower_name, is_dir)]
+        return self._query(match, under, limit)
+
+    def _query(self, match, under, limit):
+        """
+        执行查询：先对查询范围做浅层差异重扫，再在索引中匹配。
+        """
+        self._refresh_scope(under)
+        return self._finalize(match(), under, limit)
+
+    def _refresh_scope(self, under):
+        if not self._ready:
+            return
+        scope = self.root
+        if under and _is_under(under, self.root):
+            scope = os.path.abspath(under)
+        # 后台正在重扫时不等待，直接使用当前索引，避免查询被整棵树的遍历拖慢
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._refresh_locked(scope, QUERY_REFRESH_DEPTH)
+        except Exception as e:
+            print(f"文件索引刷新失败（{self.root}）：{e}")
+        finally:
+            self._refresh_lock.release()
+
+    def _match_keyword(self, keyword):
+        with self._lock:
+            if len(keyword) >= 3:
+                postings = [self._trigram_index.get(gram) for gram in _trigrams(keyword)]
+                if any(posting is None for posting in postings):
+                    return []
+                postings.sort(key=len)
+                candidates = set(postings[0]).intersection(*postings[1:])
+            else:
+                candidates = self._names.keys()
+            return [path for path in candidates if keyword in self._names[path][0]]
+
+    def _finalize(self, paths, under, limit):
+        if under and not _is_under(under, self.root):
+            return []
+        if under and os.path.normcase(os.path.abspath(under)) != os.path.normcase(self.root):
+            paths = [path for path in paths if _is_under(path, under) and not _same_path(path, under)]
+        paths.sort(key=lambda path: (path.count(os.sep), path))
+        if limit and limit > 0:
+            paths = paths[:limit]
+        return paths
+
+    def _list_directory(self, directory):
+        subdirs = []
+        files = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        # 与原有搜索一致：跳过隐藏目录（如 .git）
+                        if not entry.name.startswith("."):
+                            subdirs.append(entry.name)
+                    else:
+                        files.append(entry.name)
+        except OSError:
+            return None
+        return subdirs, files
+
+    def _apply_listing(self, directory, mtime_ns, subdirs, files):
+        """
+        用新的目录列表替换旧记录，并同步更新名称表与倒排索引。
+        """
+        with self._lock:
+            old = self._dirs.get(directory)
+            old_entries = set()
+            if old is not None:
+                old_entries = {(name, True) for name in old[1]} | {(name, False) for name in old[2]}
+            new_entries = {(name, True) for name in subdirs} | {(name, False) for name in files}
+            for name, is_dir in old_entries - new_entries:
+                self._remove_name(os.path.join(directory, name))
+            for name, is_dir in new_entries - old_entries:
+                self._add_name(os.path.join(directory, name), name, is_dir)
+            if mtime_ns is None:
+                self._dirs.pop(directory, None)
+            else:
+                self._dirs[directory] = (mtime_ns, list(subdirs), list(files))
+
+    def _add_name(self, path, name, is_dir):
+        lower_name = name.lower()
+        self._names[path] = (lower_name, is_dir)
+        for gram in _trigrams(lower_name):
+            self._trigram_index.setdefault(gram, set()).add(path)
+
+    def _remove_name(self, path):
+        entry = self._names.pop(path, None)
+        if entry is None:
+            return
+        for gram in _trigrams(entry[0]):
+            posting = self._trigram_index.get(gram)
+            if posting is not None:
+                posting.discard(path)
+                if not posting:
+                    del self._trigram_index[gram]
+
+    def _load_snapshot(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return
+        if not isinstance(data, dict) or data.get("root") != self.root:
+            return
+        for directory, record in (data.get("dirs") or {}).items():
+            try:
+                mtime_ns, subdirs, files = record
+            except (TypeError, ValueError):
+                continue
+            self._apply_listing(directory, mtime_ns, subdirs, files)
+        # 快照可直接用于查询，随后的差异重扫会修正变化的部分
+        self._ready = bool(self._dirs)
+
+    def _save_snapshot(self):
+        with self._lock:
+            data = {"root": self.root, "dirs": {d: list(record) for d, record in self._dirs.items()}}
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"文件索引保存失败：{e}")
+
+
+def _same_path(a, b):
+    return os.path.normcase(os.path.abspath(a)) == os.path.normcase(os.path.abspath(b))
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _index_enabled():
+    return bool(get_file_index_config().get("enabled", True))
+
+
+def _refresh_interval():
+    try:
+        return float(get_file_index_config().get("refresh_interval", DEFAULT_REFRESH_INTERVAL))
+    except (TypeError, ValueError):
+        return DEFAULT_REFRESH_INTERVAL
+
+
+def get_index_roots(default_roots=None):
+    """
+    返回需要建立索引的根目录：默认根目录（通常是桌面）+ config.json 中 file_index.roots。
+    """
+    roots = []
+    for root in list(default_roots or []) + list(get_file_index_config().get("roots") or []):
+        if root and os.path.isdir(root) and not any(_same_path(root, existing) for existing in roots):
+            roots.append(os.path.abspath(root))
+    return roots
+
+
+def start_background_indexing(default_roots=None):
+    """
+    为所有索引根目录启动后台索引线程（已启动的不会重复启动）。
+    """
+    if not _index_enabled():
+        return []
+    started = []
+    interval = _refresh_interval()
+    with _indexes_lock:
+        for root in get_index_roots(default_roots):
+            key = os.path.normcase(root)
+            index = _indexes.get(key)
+            if index is None:
+                index = FileIndex(root, refresh_interval=interval)
+                _indexes[key] = index
+            index.start()
+            started.append(index)
+    return started
+
+
+def get_index_for(path, default_roots=None):
+    """
+    返回覆盖 path 的已就绪索引；没有覆盖的索引或仍在构建时返回 None（调用方应回退到遍历）。
+    """
+    if not path or not _index_enabled():
+        return None
+    start_background_indexing(default_roots)
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        if index.ready and _is_under(path, index.root):
+            return index
+    return None
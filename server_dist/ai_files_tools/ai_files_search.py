@@ -14,6 +14,7 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 from ai_files_tools.ai_files_read import resolve_desktop_path, read_directory_items, build_item_info_from_path, get_drives, resolve_target_path
+from ai_files_tools.ai_files_index import get_index_for
 
 def search_files_by_name(name: str, root_path: str = None, limit: int = 50) -> Dict[str, List[dict]]:
     """
@@ -44,6 +45,23 @@ def search_files_by_name(name: str, root_path: str = None, limit: int = 50) -> D
 
     keyword = str(name).strip().lower()
     matched_items = []
+
+    # 优先使用后台维护的文件名索引；索引未覆盖该目录或仍在构建时回退到 os.walk
+    index = get_index_for(start_dir, default_roots=[resolve_desktop_path()])
+    if index is not None:
+        for path in index.search(keyword, under=start_dir):
+            info = build_item_info_from_path(path)
+            if info:
+                matched_items.append(info)
+                if limit > 0 and len(matched_items) >= limit:
+                    break
+        return {
+            "success": True,
+            "query": name,
+            "search_root": start_dir,
+            "matched_count": len(matched_items),
+            "matched_items": matched_items
+        }
     
     try:
         # 使用 os.walk 进行递归搜索
@@ -0,0 +1,175 @@
+"""
+网页正文提取。
+模块职责：
+1) 基于 html.parser 的增量解析：按块喂入字节，边下载边提取，不需要先拼出完整文档。
+2) 丢弃 script/style/noscript 等不可见内容，保留标题、段落、列表项等块结构（每块一行）。
+3) 收集到 max_chars 个可见字符后标记完成，调用方即可停止下载。
+4) 字符集增量解码：优先使用响应头声明的 charset，其次嗅探 BOM 与文档开头的 <meta charset>，默认 UTF-8。
+"""
+import codecs
+import re
+from html.parser import HTMLParser
+from typing import List, Optional
+
+# 内容不可见、整体跳过的标签
+SKIP_TAGS = frozenset({"script", "style", "noscript", "template", "svg", "iframe", "object"})
+# 块级标签：开始与结束时换行
+BLOCK_TAGS = frozenset({
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "fieldset",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header",
+    "hr", "li", "main", "nav", "ol", "p", "pre", "section", "table", "td", "th", "title", "tr", "ul",
+})
+HEADING_TAGS = frozenset({"h1", "h2", "h3", "h4", "h5", "h6"})
+
+# 嗅探字符集时最多缓冲的字节数
+SNIFF_BYTES = 2048
+
+_WHITESPACE = re.compile(r"\s+")
+_HEADER_CHARSET = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.IGNORECASE)
+_META_CHARSET = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.IGNORECASE)
+_BOMS = ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+
+
+def charset_from_content_type(content_type: str) -> Optional[str]:
+    """
+    从 Content-Type 响应头中取出 charset，未声明时返回 None。
+    """
+    match = _HEADER_CHARSET.search(content_type or "")
+    return match.group(1) if match else None
+
+
+def _valid_encoding(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+class _TextCollector(HTMLParser):
+    """
+    收集可见文本，按块组织为行；达到字符上限后忽略后续内容。
+    """
+
+    def __init__(self, max_chars: int) -> None:
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.lines: List[str] = []
+        self.chars = 0
+        self.done = False
+        self._skip_depth = 0
+        self._current: List[str] = []
+        self._prefix = ""
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+            return
+        if tag in BLOCK_TAGS:
+            self._end_block()
+            if tag == "li":
+                self._prefix = "- "
+            elif tag in HEADING_TAGS:
+                self._prefix = "#" * int(tag[1]) + " "
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            if self._skip_depth:
+                self._skip_depth -= 1
+            return
+        if tag in BLOCK_TAGS:
+            self._end_block()
+
+    def handle_data(self, data):
+        if self._skip_depth or self.done:
+            return
+        text = _WHITESPACE.sub(" ", data)
+        if not text.strip() and not self._current:
+            return
+        if self.max_chars and self.chars + len(text) >= self.max_chars:
+            text = text[:self.max_chars - self.chars]
+            self.done = True
+        self._current.append(text)
+        self.chars += len(text)
+
+    def finish(self) -> str:
+        self._end_block()
+        return "\n".join(self.lines)
+
+    def _end_block(self):
+        if not self._current:
+            return
+        line = _WHITESPACE.sub(" ", "".join(self._current)).strip()
+        self._current = []
+        if line:
+            self.lines.append(self._prefix + line)
+            # 换行计入已收集字符，与调用方按字符截断的口径一致
+            self.chars += 1
+        self._prefix = ""
+
+
+class StreamingTextExtractor:
+    """
+    增量网页正文提取器：feed() 逐块输入原始字节，done 为 True 时可停止读取，最后调用 close() 取结果。
+    """
+
+    def __init__(self, max_chars: int = 0, encoding: Optional[str] = None) -> None:
+        self._collector = _TextCollector(max_chars)
+        self._encoding = _valid_encoding(encoding)
+        self._decoder = None
+        self._sniff_buffer = b""
+
+    @property
+    def done(self) -> bool:
+        return self._collector.done
+
+    def feed(self, data: bytes) -> bool:
+        """
+        输入一块原始字节，返回是否已收集到足够的文本。
+        """
+        if not data or self.done:
+            return self.done
+        if self._decoder is None:
+            self._sniff_buffer += data
+            if self._encoding is None and len(self._sniff_buffer) < SNIFF_BYTES:
+                return False
+            data, self._sniff_buffer = self._sniff_buffer, b""
+            self._start_decoder(data)
+        self._collector.feed(self._decoder.decode(data))
+        return self.done
+
+    def close(self) -> str:
+        """
+        结束输入并返回提取的正文。
+        """
+        if self._decoder is None:
+            data, self._sniff_buffer = self._sniff_buffer, b""
+            self._start_decoder(data)
+            self._collector.feed(self._decoder.decode(data))
+        if not self.done:
+            self._collector.feed(self._decoder.decode(b"", final=True))
+            self._collector.close()
+        return self._collector.finish()
+
+    def _start_decoder(self, head: bytes) -> None:
+        encoding = self._encoding
+        for bom, name in _BOMS:
+            if head.startswith(bom):
+                encoding = name
+                break
+        if encoding is None:
+            match = _META_CHARSET.search(head)
+            encoding = _valid_encoding(match.group(1).decode("ascii", "ignore")) if match else None
+        self._decoder = codecs.getincrementaldecoder(encoding or "utf-8")(errors="ignore")
+
+
+def extract_readable_text(html: str, max_chars: int = 0) -> str:
+    """
+    从完整的 HTML 文本中提取正文（已解码的字符串输入）。
+    """
+    collector = _TextCollector(max_chars)
+    collector.feed(html or "")
+    if not collector.done:
+        collector.close()
+    return collector.finish()
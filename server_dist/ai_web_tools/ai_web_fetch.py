@@ -0,0 +1,220 @@
+"""
+网页抓取引擎。
+模块职责：
+1) 进程级共享的 requests.Session（keep-alive 连接池），同一主机的多次抓取复用连接。
+2) URL 安全校验（拒绝内网、回环等地址）的 DNS 解析结果按 TTL 缓存，不再每次抓取都阻塞解析。
+3) 有界线程池并发抓取多个 URL：每个主机限制同时连接数，整批抓取共享一个截止时间，
+   总耗时取决于最慢的页面而不是各页面耗时之和。
+"""
+import ipaddress
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+}
+
+# 并发抓取的线程数与每个主机的同时连接数
+MAX_WORKERS = 8
+PER_HOST_LIMIT = 2
+# 单次请求超时与整批抓取的默认截止时间（秒）
+REQUEST_TIMEOUT = 10.0
+DEFAULT_DEADLINE = 15.0
+# 安全校验结果缓存时长：通过的主机缓存更久，未通过（含解析失败）的较短，便于恢复
+SAFE_TTL = 300.0
+UNSAFE_TTL = 60.0
+
+_BLOCKED_HOSTS = ("localhost",)
+
+# fetch 函数签名：(url, 截止时间戳) -> 结果字典
+FetchFunc = Callable[[str, float], Dict[str, Any]]
+
+
+class _VerdictCache:
+    """
+    主机 -> (是否安全, 过期时间) 的 TTL 缓存，线程安全。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[bool, float]] = {}
+
+    def get(self, host: str) -> Optional[bool]:
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[host]
+                return None
+            return entry[0]
+
+    def put(self, host: str, verdict: bool) -> None:
+        ttl = SAFE_TTL if verdict else UNSAFE_TTL
+        with self._lock:
+            self._entries[host] = (verdict, time.monotonic() + ttl)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_verdicts = _VerdictCache()
+
+
+def _is_public_address(address: str) -> bool:
+    ip_obj = ipaddress.ip_address(address.split("%", 1)[0])
+    return not (ip_obj.is_private or ip_obj.is_loopback or ip_obj.is_link_local
+                or ip_obj.is_multicast or ip_obj.is_reserved or ip_obj.is_unspecified)
+
+
+def _resolve_verdict(host: str) -> bool:
+    """
+    解析主机的全部地址，只有全部为公网地址时才视为安全。
+    """
+    try:
+        infos = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError, OSError):
+        return False
+    addresses = {info[4][0] for info in infos}
+    try:
+        return bool(addresses) and all(_is_public_address(address) for address in addresses)
+    except ValueError:
+        return False
+
+
+def is_safe_url(url: str) -> bool:
+    """
+    判断 URL 是否允许抓取：仅 http/https，且主机不指向内网、回环等地址。解析结果按 TTL 缓存。
+    """
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return False
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return False
+    host = parsed.hostname.lower().rstrip(".")
+    if host in _BLOCKED_HOSTS or host.endswith(".local") or host.endswith(".localhost"):
+        return False
+    verdict = _verdicts.get(host)
+    if verdict is None:
+        verdict = _resolve_verdict(host)
+        _verdicts.put(host, verdict)
+    return verdict
+
+
+_session: Optional[requests.Session] = None
+_executor: Optional[ThreadPoolExecutor] = None
+_host_slots: Dict[str, threading.BoundedSemaphore] = {}
+_engine_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    获取共享的 keep-alive 会话，连接池大小与并发线程数一致。
+    """
+    global _session
+    if _session is None:
+        with _engine_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _session = session
+    return _session
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _engine_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="web-fetch")
+    return _executor
+
+
+@contextmanager
+def host_slot(url: str, timeout: Optional[float] = None):
+    """
+    占用目标主机的一个连接名额，超过 PER_HOST_LIMIT 时等待；等待超时时产出 False。
+    """
+    host = (urlparse(url).hostname or "").lower()
+    with _engine_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = threading.BoundedSemaphore(PER_HOST_LIMIT)
+            _host_slots[host] = slot
+    acquired = slot.acquire(timeout=timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            slot.release()
+
+
+def remaining(deadline: float) -> float:
+    """
+    距截止时间（time.monotonic 时间戳）的剩余秒数，已过期时返回 0。
+    """
+    return max(0.0, deadline - time.monotonic())
+
+
+def request_timeout(deadline: float) -> float:
+    """
+    单次请求的超时：不超过 REQUEST_TIMEOUT，也不超过整批抓取的剩余时间。
+    """
+    return max(0.1, min(REQUEST_TIMEOUT, remaining(deadline)))
+
+
+def fetch_all(urls: List[str], fetch: FetchFunc, deadline: float = DEFAULT_DEADLINE) -> List[Dict[str, Any]]:
+    """
+    并发抓取一组 URL，按输入顺序返回结果；截止时间到达仍未完成的 URL 返回 deadline_exceeded 错误。
+
+    Args:
+        urls: 待抓取的 URL 列表。
+        fetch: 单个 URL 的抓取函数，接收 (url, 截止时间戳)。
+        deadline: 整批抓取允许的最长秒数。
+    """
+    if not urls:
+        return []
+    deadline_ts = time.monotonic() + deadline
+
+    def run(url: str) -> Dict[str, Any]:
+        if remaining(deadline_ts) <= 0:
+            return {"success": False, "error": "deadline_exceeded"}
+        with host_slot(url, timeout=remaining(deadline_ts)) as acquired:
+            if not acquired:
+                return {"success": False, "error": "deadline_exceeded"}
+            return fetch(url, deadline_ts)
+
+    if len(urls) == 1:
+        return [_safe_call(run, urls[0])]
+
+    executor = _get_executor()
+    futures = [executor.submit(_safe_call, run, url) for url in urls]
+    wait(futures, timeout=remaining(deadline_ts))
+    results = []
+    for future in futures:
+        if future.done():
+            results.append(future.result())
+        else:
+            future.cancel()
+            results.append({"success": False, "error": "deadline_exceeded"})
+    return results
+
+
+def _safe_call(run: Callable[[str], Dict[str, Any]], url: str) -> Dict[str, Any]:
+    try:
+        return run(url)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
@@ -1,21 +1,41 @@
 import json
 import os
+import sys
 from datetime import datetime
 
 # 路径配置
 # 假设此脚本位于 list/ai_web_tools/
 # 数据位于 list/ai_konwledge/web_konwledge/konwledge.json
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_FILE = os.path.join(BASE_DIR, "ai_konwledge", "web_konwledge", "konwledge.json")
+DATA_DIR = os.path.join(BASE_DIR, "ai_konwledge", "web_konwledge")
+DATA_FILE = os.path.join(DATA_DIR, "konwledge.json")
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+try:
+    from ai_konwledge.monitor_store import get_monitor_store
+except ImportError:
+    # 服务端没有监控存储模块，退回读取旧版单文件
+    get_monitor_store = None
 
 # 缓存索引，提升检索完整性与性能
 _CACHE = {
-    "mtime": None,
+    "signature": None,
     "indexed_records": []
 }
 
+def _get_store():
+    return get_monitor_store(DATA_DIR) if get_monitor_store else None
+
 def load_knowledge():
-    """读取知识库文件"""
+    """读取知识库（分段存储中的全部记录）"""
+    store = _get_store()
+    if store is not None:
+        try:
+            return store.load_all()
+        except Exception as e:
+            print(f"读取知识库失败: {e}")
+            return []
     if not os.path.exists(DATA_FILE):
         return []
     try:
@@ -70,16 +90,20 @@ def _build_indexed_records(records):
 
 def _get_indexed_records():
     """
-    获取索引化记录，文件变更时自动重建。
+    获取索引化记录，存储内容变更时自动重建。
     """
+    store = _get_store()
     try:
-        mtime = os.path.getmtime(DATA_FILE) if os.path.exists(DATA_FILE) else None
+        if store is not None:
+            signature = store.signature()
+        else:
+            signature = os.path.getmtime(DATA_FILE) if os.path.exists(DATA_FILE) else None
     except Exception:
-        mtime = None
-    if _CACHE["mtime"] != mtime:
+        signature = None
+    if _CACHE["signature"] != signature:
         records = load_knowledge()
         _CACHE["indexed_records"] = _build_indexed_records(records)
-        _CACHE["mtime"] = mtime
+        _CACHE["signature"] = signature
     return _CACHE["indexed_records"]
 
 def query_web_knowledge(query_type="recent", limit=0, keyword=None, date=None):
@@ -182,8 +206,12 @@ def query_web_knowledge(query_type="recent", limit=0, keyword=None, date=None):
 def clear_web_knowledge():
     """清空网页浏览记录知识库"""
     try:
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump([], f, ensure_ascii=False)
+        store = _get_store()
+        if store is not None:
+            store.clear()
+        else:
+            with open(DATA_FILE, 'w', encoding='utf-8') as f:
+                json.dump([], f, ensure_ascii=False)
         return {"message": "知识库已成功清空。"}
     except Exception as e:
         return {"error": f"清空知识库失败: {str(e)}"}
@@ -1,10 +1,8 @@
-import json
-import socket
-import ipaddress
 from typing import Dict, Any, List, Union
-from urllib.parse import urlparse
 
-import requests
+from ai_web_tools.ai_web_cache import get_web_cache
+from ai_web_tools.ai_web_extract import StreamingTextExtractor, charset_from_content_type
+from ai_web_tools.ai_web_fetch import fetch_all, get_session, is_safe_url, remaining, request_timeout
 
 try:
     from ai_web_tools.ai_web_read import get_all_browsers_info
@@ -17,60 +15,53 @@ except Exception:
     get_active_browser_info = None
 
 
-def _is_safe_url(url: str) -> bool:
-    try:
-        parsed = urlparse(url)
-        if parsed.scheme not in ("http", "https"):
-            return False
-        if not parsed.hostname:
-            return False
-        host = parsed.hostname.lower()
-        if host in ("localhost", "127.0.0.1"):
-            return False
-        if host.endswith(".local"):
-            return False
-        ip = socket.gethostbyname(host)
-        ip_obj = ipaddress.ip_address(ip)
-        if ip_obj.is_private or ip_obj.is_loopback or ip_obj.is_link_local or ip_obj.is_multicast or ip_obj.is_reserved:
-            return False
-        return True
-    except Exception:
-        return False
-
-
-def _fetch_text(url: str, max_bytes: int = 200000) -> Dict[str, Any]:
-    if not _is_safe_url(url):
+def _fetch_text(url: str, deadline: float, max_chars: int = 0, max_bytes: int = 2000000) -> Dict[str, Any]:
+    cache = get_web_cache()
+    cached = cache.get(url)
+    if cached is not None and not cache.covers(cached, max_chars):
+        cached = None
+    if cached is not None and cache.is_fresh(cached):
+        return {"success": True, "text": cached.get("text", ""), "cached": True}
+    if not is_safe_url(url):
         return {"success": False, "error": "unsafe_url"}
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
-        }
-        response = requests.get(url, headers=headers, timeout=10, stream=True)
-        response.raise_for_status()
-        content_type = response.headers.get("Content-Type", "")
-        if "text" not in content_type and "html" not in content_type and "xml" not in content_type:
-            return {"success": False, "error": "unsupported_content_type", "content_type": content_type}
-        raw = b""
-        for chunk in response.iter_content(chunk_size=4096):
-            if not chunk:
-                continue
-            raw += chunk
-            if len(raw) >= max_bytes:
-                break
-        text = raw.decode(response.encoding or "utf-8", errors="ignore")
-        return {"success": True, "text": _extract_readable_text(text)}
+        # 缓存过期时发起条件请求，未修改则服务端只返回 304 响应头
+        response = get_session().get(url, headers=cache.validators(cached),
+                                     timeout=request_timeout(deadline), stream=True)
+        with response:
+            if response.status_code == 304 and cached is not None:
+                cache.mark_revalidated(url, cached)
+                return {"success": True, "text": cached.get("text", ""), "cached": True}
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "")
+            if "text" not in content_type and "html" not in content_type and "xml" not in content_type:
+                return {"success": False, "error": "unsupported_content_type", "content_type": content_type}
+            # 边下载边提取，收集到 max_chars 个可见字符后即停止读取
+            extractor = StreamingTextExtractor(max_chars, charset_from_content_type(content_type))
+            received = 0
+            cut_short = False
+            for chunk in response.iter_content(chunk_size=16384):
+                if not chunk:
+                    continue
+                received += len(chunk)
+                if extractor.feed(chunk):
+                    break
+                if received >= max_bytes or remaining(deadline) <= 0:
+                    cut_short = True
+                    break
+            text = extractor.close()
+            # 因截止时间或字节上限中断的下载只得到部分正文，不写入缓存，
+            # 否则过期后的条件请求会以 304 刷新这份不完整的内容
+            if not cut_short:
+                cache.put(url, text, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                          max_chars=max_chars, truncated=extractor.done)
+        return {"success": True, "text": text}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
-def _extract_readable_text(html: str) -> str:
-    import re
-    html = re.sub(r"(?is)<script.*?>.*?</script>", " ", html)
-    html = re.sub(r"(?is)<style.*?>.*?</style>", " ", html)
-    html = re.sub(r"(?is)<noscript.*?>.*?</noscript>", " ", html)
-    html = re.sub(r"(?is)<[^>]+>", " ", html)
-    html = re.sub(r"\s+", " ", html).strip()
-    return html
+def _text_fetcher(max_chars: int):
+    return lambda url, deadline: _fetch_text(url, deadline, max_chars=max_chars if max_chars and max_chars > 0 else 0)
 
 
 def read_open_web_content(mode: str = "active",
@@ -113,10 +104,10 @@ def read_open_web_content(mode: str = "active",
     if max_pages and max_pages > 0:
         targets = targets[:max_pages]
 
+    fetched = fetch_all([item.get("url", "") for item in targets], _text_fetcher(max_chars))
     results = []
-    for item in targets:
+    for item, fetch_result in zip(targets, fetched):
         item_url = item.get("url", "")
-        fetch_result = _fetch_text(item_url)
         if fetch_result.get("success"):
             text = fetch_result.get("text", "")
             if max_chars and max_chars > 0:
@@ -151,8 +142,7 @@ def read_web_content_background(urls: Union[List[str], str],
         url_list = url_list[:max_pages]
 
     items = []
-    for item_url in url_list:
-        fetch_result = _fetch_text(item_url)
+    for item_url, fetch_result in zip(url_list, fetch_all(url_list, _text_fetcher(max_chars))):
         if fetch_result.get("success"):
             text = fetch_result.get("text", "")
             if max_chars and max_chars > 0:
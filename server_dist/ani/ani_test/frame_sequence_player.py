@@ -2,13 +2,44 @@
 序列帧动画播放器模块。
 提供一个可复用的 QWidget，用于循环播放本地图片序列帧。
 """
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
 import os
+import sys
 
 from PyQt5.QtWidgets import QWidget, QLabel, QVBoxLayout, QSizePolicy
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtCore import Qt, QTimer, QSize, pyqtSignal
 from PyQt5.QtGui import QPixmap
 
+try:
+    from .pixmap_cache import get_pixmap_cache
+except Exception:
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(os.path.dirname(current_dir))
+    if project_root not in sys.path:
+        sys.path.append(project_root)
+    from ani.ani_test.pixmap_cache import get_pixmap_cache
+
+# 默认缩放档位的相邻比例：显示尺寸最多比控件小约 5%
+SCALE_LEVEL_RATIO = 1.05
+
+
+def build_scale_levels(min_scale: float, max_scale: float, ratio: float = SCALE_LEVEL_RATIO) -> List[float]:
+    """
+    生成从 min_scale 到 max_scale 的等比缩放档位。
+    显示尺寸取整到档位后，窗口的细微缩放不会产生新的缓存尺寸，不同序列也能共用同一档位的缩放帧。
+    """
+    levels = []
+    level = max(0.01, float(min_scale))
+    while level < max_scale:
+        levels.append(round(level, 4))
+        level *= ratio
+    levels.append(round(float(max_scale), 4))
+    return levels
+
+
+def _normalize_scale_levels(scale_levels: Optional[Sequence[float]]) -> List[float]:
+    return sorted(float(level) for level in (scale_levels or []) if level and level > 0)
+
 
 class FrameSequencePlayer(QWidget):
     """
@@ -18,7 +49,8 @@ class FrameSequencePlayer(QWidget):
     finished = pyqtSignal()
 
     def __init__(self, frame_paths: Optional[List[str]] = None, interval_ms: int = 120,
-                 parent: Optional[QWidget] = None, loop: bool = True):
+                 parent: Optional[QWidget] = None, loop: bool = True,
+                 scale_levels: Optional[Sequence[float]] = None):
         """
         初始化播放器。
 
@@ -26,10 +58,12 @@ class FrameSequencePlayer(QWidget):
             frame_paths: 初始帧路径列表。
             interval_ms: 帧切换间隔（毫秒）。
             parent: 父级控件。
+            scale_levels: 可选的缩放档位（相对原始帧尺寸），设置后显示尺寸向下取到最近档位。
         """
         super().__init__(parent)
         self.frame_paths: List[str] = []
-        self.pixmaps: List[QPixmap] = []
+        self._source_size = QSize()
+        self._scale_levels: List[float] = _normalize_scale_levels(scale_levels)
         self.current_index = 0
         self.interval_ms = interval_ms
         self.loop = loop
@@ -54,16 +88,31 @@ class FrameSequencePlayer(QWidget):
 
     def set_frames(self, frame_paths: List[str]) -> None:
         """
-        设置并加载新的帧列表。
+        设置新的帧列表。帧图片在显示时按显示尺寸从进程级缓存读取（解码时直接缩放），
+        播放器本身不持有原始尺寸的图片。
 
         Args:
-            frame_paths: 帧图片的完整路径列表。
+            frame_paths: 帧图片的完整路径列表，或图集帧引用（见 atlas_format）。
         """
-        self.frame_paths = [p for p in frame_paths if isinstance(p, str) and os.path.exists(p)]
-        self.pixmaps = [QPixmap(path) for path in self.frame_paths if QPixmap(path).isNull() is False]
+        cache = get_pixmap_cache()
+        self.frame_paths = [path for path in frame_paths if isinstance(path, str) and cache.exists(path)]
+        self._source_size = cache.source_size(self.frame_paths[0]) if self.frame_paths else QSize()
         self.current_index = 0
         self._render_current_frame()
 
+    def set_scale_levels(self, scale_levels: Optional[Sequence[float]]) -> None:
+        """
+        设置缩放档位；传入 None 或空列表表示按控件尺寸精确缩放。
+        """
+        self._scale_levels = _normalize_scale_levels(scale_levels)
+        self._render_current_frame()
+
+    def get_source_size(self) -> QSize:
+        """
+        返回首帧的原始尺寸（图集帧返回生成图集前的尺寸），无帧时返回无效尺寸。
+        """
+        return QSize(self._source_size)
+
     def start(self) -> None:
         """
         启动动画播放。
@@ -85,35 +134,55 @@ class FrameSequencePlayer(QWidget):
         """
         切换到下一帧。
         """
-        if not self.pixmaps:
+        if not self.frame_paths:
             self.display_label.setText("")
             return
-        if not self.loop and self.current_index >= len(self.pixmaps) - 1:
+        if not self.loop and self.current_index >= len(self.frame_paths) - 1:
             self.stop()
             self.finished.emit()
             return
-        self.current_index = (self.current_index + 1) % len(self.pixmaps)
+        self.current_index = (self.current_index + 1) % len(self.frame_paths)
         self._render_current_frame()
 
     def _render_current_frame(self) -> None:
         """
-        渲染当前帧到显示区域，并按控件尺寸等比缩放。
+        渲染当前帧到显示区域。帧按显示尺寸解码并保存在进程级缓存中，
+        同一尺寸的帧再次播放（包括切换序列后再切回）时不再读盘与缩放。
+        控件尚未布局时不解码，等待 resizeEvent。
         """
-        if not self.pixmaps:
+        if not self.frame_paths:
             self.display_label.setText("")
             self.display_label.setPixmap(QPixmap())
             return
-        current_pixmap = self.pixmaps[self.current_index]
-        target_size = self.display_label.size()
-        if target_size.width() <= 1 or target_size.height() <= 1:
-            self.display_label.setPixmap(current_pixmap)
+        target = self._target_size()
+        if target is None:
             return
-        scaled = current_pixmap.scaled(target_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.display_label.setPixmap(scaled)
+        pixmap = get_pixmap_cache().get(self.frame_paths[self.current_index], size=target)
+        if not pixmap.isNull():
+            self.display_label.setPixmap(pixmap)
+
+    def _target_size(self) -> Optional[Tuple[int, int]]:
+        """
+        计算当前帧的显示尺寸：等比适配控件大小，设置了缩放档位时向下取到最近档位（不会超出控件）。
+        控件尚未布局或原始尺寸未知时返回 None。
+        """
+        label_size = self.display_label.size()
+        if label_size.width() <= 1 or label_size.height() <= 1:
+            return None
+        source = self._source_size
+        if not source.isValid() or source.width() <= 0 or source.height() <= 0:
+            return None
+        fit = min(label_size.width() / source.width(), label_size.height() / source.height())
+        if self._scale_levels:
+            lower = [level for level in self._scale_levels if level <= fit]
+            fit = lower[-1] if lower else self._scale_levels[0]
+            return max(1, int(source.width() * fit)), max(1, int(source.height() * fit))
+        scaled = source.scaled(label_size, Qt.KeepAspectRatio)
+        return max(1, scaled.width()), max(1, scaled.height())
 
     def resizeEvent(self, event) -> None:
         """
-        监听控件尺寸变化，保持当前帧自适应显示。
+        监听控件尺寸变化，保持当前帧自适应显示；尺寸未跨越缩放档位时直接复用缓存中的缩放帧。
         """
         super().resizeEvent(event)
         self._render_current_frame()
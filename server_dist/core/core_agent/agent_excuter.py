@@ -1,16 +1,19 @@
 """
 执行器模块：负责读取规划器输出的 JSON，并按步骤调用技能完成任务。
 核心要求：
-1) 继续调用底层 AIAgent（已加载技能提示词），由模型参与参数填充与调用控制。
-2) 严格按 excute plan 顺序执行，记录每个步骤的执行结果。
+1) 规划参数已完整且通过技能参数定义校验时直接执行技能；否则调用底层 AIAgent，由模型参与参数填充与调用控制。
+2) 按 excute plan 的依赖关系执行：无依赖的步骤在有界线程池中并发执行，进度按步骤顺序输出。
 3) 处理多步骤依赖时的 JSON 信息流，利用前置步骤结果填充后置参数。
 4) 提供终端测试入口：联动 AgentPlanner 生成规划并执行。
 """
 
 import os
+import re
 import sys
 import json
-from typing import Any, Dict, List
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, List, Optional, Set
 
 # 将项目根目录加入 sys.path，保证跨目录导入稳定
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -19,9 +22,29 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 from core.ai_agent import AIAgent
+from core.context_packer import ROLE_EXECUTOR, get_context_budget, pack_json_entries, shrink_json
 from core.core_agent.agent_planner import AgentPlanner
 from ai_tools import skill_registry
 
+# 参数或描述中引用前置步骤的写法，如 "步骤2"、"第2步"、"step2"、"{{step_2.result}}"
+_STEP_REF_PATTERN = re.compile(r"(?:步骤|第|step[\s_#-]*)(\d+)", re.IGNORECASE)
+_PREV_STEP_PATTERN = re.compile(r"上一步|前一步|上一个步骤|上个步骤|previous step", re.IGNORECASE)
+# 参数值中指代前置结果或未确定值的占位写法，出现时需交给模型补全
+_PLACEHOLDER_PATTERN = re.compile(
+    r"\{\{.*?\}\}|\$\{.*?\}|<[^<>]*(?:步骤|结果|step|result)[^<>]*>"
+    r"|(?:步骤|第|step[\s_#-]*)\d+\s*步?\s*(?:的|中)?\s*(?:结果|输出|返回|result|output)"
+    r"|上一步|前一步|上一个步骤|上个步骤|previous step|待定|占位|placeholder|TBD",
+    re.IGNORECASE
+)
+_SCHEMA_TYPE_CHECKS = {
+    "string": lambda value: isinstance(value, str),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "array": lambda value: isinstance(value, list),
+    "object": lambda value: isinstance(value, dict),
+}
+
 
 class AgentExecutor:
     """
@@ -33,8 +56,11 @@ class AgentExecutor:
         初始化执行器，加载底层 AIAgent。
         """
         self.agent = AIAgent()
-        self.skills_metadata_path = os.path.join(project_root, "ai_tools", "skills_metadata.json")
-        self.full_skills_map = self._load_full_skills_map()
+        self.skills_metadata_path = self.agent.skills_metadata_path
+        # 可并发执行的最大步骤数，设为 1 即退化为严格顺序执行
+        self.max_parallel_steps = 4
+        # 规划参数已完整时跳过模型参数填充，直接执行技能
+        self.enable_direct_execution = True
 
     def execute_plan(self, plan_json: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -46,18 +72,7 @@ class AgentExecutor:
         if not isinstance(plan_steps, list) or not plan_steps:
             return plan
 
-        context_memory = []
-        for step in plan_steps:
-            # 逐步执行，并将结果写回到计划中
-            step_result = self._execute_single_step(step, context_memory)
-            step["step results"] = step_result
-            context_memory.append({
-                "step": step.get("step"),
-                "desc": step.get("desc"),
-                "skill": step.get("skill", {}).get("name"),
-                "result": step_result
-            })
-
+        self._run_plan_steps(plan_steps)
         return plan
 
     def excute_plan_stream(self, plan_json: Dict[str, Any]):
@@ -70,29 +85,173 @@ class AgentExecutor:
         if not isinstance(plan_steps, list) or not plan_steps:
             return plan
 
-        context_memory = []
-        for step in plan_steps:
-            # 逐步执行，确保每一步完成后立即输出核心进度信息
-            step_result = self._execute_single_step(step, context_memory)
-            step["step results"] = step_result
+        self._run_plan_steps(plan_steps, on_step_done=self._print_step_progress)
+        return plan
 
-            # 写入上下文，供后续步骤参数填充与依赖处理
+    def _print_step_progress(self, step: Dict[str, Any], step_result: Any):
+        """
+        真实流式输出当前步骤的核心字段内容。
+        """
+        step_no = step.get("step") if isinstance(step, dict) else None
+        skill_info = step.get("skill") if isinstance(step, dict) and isinstance(step.get("skill"), dict) else {}
+        message = step_result.get("message") if isinstance(step_result, dict) else None
+        if not message:
+            message = "执行完成"
+        print(f"步骤{step_no}：调用技能{skill_info.get('name')}", flush=True)
+        print(f"步骤{step_no}：{message}", flush=True)
+
+    def _run_plan_steps(self, plan_steps: List[Any],
+                        on_step_done: Optional[Callable[[Dict[str, Any], Any], None]] = None):
+        """
+        按依赖关系调度步骤：就绪步骤提交到线程池并发执行，完成后按计划顺序回调输出。
+        """
+        dependencies = self._resolve_dependencies(plan_steps)
+        total = len(plan_steps)
+        pending = set(range(total))
+        finished: Set[int] = set()
+        next_report = 0
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=max(int(self.max_parallel_steps or 1), 1)) as pool:
+            while pending or running:
+                for idx in sorted(pending):
+                    if dependencies[idx] <= finished:
+                        pending.discard(idx)
+                        context_memory = self._build_context_memory(plan_steps, dependencies, idx)
+                        # 复制调用方上下文，保证技能在线程中的输出仍进入当前会话
+                        future = pool.submit(
+                            contextvars.copy_context().run,
+                            self._execute_single_step_safe, plan_steps[idx], context_memory
+                        )
+                        running[future] = idx
+
+                if not running:
+                    break
+
+                done_futures, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done_futures:
+                    idx = running.pop(future)
+                    step = plan_steps[idx]
+                    if isinstance(step, dict):
+                        step["step results"] = future.result()
+                    finished.add(idx)
+
+                # 保证进度按步骤顺序输出，先完成的后续步骤等待前序步骤输出后再输出
+                while next_report < total and next_report in finished:
+                    step = plan_steps[next_report]
+                    if on_step_done and isinstance(step, dict):
+                        on_step_done(step, step.get("step results"))
+                    next_report += 1
+
+    def _execute_single_step_safe(self, step: Any, context_memory: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        在线程中执行单个步骤，异常转换为失败结果，避免影响其他并发步骤。
+        """
+        try:
+            return self._execute_single_step(step, context_memory)
+        except Exception as exc:
+            return {"success": False, "message": f"步骤执行异常：{exc}", "error": "step_exception"}
+
+    def _build_context_memory(self, plan_steps: List[Any], dependencies: List[Set[int]],
+                              idx: int) -> List[Dict[str, Any]]:
+        """
+        汇总当前步骤全部前置依赖（含间接依赖）的执行结果，按计划顺序排列。
+        """
+        ancestors = set()
+        stack = list(dependencies[idx])
+        while stack:
+            dep = stack.pop()
+            if dep in ancestors:
+                continue
+            ancestors.add(dep)
+            stack.extend(dependencies[dep])
+
+        context_memory = []
+        for dep in sorted(ancestors):
+            step = plan_steps[dep]
+            if not isinstance(step, dict):
+                continue
+            skill_info = step.get("skill") if isinstance(step.get("skill"), dict) else {}
             context_memory.append({
                 "step": step.get("step"),
                 "desc": step.get("desc"),
-                "skill": step.get("skill", {}).get("name"),
-                "result": step_result
+                "skill": skill_info.get("name"),
+                "result": step.get("step results")
             })
+        return context_memory
 
-            # 真实流式输出当前步骤的核心字段内容
-            step_no = step.get("step")
-            message = step_result.get("message") if isinstance(step_result, dict) else None
-            if not message:
-                message = "执行完成"
-            print(f"步骤{step_no}：调用技能{step.get('skill', {}).get('name')}", flush=True)
-            print(f"步骤{step_no}：{message}", flush=True)
-
-        return plan
+    def _resolve_dependencies(self, plan_steps: List[Any]) -> List[Set[int]]:
+        """
+        计算每个步骤依赖的前置步骤下标。
+        1) 规划器给出 depends_on 时直接使用（只允许引用更早的步骤，避免环）。
+        2) 未给出时推断：只读技能仅依赖其引用的步骤与最近一次写操作；
+           写操作、引用不明或必填参数缺失（需从上下文补全）的步骤依赖全部前置步骤。
+        """
+        step_index = {}
+        for idx, step in enumerate(plan_steps):
+            if isinstance(step, dict) and step.get("step") is not None:
+                step_index.setdefault(str(step.get("step")).strip(), idx)
+
+        dependencies = []
+        last_write_idx = None
+        for idx, step in enumerate(plan_steps):
+            earlier = set(range(idx))
+            if not isinstance(step, dict):
+                dependencies.append(earlier)
+                continue
+
+            declared = step.get("depends_on")
+            if declared is not None:
+                if not isinstance(declared, list):
+                    declared = [declared]
+                deps = set()
+                for ref in declared:
+                    ref_idx = step_index.get(str(ref).strip())
+                    if ref_idx is not None and ref_idx < idx:
+                        deps.add(ref_idx)
+                dependencies.append(deps)
+            else:
+                skill_info = step.get("skill") if isinstance(step.get("skill"), dict) else {}
+                skill_name = skill_info.get("name")
+                is_read = bool(skill_name) and skill_registry.get_skill_permission(skill_name) == "read"
+                if not is_read or self._missing_required_fields(skill_name, skill_info.get("arguments")):
+                    dependencies.append(earlier)
+                else:
+                    deps = self._find_step_references(step, idx, step_index)
+                    if last_write_idx is not None:
+                        deps.add(last_write_idx)
+                    dependencies.append(deps)
+
+            skill_info = step.get("skill") if isinstance(step.get("skill"), dict) else {}
+            if skill_registry.get_skill_permission(skill_info.get("name")) != "read":
+                last_write_idx = idx
+
+        return dependencies
+
+    def _find_step_references(self, step: Dict[str, Any], idx: int, step_index: Dict[str, int]) -> Set[int]:
+        """
+        从步骤描述与参数文本中查找对前置步骤的引用。
+        """
+        skill_info = step.get("skill") if isinstance(step.get("skill"), dict) else {}
+        text = f"{step.get('desc', '')}\n{json.dumps(skill_info.get('arguments', {}), ensure_ascii=False)}"
+        refs = set()
+        for match in _STEP_REF_PATTERN.finditer(text):
+            ref_idx = step_index.get(match.group(1))
+            if ref_idx is not None and ref_idx < idx:
+                refs.add(ref_idx)
+        if idx > 0 and _PREV_STEP_PATTERN.search(text):
+            refs.add(idx - 1)
+        return refs
+
+    def _missing_required_fields(self, skill_name: str, arguments: Any) -> List[str]:
+        """
+        返回技能定义中要求但参数里缺失或为空的字段。
+        """
+        schema = self._get_skill_schema(skill_name)
+        required = schema.get("required", []) if isinstance(schema, dict) else []
+        if not isinstance(arguments, dict):
+            return list(required)
+        return [key for key in required if arguments.get(key) in (None, "", [], {})]
 
     def _execute_single_step(self, step: Dict[str, Any], context_memory: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -108,6 +267,16 @@ class AgentExecutor:
         if not skill_name:
             return {"success": False, "message": "缺少技能名称", "error": "missing_skill_name"}
 
+        # 快速路径：参数完整、类型正确且不含前置结果占位符时，省去一次模型调用
+        if self.enable_direct_execution and self._arguments_ready(skill_name, skill_arguments):
+            direct_result = self._execute_skill_fallback(skill_name, skill_arguments)
+            self.agent.tool_executed_in_last_chat = True
+            return self._build_step_result_from_tool_calls([{
+                "name": skill_name,
+                "arguments": skill_arguments,
+                "result": direct_result
+            }])
+
         # 构建提示词，要求模型基于上下文填充参数并调用指定技能
         prompt = self._build_step_prompt(step, context_memory, skill_name, skill_arguments)
         llm_result = self.agent.call_core(
@@ -130,14 +299,53 @@ class AgentExecutor:
         self.agent.tool_executed_in_last_chat = True
         return self._build_step_result_from_fallback(fallback_result)
 
+    def _arguments_ready(self, skill_name: str, skill_arguments: Any) -> bool:
+        """
+        校验规划参数能否直接执行：技能定义存在、必填字段齐全、字段均已定义且类型匹配、无占位符。
+        """
+        schema = self._get_skill_schema(skill_name)
+        if not isinstance(schema, dict):
+            return False
+        if skill_arguments is None:
+            skill_arguments = {}
+        if not isinstance(skill_arguments, dict):
+            return False
+        if self._missing_required_fields(skill_name, skill_arguments):
+            return False
+
+        parameters = schema.get("parameters", {}) if isinstance(schema.get("parameters"), dict) else {}
+        for key, value in skill_arguments.items():
+            param_schema = parameters.get(key)
+            if not isinstance(param_schema, dict):
+                return False
+            if value is None:
+                continue
+            type_check = _SCHEMA_TYPE_CHECKS.get(param_schema.get("type"))
+            if type_check and not type_check(value):
+                return False
+            if self._contains_placeholder(value):
+                return False
+        return True
+
+    def _contains_placeholder(self, value: Any) -> bool:
+        """
+        递归检查参数值中是否含有引用前置步骤结果的占位写法。
+        """
+        if isinstance(value, str):
+            return bool(_PLACEHOLDER_PATTERN.search(value))
+        if isinstance(value, dict):
+            return any(self._contains_placeholder(item) for item in value.values())
+        if isinstance(value, list):
+            return any(self._contains_placeholder(item) for item in value)
+        return False
+
     def _build_step_prompt(self, step: Dict[str, Any], context_memory: List[Dict[str, Any]],
                            skill_name: str, skill_arguments: Any) -> str:
         """
         构造模型提示词，指导其从上下文中填充参数并调用指定技能。
         """
-        # 增加上下文长度，确保文件列表等关键信息不被截断
-        context_text = self._truncate_text(json.dumps(context_memory, ensure_ascii=False), 8000)
-        skill_args_text = self._truncate_text(json.dumps(skill_arguments, ensure_ascii=False), 2000)
+        context_text = self._pack_context_memory(step, context_memory)
+        skill_args_text = json.dumps(shrink_json(skill_arguments, 500), ensure_ascii=False)
         skill_schema = self._get_skill_schema(skill_name)
         skill_schema_text = json.dumps(skill_schema, ensure_ascii=False) if skill_schema else ""
 
@@ -160,6 +368,25 @@ class AgentExecutor:
             "3. 不要输出多余文字。"
         )
 
+    def _pack_context_memory(self, step: Dict[str, Any], context_memory: List[Dict[str, Any]]) -> str:
+        """
+        按执行器 token 预算打包前置步骤结果：直接依赖分得更多预算，超长结果按结构压缩（不从中间截断 JSON），
+        仍放不下的步骤以摘要列出。
+        """
+        declared = step.get("depends_on")
+        if declared is not None and not isinstance(declared, list):
+            declared = [declared]
+        direct_steps = {str(ref).strip() for ref in declared or []}
+        weights = []
+        for index, entry in enumerate(context_memory):
+            is_direct = str(entry.get("step")).strip() in direct_steps or index == len(context_memory) - 1
+            weights.append(2.0 if is_direct else 1.0)
+        packed = pack_json_entries(context_memory, get_context_budget(ROLE_EXECUTOR), weights, str(step.get("desc") or ""))
+        context_text = json.dumps(packed.selected, ensure_ascii=False)
+        if packed.summary:
+            context_text += f"\n[未展开的步骤]\n{packed.summary}"
+        return context_text
+
     def _execute_skill_fallback(self, skill_name: str, skill_arguments: Any) -> Any:
         """
         当模型未返回工具调用时，直接执行技能作为兜底。
@@ -245,36 +472,15 @@ class AgentExecutor:
         plan_json.setdefault("thinking", "")
         return plan_json
 
-    def _truncate_text(self, text: str, max_len: int) -> str:
+    @property
+    def full_skills_map(self):
         """
-        防止上下文过长导致模型输入异常。
+        复用底层 AIAgent 的共享技能元数据缓存。
         """
-        if not isinstance(text, str):
-            text = str(text)
-        return text if len(text) <= max_len else text[:max_len] + "..."
-
-    def _load_full_skills_map(self):
-        data = self._read_json(self.skills_metadata_path)
-        skills = data.get("skills", []) if isinstance(data, dict) else []
-        skills_map = {}
-        for item in skills:
-            if isinstance(item, dict) and item.get("name"):
-                skills_map[item.get("name")] = item
-        return skills_map
+        return self.agent.full_skills_map
 
     def _get_skill_schema(self, skill_name: str):
-        if not skill_name:
-            return None
-        return self.full_skills_map.get(skill_name)
-
-    def _read_json(self, path):
-        if not os.path.exists(path):
-            return {}
-        try:
-            with open(path, "r", encoding="utf-8") as file:
-                return json.load(file)
-        except Exception:
-            return {}
+        return self.agent._get_skill_schema(skill_name)
 
 
 def run_executor_terminal_test():
@@ -0,0 +1,172 @@
+"""
+会话池模块：按客户端/会话 ID 创建或复用 AgentSession。
+核心要求：
+1) 每个会话使用独立的对话记忆文件，避免多用户并发时记忆与执行状态串扰。
+2) 会话数量有上限，超出时按 LRU 淘汰；空闲超时的会话自动回收。
+3) 正在执行对话的会话不会被淘汰。
+"""
+
+import os
+import re
+import sys
+import time
+import asyncio
+import hashlib
+import threading
+import contextlib
+from collections import OrderedDict
+
+# 将项目根目录加入 sys.path，保证跨目录导入稳定
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from core.core_agent.Agent import AgentSession
+
+
+class _PoolEntry:
+    """
+    会话池条目：会话实例、最近使用时间与正在使用的计数。
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.last_used = time.monotonic()
+        self.in_use = 0
+
+
+class AgentSessionPool:
+    """
+    AgentSession 会话池：有界、LRU 淘汰、空闲超时回收，线程安全。
+    """
+
+    def __init__(self, max_sessions=32, idle_timeout=1800, memory_dir=None, on_create=None):
+        """
+        max_sessions: 最大会话数。
+        idle_timeout: 空闲超时秒数，<= 0 表示不按时间回收。
+        memory_dir: 会话记忆文件目录，默认 core/core_data/sessions。
+        on_create: 新会话创建后的回调，可用于绑定额外属性。
+        """
+        self.max_sessions = max(int(max_sessions), 1)
+        self.idle_timeout = idle_timeout
+        self.memory_dir = memory_dir or os.path.join(project_root, "core", "core_data", "sessions")
+        self.on_create = on_create
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """
+        获取会话：存在则复用并刷新 LRU 顺序，不存在则创建。
+        """
+        return self._acquire(session_id, lease=False).session
+
+    @contextlib.contextmanager
+    def lease(self, session_id):
+        """
+        在一轮对话期间占用会话，占用期间不会被淘汰。
+        """
+        entry = self._acquire(session_id, lease=True)
+        try:
+            yield entry.session
+        finally:
+            self._end_lease(entry)
+
+    @contextlib.asynccontextmanager
+    async def alease(self, session_id):
+        """
+        lease 的异步版本：新建会话较重（规划器、执行器、记忆等），放到工作线程中完成，不阻塞事件循环。
+        """
+        entry = await asyncio.to_thread(self._acquire, session_id, True)
+        try:
+            yield entry.session
+        finally:
+            self._end_lease(entry)
+
+    def release(self, session_id):
+        """
+        主动移除会话（如客户端明确结束会话）；记忆文件保留。
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry and entry.in_use <= 0:
+                del self._entries[session_id]
+
+    def evict_idle(self):
+        """
+        回收空闲超时且未被占用的会话，返回回收数量。
+        """
+        with self._lock:
+            return self._evict_idle_locked()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._entries),
+                "in_use": sum(1 for entry in self._entries.values() if entry.in_use > 0),
+                "max_sessions": self.max_sessions
+            }
+
+    def memory_path_for(self, session_id):
+        """
+        会话 ID -> 记忆文件路径；ID 清洗后附加短哈希，避免非法字符与重名。
+        """
+        raw_id = str(session_id)
+        safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", raw_id)[:48] or "session"
+        digest = hashlib.sha1(raw_id.encode("utf-8")).hexdigest()[:8]
+        return os.path.join(self.memory_dir, f"{safe_id}_{digest}.json")
+
+    def _acquire(self, session_id, lease):
+        with self._lock:
+            self._evict_idle_locked()
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                return self._touch_locked(session_id, entry, lease)
+        # 新建会话耗时较长，在锁外完成，避免阻塞其他会话的获取与归还
+        session = self._create_session(session_id)
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                # 并发创建同一会话时以先入池者为准
+                self._evict_lru_locked()
+                entry = _PoolEntry(session)
+                self._entries[session_id] = entry
+            return self._touch_locked(session_id, entry, lease)
+
+    def _touch_locked(self, session_id, entry, lease):
+        self._entries.move_to_end(session_id)
+        entry.last_used = time.monotonic()
+        if lease:
+            entry.in_use += 1
+        return entry
+
+    def _end_lease(self, entry):
+        with self._lock:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+
+    def _create_session(self, session_id):
+        session = AgentSession(memory_path=self.memory_path_for(session_id))
+        if self.on_create:
+            self.on_create(session_id, session)
+        return session
+
+    def _evict_idle_locked(self):
+        if not self.idle_timeout or self.idle_timeout <= 0:
+            return 0
+        deadline = time.monotonic() - self.idle_timeout
+        expired = [
+            key for key, entry in self._entries.items()
+            if entry.in_use <= 0 and entry.last_used < deadline
+        ]
+        for key in expired:
+            del self._entries[key]
+        return len(expired)
+
+    def _evict_lru_locked(self):
+        # 从最久未使用的一端开始淘汰，跳过正在使用的会话；全部占用时允许临时超出上限
+        while len(self._entries) >= self.max_sessions:
+            victim = next((key for key, entry in self._entries.items() if entry.in_use <= 0), None)
+            if victim is None:
+                break
+            del self._entries[victim]
@@ -0,0 +1,283 @@
+"""
+模块职责：
+1) 进程级共享的技能元数据与提示词片段服务，供规划器/执行器/审查器/记忆代理复用。
+2) 以文件 mtime + size 作为缓存失效依据，文件未变化时直接返回内存结果。
+3) 预先拼好静态提示词片段（技能清单、调用协议），系统提示词组装不再读盘。
+4) 提示词分为两部分：稳定前缀（职责、调用协议、技能清单、角色说明）逐字节不变，可命中模型服务端的前缀缓存；
+   易变部分（任务统计、Token 统计、当前时间）单独生成，由调用方放在消息列表末尾。
+"""
+
+import os
+import sys
+import json
+import threading
+from datetime import date, datetime
+
+# 将项目根目录加入 sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+try:
+    from ai_tools import ai_statistics
+except ImportError:
+    class MockStats:
+        """
+        统计模块缺失时的降级实现。
+        """
+
+        def calculate_history_stats(self):
+            """
+            返回空统计结果，确保聊天逻辑可运行。
+            """
+            return {"total_completed": 0, "total_uncompleted": 0}
+
+    ai_statistics = MockStats()
+
+try:
+    from history_data.history_data import get_history_version
+except ImportError:
+    def get_history_version():
+        return None
+
+try:
+    from tools import token_cal
+except ImportError:
+    class MockTokenCal:
+        STATS_FILE = None
+
+        def get_compact_memory_summary(self):
+            return ""
+    token_cal = MockTokenCal()
+
+
+BASE_RESPONSIBILITY = (
+    "你是桌面任务与文件助手，负责理解用户意图、回答问题、"
+    "必要时调用技能完成任务，并返回清晰结果；保持安全、简洁、准确。"
+    "你有上下文记忆，但只能回忆起过去有限时间内的对话记录，不能回忆起更早的内容。"
+)
+
+TOOL_PROTOCOL = (
+    "当需要调用技能时，请只输出严格 JSON："
+    "{\"action\": \"call_skill\", \"name\": \"技能名\", \"arguments\": {参数}}。"
+    "如需多个技能，输出 {\"action\": \"call_skill\", \"tool_calls\": [..]}。"
+    "无须调用时输出正常回答。"
+)
+
+
+def _file_signature(path):
+    """
+    返回文件签名 (mtime_ns, size)，文件不存在时返回 None。
+    """
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class PromptService:
+    """
+    技能元数据与提示词缓存服务，所有缓存按文件签名失效，线程安全。
+    """
+
+    def __init__(self, skills_metadata_path=None, skills_metadata_brief_path=None):
+        self.skills_metadata_path = skills_metadata_path or os.path.join(
+            project_root, "ai_tools", "skills_metadata.json"
+        )
+        self.skills_metadata_brief_path = skills_metadata_brief_path or os.path.join(
+            project_root, "ai_tools", "skills_metadata_brief.json"
+        )
+        self._lock = threading.RLock()
+        self._json_cache = {}
+        self._skills_map = {}
+        self._skills_map_sig = None
+        self._skills_prompt = ""
+        self._skills_prompt_sig = None
+        self._task_summary = ""
+        self._task_summary_sig = None
+        self._token_summary = ""
+        self._token_summary_sig = None
+        self._prefix_cache = {}
+
+    def load_json(self, path, default=None):
+        """
+        带缓存的 JSON 读取：文件签名未变化时返回缓存对象（调用方不得修改）。
+        """
+        signature = _file_signature(path)
+        if signature is None:
+            return default
+        with self._lock:
+            cached = self._json_cache.get(path)
+            if cached and cached[0] == signature:
+                return cached[1]
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    data = json.load(file)
+            except Exception:
+                return default
+            self._json_cache[path] = (signature, data)
+            return data
+
+    def get_full_skills_map(self):
+        """
+        返回 技能名 -> 完整技能定义 的映射；元数据变化时重建并同步简要文件。
+        """
+        signature = _file_signature(self.skills_metadata_path)
+        with self._lock:
+            if signature is not None and signature == self._skills_map_sig:
+                return self._skills_map
+            metadata = self.load_json(self.skills_metadata_path, default={})
+            skills = metadata.get("skills", []) if isinstance(metadata, dict) else []
+            skills_map = {}
+            for item in skills:
+                if isinstance(item, dict) and item.get("name"):
+                    skills_map[item.get("name")] = item
+            self._skills_map = skills_map
+            self._skills_map_sig = signature
+            self._sync_brief_file(skills)
+            return self._skills_map
+
+    def get_skill_schema(self, skill_name):
+        if not skill_name:
+            return None
+        return self.get_full_skills_map().get(skill_name)
+
+    def ensure_brief_file(self):
+        """
+        确保简要技能文件与完整元数据一致（仅在元数据变化后真正检查）。
+        """
+        self.get_full_skills_map()
+
+    def get_skills_prompt(self):
+        """
+        返回技能提示词片段：system_instruction + 调用协议 + 技能清单，按简要文件签名缓存。
+        """
+        self.ensure_brief_file()
+        signature = _file_signature(self.skills_metadata_brief_path)
+        with self._lock:
+            if self._skills_prompt_sig is not None and signature == self._skills_prompt_sig:
+                return self._skills_prompt
+            metadata = self.load_json(self.skills_metadata_brief_path, default={})
+            skills = metadata.get("skills", []) if isinstance(metadata, dict) else []
+            system_instruction = metadata.get("system_instruction", "") if isinstance(metadata, dict) else ""
+            skills_text = self.format_brief_skills_list(skills)
+            if system_instruction:
+                prompt = f"{system_instruction}\n\n{TOOL_PROTOCOL}\n\n[技能清单]\n{skills_text}"
+            else:
+                prompt = f"{TOOL_PROTOCOL}\n\n[技能清单]\n{skills_text}"
+            self._skills_prompt = prompt
+            self._skills_prompt_sig = signature if signature is not None else ("missing",)
+            return prompt
+
+    def get_stable_prefix(self, role_instruction=""):
+        """
+        返回稳定的系统提示词前缀：底层职责 + 技能提示词 + 角色说明。
+        只随技能元数据变化，同一角色多次调用得到完全相同的字符串，便于命中前缀缓存。
+        """
+        skills_prompt = self.get_skills_prompt()
+        with self._lock:
+            cached = self._prefix_cache.get(role_instruction)
+            if cached is not None and cached[0] is skills_prompt:
+                return cached[1]
+            prefix = f"{BASE_RESPONSIBILITY}\n\n{skills_prompt}"
+            if role_instruction:
+                prefix = f"{prefix}\n\n{role_instruction}"
+            self._prefix_cache[role_instruction] = (skills_prompt, prefix)
+            return prefix
+
+    def get_volatile_prompt(self):
+        """
+        返回易变的上下文：任务统计、Token 统计与当前时间（精确到分钟），应放在消息列表末尾。
+        """
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
+        return f"{self.get_stats_prompt()}\n[当前时间：{current_time}]"
+
+    def get_stats_prompt(self):
+        """
+        返回任务统计与 Token 统计提示词，分别按任务数据版本号与 token_cal 版本号缓存。
+        """
+        task_summary = self._get_task_summary()
+        token_summary = self._get_token_summary()
+        if token_summary:
+            return f"{task_summary}\n{token_summary}"
+        return task_summary
+
+    def _get_task_summary(self):
+        signature = get_history_version()
+        with self._lock:
+            if signature is not None and signature == self._task_summary_sig:
+                return self._task_summary
+            stats_data = ai_statistics.calculate_history_stats()
+            completed_tasks = stats_data.get("total_completed", 0)
+            pending_tasks = stats_data.get("total_uncompleted", 0)
+            total_tasks = completed_tasks + pending_tasks
+            self._task_summary = f"[当前任务统计：总计 {total_tasks}，已完成 {completed_tasks}，未完成 {pending_tasks}]"
+            self._task_summary_sig = signature
+            return self._task_summary
+
+    def _get_token_summary(self):
+        # token_cal 在内存中汇总用量，以其版本号判断是否变化；摘要包含“今日/本月”分桶，日期变化时也需要重新生成
+        get_version = getattr(token_cal, "get_stats_version", None)
+        version = get_version() if callable(get_version) else _file_signature(getattr(token_cal, "STATS_FILE", None))
+        signature = (version, date.today())
+        with self._lock:
+            if signature == self._token_summary_sig:
+                return self._token_summary
+            self._token_summary = token_cal.get_compact_memory_summary()
+            self._token_summary_sig = signature
+            return self._token_summary
+
+    def _sync_brief_file(self, skills):
+        """
+        根据完整元数据生成简要技能文件，内容一致时不写盘。
+        """
+        brief_skills = []
+        for skill in skills:
+            if not isinstance(skill, dict):
+                continue
+            name = skill.get("name")
+            if not name:
+                continue
+            brief_skills.append({
+                "name": name,
+                "description": skill.get("description", "")
+            })
+
+        if not brief_skills:
+            return
+
+        existing = self.load_json(self.skills_metadata_brief_path, default={})
+        existing_skills = existing.get("skills", []) if isinstance(existing, dict) else []
+        if existing_skills != brief_skills:
+            with open(self.skills_metadata_brief_path, "w", encoding="utf-8") as file:
+                json.dump({"skills": brief_skills}, file, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def format_brief_skills_list(skills):
+        lines = []
+        for skill in skills:
+            name = skill.get("name", "未命名")
+            description = skill.get("description", "")
+            line = f"- {name}: {description}"
+            lines.append(line)
+        return "\n".join(lines) if lines else "- 暂无技能定义"
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_prompt_service():
+    """
+    获取进程级共享的提示词服务实例。
+    """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = PromptService()
+    return _service
@@ -0,0 +1,560 @@
+"""
+模块职责：
+1) 以 SQLite 保存任务树，每个任务一行，按 id / parent_id / scheduled_date / status 建索引。
+2) 单个任务的增删改移只修改相关行，不再整体读写 history_data.json。
+3) 批量操作在同一事务中完成，失败整体回滚。
+4) history_data.json 作为导入/交换文件：首次使用或文件被外部替换（如同步上传）时导入数据库；
+   每次写入后延迟 EXPORT_DELAY 秒导出（连续写入合并为一次）；内容与本库某次导出相同的文件
+   （如旧的导出副本被重新上传）不会被导入，避免用过期数据覆盖数据库。
+5) 数据变化后通知本进程内的监听者（如界面刷新），监听回调在写入线程中执行。
+"""
+
+import os
+import json
+import uuid
+import hashlib
+import sqlite3
+import threading
+import contextlib
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+DB_FILE = os.path.join(current_dir, "history_data.db")
+LEGACY_JSON_FILE = os.path.join(current_dir, "history_data.json")
+# 写入后导出 history_data.json 的延迟（秒）
+EXPORT_DELAY = 2.0
+# 记录最近若干次导出的内容摘要，用于识别被重新上传的旧导出文件
+EXPORT_DIGEST_HISTORY = 50
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    parent_id TEXT,
+    position INTEGER NOT NULL DEFAULT 0,
+    scheduled_date TEXT,
+    status TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_parent ON tasks(parent_id, position);
+CREATE INDEX IF NOT EXISTS idx_tasks_date ON tasks(scheduled_date);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# 递归查询任务及其全部子孙，用于删除子树与循环检测
+_SUBTREE_SQL = """
+WITH RECURSIVE subtree(id) AS (
+    SELECT id FROM tasks WHERE id = ?
+    UNION ALL
+    SELECT tasks.id FROM tasks JOIN subtree ON tasks.parent_id = subtree.id
+)
+"""
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+class TaskStore:
+    """
+    SQLite 任务存储，线程安全；对外以任务字典（与 history_data.json 中结构一致）交互。
+    """
+
+    def __init__(self, db_path=None, legacy_json_path=None):
+        self.db_path = db_path or DB_FILE
+        self.legacy_json_path = legacy_json_path or LEGACY_JSON_FILE
+        self._lock = threading.RLock()
+        self._conn = None
+        self._listeners = []
+        self._listeners_lock = threading.Lock()
+        self._export_timer = None
+
+    def _get_conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        写事务：成功提交（有实际修改时递增版本号），异常时回滚。
+        """
+        changed = False
+        with self._lock:
+            conn = self._get_conn()
+            imported = self._import_legacy_if_changed(conn)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                changes_before = conn.total_changes
+                yield conn
+                changed = conn.total_changes != changes_before
+                if changed:
+                    self._bump_version(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if changed:
+            self._schedule_export()
+        if changed or imported:
+            self._notify_changed()
+
+    @contextlib.contextmanager
+    def _reader(self):
+        with self._lock:
+            conn = self._get_conn()
+            imported = self._import_legacy_if_changed(conn)
+            yield conn
+        if imported:
+            self._notify_changed()
+
+    def add_change_listener(self, callback):
+        """
+        注册数据变化回调 callback()，在提交修改的线程中调用（界面需自行切回 GUI 线程）。
+        """
+        with self._listeners_lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def remove_change_listener(self, callback):
+        with self._listeners_lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify_changed(self):
+        with self._listeners_lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"任务数据变化回调失败：{e}")
+
+    def _import_legacy_if_changed(self, conn):
+        """
+        history_data.json 签名与上次导入不一致时，用其内容整体替换数据库；返回是否发生了导入。
+        文件内容与本库最近的某次导出完全相同（只是被复制或重新上传）时只记录签名，不覆盖数据库中更新的修改。
+        """
+        signature = _file_signature(self.legacy_json_path)
+        if signature is None or conn.in_transaction:
+            return False
+        row = conn.execute("SELECT value FROM meta WHERE key = 'legacy_signature'").fetchone()
+        if row and row[0] == signature:
+            return False
+        try:
+            with open(self.legacy_json_path, "rb") as file:
+                content = file.read()
+            tasks = json.loads(content.decode("utf-8"))
+        except Exception:
+            content, tasks = None, None
+        unchanged = content is not None and _digest(content) in self._export_digests(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if unchanged:
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta(key, value) VALUES('legacy_signature', ?)", (signature,)
+                )
+                conn.execute("COMMIT")
+                # 文件被旧内容覆盖，重新导出为数据库中的最新数据
+                self._schedule_export()
+                return False
+            if isinstance(tasks, list):
+                self._replace_all(conn, tasks)
+            conn.execute(
+                "INSERT OR REPLACE INTO meta(key, value) VALUES('legacy_signature', ?)", (signature,)
+            )
+            self._bump_version(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return True
+
+    @staticmethod
+    def _export_digests(conn):
+        row = conn.execute("SELECT value FROM meta WHERE key = 'export_digests'").fetchone()
+        try:
+            digests = json.loads(row[0]) if row else []
+        except ValueError:
+            return []
+        return digests if isinstance(digests, list) else []
+
+    @staticmethod
+    def _bump_version(conn):
+        conn.execute(
+            "INSERT INTO meta(key, value) VALUES('version', '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+
+    # ---------- 读取 ----------
+
+    def version(self):
+        """
+        返回数据版本号，每次写事务后递增；可用于判断任务数据是否变化（跨进程有效）。
+        """
+        with self._reader() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            return int(row[0]) if row else 0
+
+    def load_tree(self):
+        """
+        返回完整任务树（列表嵌套 children），顺序与保存时一致。
+        """
+        with self._reader() as conn:
+            rows = conn.execute(
+                "SELECT id, parent_id, data FROM tasks ORDER BY parent_id, position"
+            ).fetchall()
+        return self._build_tree(rows)
+
+    def get_task(self, task_id, with_children=True):
+        """
+        按 ID 读取任务；with_children 为 True 时附带完整子树，未找到返回 None。
+        """
+        with self._reader() as conn:
+            row = conn.execute("SELECT id, parent_id, data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            if row is None:
+                return None
+            if not with_children:
+                return self._row_to_task(row)
+            rows = conn.execute(
+                _SUBTREE_SQL + "SELECT tasks.id, tasks.parent_id, tasks.data FROM tasks "
+                "JOIN subtree ON tasks.id = subtree.id ORDER BY tasks.parent_id, tasks.position",
+                (task_id,)
+            ).fetchall()
+        tree = self._build_tree(rows, root_ids={task_id})
+        return tree[0] if tree else None
+
+    def get_tasks_by_date(self, scheduled_date):
+        """
+        返回指定日期的任务树：节点及其所有祖先都属于该日期才会出现。
+        """
+        with self._reader() as conn:
+            rows = conn.execute(
+                "SELECT id, parent_id, data FROM tasks WHERE scheduled_date = ? ORDER BY parent_id, position",
+                (scheduled_date,)
+            ).fetchall()
+        # 父节点不在结果中的非顶层节点不会被挂入结果树
+        return self._build_tree(rows)
+
+    def iter_tasks(self):
+        """
+        逐个返回全部任务（不含 children），用于统计等只需扁平遍历的场景。
+        """
+        with self._reader() as conn:
+            rows = conn.execute("SELECT id, parent_id, data FROM tasks").fetchall()
+        for row in rows:
+            yield self._row_to_task(row)
+
+    def exists(self, conn, task_id):
+        return conn.execute("SELECT 1 FROM tasks WHERE id = ?", (task_id,)).fetchone() is not None
+
+    # ---------- 写入（需在 transaction() 中调用） ----------
+
+    def insert_task(self, conn, task, parent_id=None, index=None):
+        """
+        插入任务（含 children 子树）；index 为 None 时追加到同级末尾。
+        """
+        position = self._allocate_position(conn, parent_id, index)
+        self._insert_recursive(conn, task, parent_id, position)
+
+    def update_task(self, conn, task_id, fields):
+        """
+        合并更新任务字段，返回更新后的任务（不含子树）；未找到返回 None。
+        """
+        row = conn.execute("SELECT id, parent_id, data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        task = self._row_to_task(row)
+        task.update(fields)
+        conn.execute(
+            "UPDATE tasks SET scheduled_date = ?, status = ?, data = ? WHERE id = ?",
+            (task.get("scheduled_date") or None, task.get("status"), self._dump(task), task_id)
+        )
+        return task
+
+    def delete_task(self, conn, task_id):
+        """
+        删除任务及其全部子任务，返回是否删除。
+        """
+        # 以 CTE 开头的语句 rowcount 不可靠，改用连接的累计修改数判断
+        changes_before = conn.total_changes
+        conn.execute(
+            _SUBTREE_SQL + "DELETE FROM tasks WHERE id IN (SELECT id FROM subtree)", (task_id,)
+        )
+        return conn.total_changes != changes_before
+
+    def move_task(self, conn, task_id, new_parent_id=None, index=None):
+        """
+        修改任务父级与同级位置；目标为自身子孙时返回 False。
+        """
+        if new_parent_id is not None and self.is_descendant_or_self(conn, task_id, new_parent_id):
+            return False
+        position = self._allocate_position(conn, new_parent_id, index, exclude_id=task_id)
+        conn.execute(
+            "UPDATE tasks SET parent_id = ?, position = ? WHERE id = ?", (new_parent_id, position, task_id)
+        )
+        return True
+
+    def get_sibling_ids(self, conn, parent_id):
+        if parent_id is None:
+            rows = conn.execute("SELECT id FROM tasks WHERE parent_id IS NULL ORDER BY position").fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT id FROM tasks WHERE parent_id = ? ORDER BY position", (parent_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_parent_id(self, conn, task_id):
+        row = conn.execute("SELECT parent_id FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return row[0] if row else None
+
+    def is_descendant_or_self(self, conn, task_id, target_id):
+        row = conn.execute(
+            _SUBTREE_SQL + "SELECT 1 FROM subtree WHERE id = ?", (task_id, target_id)
+        ).fetchone()
+        return row is not None
+
+    def delete_top_level_where_date(self, conn, scheduled_date, include_undated=False):
+        """
+        删除指定日期的顶层任务及其子树（include_undated 时同时删除未设置日期的顶层任务）。
+        """
+        condition = "scheduled_date = ?"
+        if include_undated:
+            condition = "(scheduled_date = ? OR scheduled_date IS NULL)"
+        conn.execute(
+            "WITH RECURSIVE subtree(id) AS ("
+            f" SELECT id FROM tasks WHERE parent_id IS NULL AND {condition}"
+            " UNION ALL"
+            " SELECT tasks.id FROM tasks JOIN subtree ON tasks.parent_id = subtree.id"
+            ") DELETE FROM tasks WHERE id IN (SELECT id FROM subtree)",
+            (scheduled_date,)
+        )
+
+    def delete_all(self, conn):
+        conn.execute("DELETE FROM tasks")
+
+    def fill_missing_dates(self, default_date):
+        """
+        为未设置日期的任务补齐日期，返回补齐数量；没有缺失时不开启写事务。
+        顶层任务补为 default_date，子任务继承最近的祖先日期（与按日期筛选时子任务跟随父任务的规则一致）。
+        """
+        with self._reader() as conn:
+            missing = conn.execute("SELECT 1 FROM tasks WHERE scheduled_date IS NULL LIMIT 1").fetchone()
+        if missing is None:
+            return 0
+        with self.transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, parent_id, data FROM tasks WHERE scheduled_date IS NULL"
+            ).fetchall()
+            pending = {row[0]: row for row in rows}
+            resolved = {}
+
+            def resolve_date(task_id):
+                if task_id in resolved:
+                    return resolved[task_id]
+                row = pending.get(task_id)
+                if row is None:
+                    dated = conn.execute("SELECT scheduled_date FROM tasks WHERE id = ?", (task_id,)).fetchone()
+                    date = (dated[0] if dated else None) or default_date
+                else:
+                    date = resolve_date(row[1]) if row[1] else default_date
+                resolved[task_id] = date
+                return date
+
+            for row in rows:
+                date = resolve_date(row[0])
+                task = self._row_to_task(row)
+                task["scheduled_date"] = date
+                conn.execute(
+                    "UPDATE tasks SET scheduled_date = ?, data = ? WHERE id = ?",
+                    (date, self._dump(task), row[0])
+                )
+        return len(rows)
+
+    def replace_all(self, tasks):
+        """
+        用完整任务树整体替换（兼容 save_history 的整体保存语义）。
+        """
+        with self.transaction() as conn:
+            self._replace_all(conn, tasks)
+
+    def export_json(self, path=None):
+        """
+        将当前任务树导出为 JSON（供同步上传等场景），并记录签名与内容摘要避免被重新导入。
+        """
+        target = path or self.legacy_json_path
+        is_exchange_file = os.path.abspath(target) == os.path.abspath(self.legacy_json_path)
+        # 持有锁完成读取、写文件与记录签名，避免本进程其他线程在中途把刚写出的文件当作外部替换导入
+        with self._lock:
+            tasks = self.load_tree()
+            content = json.dumps(tasks, ensure_ascii=False, indent=2).encode("utf-8")
+            conn = self._get_conn()
+            if is_exchange_file:
+                digests = [item for item in self._export_digests(conn) if item != _digest(content)]
+                digests = (digests + [_digest(content)])[-EXPORT_DIGEST_HISTORY:]
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta(key, value) VALUES('export_digests', ?)", (json.dumps(digests),)
+                )
+            tmp_path = f"{target}.tmp"
+            with open(tmp_path, "wb") as file:
+                file.write(content)
+            os.replace(tmp_path, target)
+            if is_exchange_file:
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta(key, value) VALUES('legacy_signature', ?)",
+                    (_file_signature(target),)
+                )
+        return target
+
+    def _schedule_export(self):
+        """
+        写入后延迟导出 history_data.json，延迟期间的多次写入只导出一次。
+        """
+        with self._lock:
+            if self._export_timer is not None:
+                return
+            timer = threading.Timer(EXPORT_DELAY, self._run_export)
+            timer.daemon = True
+            self._export_timer = timer
+        timer.start()
+
+    def _run_export(self):
+        with self._lock:
+            self._export_timer = None
+        try:
+            self.export_json()
+        except Exception as e:
+            print(f"任务数据导出失败：{e}")
+
+    def flush_export(self):
+        """
+        立即执行尚未完成的延迟导出（如退出前调用）。
+        """
+        with self._lock:
+            timer, self._export_timer = self._export_timer, None
+        if timer is not None:
+            timer.cancel()
+            self._run_export()
+
+    def close(self):
+        self.flush_export()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ---------- 内部工具 ----------
+
+    def _replace_all(self, conn, tasks):
+        self.delete_all(conn)
+        seen_ids = set()
+        for position, task in enumerate(tasks or []):
+            if isinstance(task, dict):
+                self._insert_recursive(conn, task, None, position, seen_ids)
+
+    def _insert_recursive(self, conn, task, parent_id, position, seen_ids=None):
+        task_id = task.get("id")
+        # 历史数据中可能存在重复或缺失的 ID，主键冲突时为该节点重新生成 ID
+        if not task_id or (seen_ids is not None and task_id in seen_ids) or self.exists(conn, task_id):
+            task_id = _generate_id()
+            while self.exists(conn, task_id):
+                task_id = _generate_id()
+            task["id"] = task_id
+        if seen_ids is not None:
+            seen_ids.add(task_id)
+        children = task.get("children") or []
+        conn.execute(
+            "INSERT INTO tasks(id, parent_id, position, scheduled_date, status, data) VALUES(?, ?, ?, ?, ?, ?)",
+            (task_id, parent_id, position, task.get("scheduled_date") or None, task.get("status"), self._dump(task))
+        )
+        for child_position, child in enumerate(children):
+            if isinstance(child, dict):
+                self._insert_recursive(conn, child, task_id, child_position, seen_ids)
+
+    def _allocate_position(self, conn, parent_id, index, exclude_id=None):
+        """
+        计算插入位置：追加时取同级最大位置 + 1；指定 index 时顺延其后的同级节点。
+        """
+        siblings = None
+        if index is not None and index >= 0:
+            siblings = [sid for sid in self.get_sibling_ids(conn, parent_id) if sid != exclude_id]
+        if siblings is None or index >= len(siblings):
+            if parent_id is None:
+                row = conn.execute("SELECT MAX(position) FROM tasks WHERE parent_id IS NULL").fetchone()
+            else:
+                row = conn.execute("SELECT MAX(position) FROM tasks WHERE parent_id = ?", (parent_id,)).fetchone()
+            return (row[0] + 1) if row and row[0] is not None else 0
+        # 重新编号同级节点，为插入位置让出空位
+        for new_position, sibling_id in enumerate(siblings):
+            shifted = new_position + 1 if new_position >= index else new_position
+            conn.execute("UPDATE tasks SET position = ? WHERE id = ?", (shifted, sibling_id))
+        return index
+
+    def _build_tree(self, rows, root_ids=None):
+        """
+        由 (id, parent_id, data) 行构建任务树；rows 需按 parent_id, position 排序。
+        root_ids 为 None 时以 parent_id 为空的节点作为根。
+        """
+        nodes = {}
+        order = []
+        for row in rows:
+            task = self._row_to_task(row)
+            task["children"] = []
+            nodes[row[0]] = task
+            order.append((row[0], row[1]))
+        roots = []
+        for task_id, parent_id in order:
+            task = nodes[task_id]
+            is_root = parent_id is None if root_ids is None else task_id in root_ids
+            if is_root:
+                roots.append(task)
+            elif parent_id in nodes:
+                nodes[parent_id]["children"].append(task)
+        return roots
+
+    @staticmethod
+    def _row_to_task(row):
+        task = json.loads(row[2])
+        task["id"] = row[0]
+        return task
+
+    @staticmethod
+    def _dump(task):
+        data = {key: value for key, value in task.items() if key != "children"}
+        return json.dumps(data, ensure_ascii=False)
+
+
+def _digest(content):
+    return hashlib.sha1(content).hexdigest()
+
+
+def _generate_id():
+    return str(uuid.uuid4())[:8]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_task_store():
+    """
+    获取进程级共享的任务存储实例。
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TaskStore()
+    return _store
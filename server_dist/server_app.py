@@ -38,6 +38,8 @@ logger.info(f"Server Auth Token loaded: {AUTH_TOKEN[:4]}***")
 # 尝试导入核心 Agent
 try:
     from core.core_agent.Agent import AgentSession
+    from core.core_agent.session_pool import AgentSessionPool
+    from core.stream_tokens import ControlTokenStream
     logger.info("AgentSession imported successfully.")
 except ImportError as e:
     logger.error(f"Failed to import AgentSession: {e}")
@@ -119,6 +121,11 @@ HTML_CONTENT = """
             .message.assistant .bubble {
                 border-bottom-left-radius: 4px;
             }
+            .bubble .aside {
+                color: #8a9099;
+                font-style: italic;
+                font-size: 12px;
+            }
             .input-bar {
                 display: flex;
                 gap: 8px;
@@ -161,7 +168,13 @@ HTML_CONTENT = """
 
         <script>
             var wsProtocol = window.location.protocol === "https:" ? "wss://" : "ws://";
-            var wsUrl = wsProtocol + window.location.host + "/ws/web";
+            // 会话 ID 持久化在浏览器本地，刷新或重连后继续使用同一会话的记忆
+            var sessionId = localStorage.getItem("remote_chat_session_id");
+            if (!sessionId) {
+                sessionId = Date.now().toString(36) + Math.random().toString(36).slice(2, 10);
+                localStorage.setItem("remote_chat_session_id", sessionId);
+            }
+            var wsUrl = wsProtocol + window.location.host + "/ws/web?session_id=" + encodeURIComponent(sessionId);
             var ws = null;
             var messageList = document.getElementById("messageList");
             var messageInput = document.getElementById("messageInput");
@@ -173,7 +186,7 @@ HTML_CONTENT = """
                 ws.onmessage = function(event) {
                     var data = JSON.parse(event.data);
                     if (data.type === "chunk") {
-                        appendAssistantChunk(data.text);
+                        appendAssistantChunk(data.text, data.kind);
                     } else if (data.type === "end") {
                         finalizeAssistant();
                     } else if (data.type === "response_full") {
@@ -184,7 +197,9 @@ HTML_CONTENT = """
             }
 
             var currentBubble = null;
-            function appendAssistantChunk(text) {
+            var currentSpan = null;
+            // 片段类型由服务端解析控制标记后给出：thought/progress 以弱化样式显示
+            function appendAssistantChunk(text, kind) {
                 if (!currentBubble) {
                     var msg = document.createElement("div");
                     msg.className = "message assistant";
@@ -192,8 +207,18 @@ HTML_CONTENT = """
                     currentBubble.className = "bubble";
                     msg.appendChild(currentBubble);
                     messageList.appendChild(msg);
+                    currentSpan = null;
+                }
+                kind = kind || "text";
+                if (!currentSpan || currentSpan.dataset.kind !== kind) {
+                    currentSpan = document.createElement("span");
+                    currentSpan.dataset.kind = kind;
+                    if (kind === "thought" || kind === "progress") {
+                        currentSpan.className = "aside";
+                    }
+                    currentBubble.appendChild(currentSpan);
                 }
-                currentBubble.textContent += text;
+                currentSpan.appendChild(document.createTextNode(text));
                 messageList.scrollTop = messageList.scrollHeight;
             }
             
@@ -210,6 +235,7 @@ HTML_CONTENT = """
 
             function finalizeAssistant() {
                 currentBubble = null;
+                currentSpan = null;
             }
 
             function sendMessage() {
@@ -236,18 +262,6 @@ HTML_CONTENT = """
 </html>
 """
 
-# 全局 Agent 实例 (云端大脑)
-cloud_agent = None
-if AgentSession:
-    try:
-        cloud_agent = AgentSession()
-        logger.info("Cloud Agent initialized successfully.")
-    except Exception as e:
-        logger.error(f"Failed to initialize Cloud Agent: {e}")
-        cloud_agent = None
-else:
-    logger.error("AgentSession class is not available.")
-
 # 注入连接管理器到 Agent (如果 Agent 支持)
 # 我们需要一个机制让 Agent 知道客户端是否在线
 # 简单的做法是：Agent 在执行技能时，如果需要客户端配合，先询问 ConnectionManager
@@ -255,10 +269,27 @@ else:
 def check_client_status():
     return manager.is_desktop_online()
 
-# 将此函数绑定到 cloud_agent (如果存在)
-if cloud_agent:
-    cloud_agent.check_client_online = check_client_status
-    logger.info("Bound check_client_online to Cloud Agent.")
+def bind_session(session_id, session):
+    """新建会话时绑定客户端在线检查"""
+    session.check_client_online = check_client_status
+
+# 会话池 (云端大脑)：每个网页/桌面会话使用独立的 AgentSession 与对话记忆
+# 超出 max_sessions 时按 LRU 淘汰，空闲超过 idle_timeout 秒的会话自动回收
+SESSION_POOL_CONFIG = SERVER_CONFIG.get("session_pool", {})
+session_pool = None
+if AgentSession:
+    try:
+        session_pool = AgentSessionPool(
+            max_sessions=SESSION_POOL_CONFIG.get("max_sessions", 32),
+            idle_timeout=SESSION_POOL_CONFIG.get("idle_timeout", 1800),
+            on_create=bind_session
+        )
+        logger.info("Agent session pool initialized successfully.")
+    except Exception as e:
+        logger.error(f"Failed to initialize agent session pool: {e}")
+        session_pool = None
+else:
+    logger.error("AgentSession class is not available.")
 
 # 连接管理器
 class ConnectionManager:
@@ -283,7 +314,7 @@ class ConnectionManager:
             del self.desktop_clients[client_id]
 
     def is_desktop_online(self):
-        ""检查是否有桌面客户端在线""
+        """检查是否有桌面客户端在线"""
         return len(self.desktop_clients) > 0
 
     async def broadcast_to_web(self, message: str):
@@ -301,8 +332,9 @@ async def root():
 
 # --- 网页端 WebSocket (直接与云端大脑对话) ---
 @app.websocket("/ws/web")
-async def websocket_web_endpoint(websocket: WebSocket):
+async def websocket_web_endpoint(websocket: WebSocket, session_id: str = Query(None)):
     await manager.connect_web(websocket)
+    session_key = f"web_{session_id or id(websocket)}"
     try:
         while True:
             data = await websocket.receive_text()
@@ -312,7 +344,7 @@ async def websocket_web_endpoint(websocket: WebSocket):
                 
                 if msg_type == "chat":
                     text = message.get("text", "")
-                    if text and cloud_agent:
+                    if text and session_pool:
                         # 检查客户端状态
                         is_online = manager.is_desktop_online()
                         logger.info(f"Web chat request. Client online: {is_online}")
@@ -337,11 +369,17 @@ async def websocket_web_endpoint(websocket: WebSocket):
                         
                         full_text = f"{status_hint}\n用户说：{text}"
                         
-                        stream_gen = cloud_agent.chat(full_text, stream=True)
-                        for chunk in stream_gen:
-                            await websocket.send_json({"type": "chunk", "text": chunk})
+                        # 会话获取与对话都在工作线程中执行，这里只异步等待输出片段，不阻塞事件循环
+                        # 网页端不直接显示控制标记：在服务端增量解析后按片段类型推送
+                        stream_parser = ControlTokenStream()
+                        async with session_pool.alease(session_key) as agent:
+                            async for chunk in agent.achat(full_text):
+                                for segment in stream_parser.feed(chunk):
+                                    await websocket.send_json({"type": "chunk", "text": segment.text, "kind": segment.kind})
+                        for segment in stream_parser.flush():
+                            await websocket.send_json({"type": "chunk", "text": segment.text, "kind": segment.kind})
                         await websocket.send_json({"type": "end"})
-                    elif not cloud_agent:
+                    elif not session_pool:
                         await websocket.send_json({"type": "error", "text": "Agent not initialized"})
             except json.JSONDecodeError:
                 pass
@@ -381,13 +419,14 @@ async def websocket_desktop_endpoint(websocket: WebSocket, token: str = Query(No
                 elif msg_type == "chat":
                     # 桌面端请求云端大脑 (Cloud Mode)
                     text = message.get("text", "")
-                    if text and cloud_agent:
+                    if text and session_pool:
                         logger.info(f"Processing cloud chat for {client_id}: {text}")
-                        stream_gen = cloud_agent.chat(text, stream=True)
-                        for chunk in stream_gen:
-                            await websocket.send_json({"type": "chunk", "text": chunk})
+                        # 会话获取与对话都在工作线程中执行，这里只异步等待输出片段，不阻塞事件循环
+                        async with session_pool.alease(f"desktop_{client_id}") as agent:
+                            async for chunk in agent.achat(text):
+                                await websocket.send_json({"type": "chunk", "text": chunk})
                         await websocket.send_json({"type": "end"})
-                    elif not cloud_agent:
+                    elif not session_pool:
                         await websocket.send_json({"type": "error", "text": "Cloud Agent not ready"})
 
             except json.JSONDecodeError:
@@ -406,6 +445,7 @@ async def upload_file(file: UploadFile = File(...), path: str = Form(...), token
     # 安全检查：只允许特定路径
     allowed_paths = [
         "core/core_data/core_chat_memory.json",
+        "core/core_data/core_chat_memory.jsonl",
         "history_data/history_data.json"
     ]
     # 规范化路径分隔符
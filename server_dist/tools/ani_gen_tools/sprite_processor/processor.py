@@ -2,6 +2,7 @@
 核心处理逻辑模块。
 负责抠白、裁剪、对齐与批量输出。
 """
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import Callable, Dict, List, Optional, Tuple
 import os
 import sys
@@ -9,14 +10,26 @@ import sys
 from PIL import Image
 
 try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from scipy import ndimage
+except ImportError:
+    ndimage = None
+
+try:
+    from .atlas import build_atlas
     from .config import SpriteProcessorConfig
-    from .utils import list_image_files, ensure_output_dir, build_output_name, normalize_alignment, normalize_remove_mode
+    from .utils import list_image_files, ensure_output_dir, build_output_name, normalize_alignment, normalize_remove_mode, normalize_engine
 except Exception:
     current_dir = os.path.dirname(os.path.abspath(__file__))
     if current_dir not in sys.path:
         sys.path.append(current_dir)
+    from atlas import build_atlas
     from config import SpriteProcessorConfig
-    from utils import list_image_files, ensure_output_dir, build_output_name, normalize_alignment, normalize_remove_mode
+    from utils import list_image_files, ensure_output_dir, build_output_name, normalize_alignment, normalize_remove_mode, normalize_engine
 
 
 ProgressCallback = Callable[[int, int], None]
@@ -31,6 +44,21 @@ class SpriteProcessor:
         self.config = config
         self.config.alignment = normalize_alignment(self.config.alignment)
         self.config.remove_mode = normalize_remove_mode(self.config.remove_mode)
+        self.config.engine = normalize_engine(self.config.engine)
+        self.engine = self._resolve_engine(self.config.engine)
+
+    @staticmethod
+    def _resolve_engine(engine: str) -> str:
+        """
+        解析实际使用的引擎：auto 在安装 numpy 时使用 numpy，否则使用纯 Python。
+        """
+        if engine == "python":
+            return "python"
+        if np is None:
+            if engine == "numpy":
+                raise RuntimeError("numpy 引擎需要安装 numpy")
+            return "python"
+        return "numpy"
 
     def process(
         self,
@@ -39,7 +67,16 @@ class SpriteProcessor:
     ) -> Dict:
         """
         执行批量处理并输出 PNG 序列帧。
+        workers != 1 时使用多进程两遍流水线（见 process_directories）。
         """
+        if resolve_worker_count(self.config.workers) > 1:
+            return process_directories(
+                [self.config],
+                workers=self.config.workers,
+                progress_callback=progress_callback,
+                status_callback=status_callback
+            )[0]
+
         files = list_image_files(self.config.input_dir, self.config.supported_exts)
         if not files:
             return {
@@ -61,8 +98,7 @@ class SpriteProcessor:
             if status_callback:
                 status_callback(f"处理图片：{os.path.basename(path)}")
             try:
-                image = Image.open(path).convert("RGBA")
-                image = self._remove_background(image)
+                image = self._load_keyed_image(path)
                 cropped = self._auto_crop(image)
                 processed_images.append(cropped)
             except Exception as exc:
@@ -81,27 +117,31 @@ class SpriteProcessor:
             }
 
         max_width, max_height = self._get_max_size(processed_images)
-        saved_count = 0
+        output_paths: List[str] = []
         for index, image in enumerate(processed_images, start=1):
             aligned = self._align_to_canvas(image, max_width, max_height)
             output_name = build_output_name(index, self.config.name_template)
             output_path = os.path.join(self.config.output_dir, output_name)
             aligned.save(output_path, format="PNG")
-            saved_count += 1
+            output_paths.append(output_path)
 
-        return {
+        result = {
             "success": True,
-            "processed": saved_count,
-            "skipped": total - saved_count,
+            "processed": len(output_paths),
+            "skipped": total - len(output_paths),
             "errors": errors,
             "output_dir": self.config.output_dir,
             "max_size": (max_width, max_height)
         }
+        _attach_atlas(self.config, output_paths, result, status_callback)
+        return result
 
     def _remove_background(self, image: Image.Image) -> Image.Image:
         """
         将背景色转换为透明通道。
         """
+        if self.engine == "numpy":
+            return self._remove_background_numpy(image)
         if self.config.remove_mode == "edge":
             return self._remove_background_edge(image)
         return self._remove_background_all(image)
@@ -209,6 +249,65 @@ class SpriteProcessor:
         image.putdata(new_data)
         return image
 
+    def _remove_background_numpy(self, image: Image.Image) -> Image.Image:
+        """
+        numpy 引擎：向量化计算背景掩码；边缘模式下只剔除与图像边界连通的背景区域。
+        结果与纯 Python 实现逐像素一致。
+        """
+        pixels = np.array(image, dtype=np.uint8)
+        mask = self._background_mask_numpy(pixels)
+        if self.config.remove_mode == "edge":
+            outline_threshold = 60
+            outlines = np.all(pixels[:, :, :3] <= outline_threshold, axis=2)
+            mask = self._edge_connected_numpy(mask & ~outlines)
+        pixels[:, :, 3][mask] = 0
+        return Image.fromarray(pixels, "RGBA")
+
+    def _background_mask_numpy(self, pixels: "np.ndarray") -> "np.ndarray":
+        """
+        返回背景色候选掩码（阈值模式或容差模式）。
+        """
+        rgb = pixels[:, :, :3]
+        if self.config.background_color == (255, 255, 255):
+            return np.all(rgb >= self.config.white_threshold, axis=2)
+        tolerance = max(0, 255 - self.config.white_threshold)
+        background = np.array(self.config.background_color, dtype=np.int16)
+        return np.all(np.abs(rgb.astype(np.int16) - background) <= tolerance, axis=2)
+
+    @staticmethod
+    def _edge_connected_numpy(passable: "np.ndarray") -> "np.ndarray":
+        """
+        返回与图像边界四连通的可通行区域。
+        安装 scipy 时使用连通域标记；否则在 numpy 上做受约束的迭代膨胀。
+        """
+        if not passable.any():
+            return passable
+        border = np.zeros_like(passable)
+        border[0, :] = border[-1, :] = True
+        border[:, 0] = border[:, -1] = True
+
+        if ndimage is not None:
+            labels, _count = ndimage.label(passable)
+            border_labels = np.unique(labels[border & passable])
+            border_labels = border_labels[border_labels != 0]
+            return np.isin(labels, border_labels)
+
+        # 无 scipy 时：交替沿行、沿列扩散，一段连续可通行像素只要有一个已到达即整段到达
+        reached = border & passable
+        while True:
+            grown = _spread_along_rows(reached, passable)
+            grown = _spread_along_rows(grown.T, passable.T).T
+            if np.array_equal(grown, reached):
+                return reached
+            reached = grown
+
+    def _load_keyed_image(self, path: str) -> Image.Image:
+        """
+        读取图片并完成抠图。
+        """
+        image = Image.open(path).convert("RGBA")
+        return self._remove_background(image)
+
     def _auto_crop(self, image: Image.Image) -> Image.Image:
         """
         自动裁剪到最小非透明区域。
@@ -240,3 +339,214 @@ class SpriteProcessor:
             y = max_height - image.height
         canvas.paste(image, (x, y), image)
         return canvas
+
+
+def _spread_along_rows(reached: "np.ndarray", passable: "np.ndarray") -> "np.ndarray":
+    """
+    沿行方向扩散：把每行中包含已到达像素的连续可通行段整体标记为已到达。
+    """
+    passable = np.ascontiguousarray(passable)
+    starts = passable.copy()
+    starts[:, 1:] &= ~passable[:, :-1]
+    run_ids = np.cumsum(starts.ravel())
+    flat_passable = passable.ravel()
+    ids = run_ids[flat_passable]
+    hit = np.zeros(int(run_ids[-1]) + 1, dtype=bool)
+    hit[ids[np.ascontiguousarray(reached).ravel()[flat_passable]]] = True
+    result = np.zeros(flat_passable.shape, dtype=bool)
+    result[flat_passable] = hit[ids]
+    return result.reshape(passable.shape)
+
+
+def _attach_atlas(
+    config: SpriteProcessorConfig,
+    output_paths: List[str],
+    result: Dict,
+    status_callback: Optional[StatusCallback] = None
+) -> None:
+    """
+    按配置将输出帧打包为图集，并把图集路径写入结果；打包失败只记录错误，不影响序列帧输出。
+    """
+    if not config.atlas or not output_paths:
+        return
+    if status_callback:
+        status_callback(f"生成图集：{config.output_dir}")
+    try:
+        atlas = build_atlas(output_paths, config.output_dir, config.atlas_max_frame_size)
+        result["atlas_path"] = atlas["atlas_path"]
+    except Exception as exc:
+        result["errors"].append(f"图集生成失败：{exc}")
+
+
+def resolve_worker_count(workers: int) -> int:
+    """
+    解析进程数：0 或负数表示使用全部 CPU 核心。
+    """
+    if workers is None or workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def _measure_frame(config: SpriteProcessorConfig, path: str) -> Dict:
+    """
+    第一遍（子进程）：抠图后只返回非透明区域的包围盒，不回传图像数据。
+    """
+    try:
+        image = SpriteProcessor(config)._load_keyed_image(path)
+        bbox = image.getchannel("A").getbbox()
+        if not bbox:
+            return {"bbox": None, "size": (1, 1)}
+        return {"bbox": bbox, "size": (bbox[2] - bbox[0], bbox[3] - bbox[1])}
+    except Exception as exc:
+        return {"error": f"{path}: {exc}"}
+
+
+def _render_frame(
+    config: SpriteProcessorConfig,
+    path: str,
+    bbox: Optional[Tuple[int, int, int, int]],
+    output_path: str,
+    max_width: int,
+    max_height: int
+) -> Dict:
+    """
+    第二遍（子进程）：重新抠图后按包围盒裁剪、对齐并直接保存，每个进程同一时刻只持有一帧。
+    """
+    try:
+        processor = SpriteProcessor(config)
+        image = processor._load_keyed_image(path)
+        if bbox:
+            cropped = image.crop(bbox)
+        else:
+            cropped = Image.new("RGBA", (1, 1), (0, 0, 0, 0))
+        aligned = processor._align_to_canvas(cropped, max_width, max_height)
+        aligned.save(output_path, format="PNG")
+        return {"saved": True}
+    except Exception as exc:
+        return {"error": f"{path}: {exc}"}
+
+
+def process_directories(
+    configs: List[SpriteProcessorConfig],
+    workers: int = 0,
+    progress_callback: Optional[ProgressCallback] = None,
+    status_callback: Optional[StatusCallback] = None
+) -> List[Dict]:
+    """
+    多进程批量处理一个或多个动画目录，返回与 configs 一一对应的结果列表（字段同 SpriteProcessor.process）。
+    第一遍并行计算每帧包围盒并得到各目录的统一画布尺寸；第二遍并行裁剪、对齐、保存。
+    进度按两遍的总帧数累计上报。
+    """
+    results: List[Optional[Dict]] = [None] * len(configs)
+    jobs = []
+    for config_index, config in enumerate(configs):
+        # 在主进程中完成参数归一化，子进程直接使用
+        SpriteProcessor(config)
+        files = list_image_files(config.input_dir, config.supported_exts)
+        if not files:
+            results[config_index] = {
+                "success": False,
+                "reason": "no_files",
+                "message": "输入目录未找到可处理的图片文件",
+                "processed": 0,
+                "skipped": 0,
+                "errors": []
+            }
+            continue
+        ensure_output_dir(config.output_dir)
+        jobs.append((config_index, config, files))
+
+    if not jobs:
+        return results  # type: ignore
+
+    total_steps = 2 * sum(len(files) for _, _, files in jobs)
+    done_steps = 0
+
+    def report(message: str) -> None:
+        nonlocal done_steps
+        done_steps += 1
+        if status_callback:
+            status_callback(message)
+        if progress_callback:
+            progress_callback(done_steps, total_steps)
+
+    with ProcessPoolExecutor(max_workers=resolve_worker_count(workers)) as pool:
+        # 第一遍：包围盒
+        measures: Dict[Tuple[int, int], Dict] = {}
+        futures = {
+            pool.submit(_measure_frame, config, path): (config_index, file_index, path)
+            for config_index, config, files in jobs
+            for file_index, path in enumerate(files)
+        }
+        for future in as_completed(futures):
+            config_index, file_index, path = futures[future]
+            measures[(config_index, file_index)] = future.result()
+            report(f"分析图片：{os.path.basename(path)}")
+
+        # 第二遍：按原始顺序为成功的帧编号，裁剪对齐后保存
+        render_futures = {}
+        summaries = {}
+        for config_index, config, files in jobs:
+            errors = []
+            frames = []
+            for file_index, path in enumerate(files):
+                measure = measures[(config_index, file_index)]
+                if "error" in measure:
+                    errors.append(measure["error"])
+                else:
+                    frames.append((path, measure))
+            summaries[config_index] = {
+                "errors": errors, "saved": 0, "total": len(files), "max_size": None, "outputs": []
+            }
+            if not frames:
+                # 跳过的帧不会进入第二遍，进度直接补齐
+                for _ in files:
+                    report(f"跳过：{config.input_dir}")
+                continue
+            max_width = max(measure["size"][0] for _, measure in frames)
+            max_height = max(measure["size"][1] for _, measure in frames)
+            summaries[config_index]["max_size"] = (max_width, max_height)
+            for _ in range(len(files) - len(frames)):
+                report(f"跳过失败图片：{config.input_dir}")
+            for output_index, (path, measure) in enumerate(frames, start=1):
+                output_name = build_output_name(output_index, config.name_template)
+                output_path = os.path.join(config.output_dir, output_name)
+                future = pool.submit(
+                    _render_frame, config, path, measure["bbox"], output_path, max_width, max_height
+                )
+                render_futures[future] = (config_index, path, (output_index, output_path))
+
+        for future in as_completed(render_futures):
+            config_index, path, output_path = render_futures[future]
+            outcome = future.result()
+            if outcome.get("saved"):
+                summaries[config_index]["saved"] += 1
+                summaries[config_index]["outputs"].append(output_path)
+            else:
+                summaries[config_index]["errors"].append(outcome.get("error"))
+            report(f"输出图片：{os.path.basename(path)}")
+
+    for config_index, config, files in jobs:
+        summary = summaries[config_index]
+        if summary["max_size"] is None:
+            results[config_index] = {
+                "success": False,
+                "reason": "all_failed",
+                "message": "全部图片处理失败",
+                "processed": 0,
+                "skipped": summary["total"],
+                "errors": summary["errors"]
+            }
+            continue
+        results[config_index] = {
+            "success": True,
+            "processed": summary["saved"],
+            "skipped": summary["total"] - summary["saved"],
+            "errors": summary["errors"],
+            "output_dir": config.output_dir,
+            "max_size": summary["max_size"]
+        }
+        # 帧完成顺序不固定，按输出序号排序后再打包图集
+        output_paths = [output_path for _, output_path in sorted(summary["outputs"])]
+        _attach_atlas(config, output_paths, results[config_index], status_callback)
+    return results  # type: ignore
@@ -76,6 +76,18 @@ def normalize_remove_mode(remove_mode: str) -> str:
     return "all"
 
 
+def normalize_engine(engine: str) -> str:
+    """
+    归一化处理引擎：auto（优先 numpy）、numpy、python。
+    """
+    value = (engine or "").strip().lower()
+    if value in ("numpy", "np", "vectorized"):
+        return "numpy"
+    if value in ("python", "py", "pure", "pure_python"):
+        return "python"
+    return "auto"
+
+
 def build_output_name(index: int, template: str) -> str:
     """
     基于模板构建输出文件名。
@@ -20,3 +20,12 @@ def get_email_config():
 
 def get_github_config():
     return load_config().get("github", {})
+
+def get_file_index_config():
+    return load_config().get("file_index", {})
+
+def get_context_budget_config():
+    return load_config().get("context_budget", {})
+
+def get_memory_config():
+    return load_config().get("memory", {})
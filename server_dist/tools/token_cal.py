@@ -1,6 +1,20 @@
+"""
+Token 用量统计：
+1) 内存中维护 total/daily/monthly/yearly 汇总，读取不再访问磁盘。
+2) 每次调用只向 token_usage_log.jsonl 追加一行（带唯一编号 u），不再整体重写统计文件。
+3) 后台线程定期（或累计一定条数后）压缩：在跨进程文件锁内重新读取统计文件与日志，合并后写回并清空日志，
+   多个进程共用同一组文件时不会互相覆盖或丢失对方尚未合并的日志行。
+   统计文件记录本次合并的日志编号，写回后、清空日志前退出也不会重复计数。
+"""
+
 import os
 import sys
 import json
+import time
+import uuid
+import atexit
+import threading
+import contextlib
 from datetime import datetime, timedelta
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -8,11 +22,31 @@ project_root = os.path.dirname(current_dir)
 if project_root not in sys.path:
     sys.path.append(project_root)
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
 STATS_FILE = os.path.join(project_root, "history_data", "token_usage_stats.json")
+LOG_FILE = os.path.join(project_root, "history_data", "token_usage_log.jsonl")
+LOCK_FILE = os.path.join(project_root, "history_data", "token_usage.lock")
+
+# 累计多少条未压缩记录后触发压缩，以及后台压缩的最长间隔（秒）
+COMPACT_EVERY = 32
+COMPACT_INTERVAL = 30.0
 
 _sessions = {}
 _active_session_id = None
 
+_lock = threading.RLock()
+_state = None
+_pending = 0
+_version = 0
+_compact_event = threading.Event()
+_compactor = None
+_listeners = []
+
 
 def _default_stats():
     return {
@@ -43,8 +77,203 @@ def _load_stats():
 
 def _save_stats(data):
     os.makedirs(os.path.dirname(STATS_FILE), exist_ok=True)
-    with open(STATS_FILE, "w", encoding="utf-8") as f:
+    tmp_path = STATS_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, STATS_FILE)
+
+
+@contextlib.contextmanager
+def _file_lock():
+    """
+    跨进程互斥锁（锁文件），保护统计文件与日志的读取-合并-清空过程以及日志追加。
+    """
+    os.makedirs(os.path.dirname(LOCK_FILE), exist_ok=True)
+    with open(LOCK_FILE, "a+b") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            while True:
+                try:
+                    # LK_LOCK 最多重试约 10 秒后抛出 OSError，继续等待
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _get_state():
+    """
+    返回内存中的汇总数据（需持有 _lock）；首次访问时加载汇总文件并重放未压缩的日志。
+    """
+    global _state, _pending
+    if _state is None:
+        with _file_lock():
+            data = _load_stats()
+            _pending = _merge_log(data, _read_log())
+        _state = data
+    return _state
+
+
+def _read_log():
+    """
+    读取日志中的全部有效行。
+    """
+    entries = []
+    try:
+        with open(LOG_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                    entry["t"] = datetime.fromisoformat(entry.get("t"))
+                except Exception:
+                    continue
+                entries.append(entry)
+    except OSError:
+        return []
+    return entries
+
+
+def _merge_log(data, entries):
+    """
+    把尚未合并进汇总的日志行累加到 data，返回合并条数。
+    汇总中 merged 列出的编号已合并过；旧格式日志行（无编号）按序号 s 与 seq 比较。
+    """
+    merged_ids = set(data.get("merged") or [])
+    legacy_seq = int(data.get("seq", 0) or 0)
+    applied = 0
+    for entry in entries:
+        entry_id = entry.get("u")
+        if entry_id:
+            if entry_id in merged_ids:
+                continue
+        else:
+            seq = int(entry.get("s", 0) or 0)
+            if seq <= legacy_seq:
+                continue
+            legacy_seq = seq
+        _apply_usage(data, entry["t"], int(entry.get("i_c", 0)), int(entry.get("i_u", 0)),
+                     int(entry.get("o", 0)), float(entry.get("c", 0.0)))
+        applied += 1
+    if legacy_seq:
+        data["seq"] = legacy_seq
+    return applied
+
+
+def _append_log(entry):
+    os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+    with _file_lock():
+        with open(LOG_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+
+def _add_to_bucket(bucket, cached_tokens, input_uncached, output_tokens, cost):
+    bucket["n"] += 1
+    bucket["i_c"] += cached_tokens
+    bucket["i_u"] += input_uncached
+    bucket["o"] += output_tokens
+    bucket["c"] = round(bucket.get("c", 0.0) + cost, 8)
+
+
+def _apply_usage(data, now, cached_tokens, input_uncached, output_tokens, cost):
+    """
+    把一次调用的用量累加到 total/daily/monthly/yearly 四个汇总桶。
+    """
+    day_key, month_key, year_key = _get_date_keys(now)
+    total = data.get("total", {"n": 0, "i_c": 0, "i_u": 0, "o": 0, "c": 0.0})
+    _add_to_bucket(total, cached_tokens, input_uncached, output_tokens, cost)
+    data["total"] = total
+    _add_to_bucket(_ensure_bucket(data, "daily", day_key), cached_tokens, input_uncached, output_tokens, cost)
+    _add_to_bucket(_ensure_bucket(data, "monthly", month_key), cached_tokens, input_uncached, output_tokens, cost)
+    _add_to_bucket(_ensure_bucket(data, "yearly", year_key), cached_tokens, input_uncached, output_tokens, cost)
+
+
+def flush():
+    """
+    立即压缩：在文件锁内以磁盘上的统计文件为基础合并全部日志行，写回后清空日志。
+    其他进程追加但尚未合并的日志行一并合并，内存汇总随之更新为合并结果。
+    """
+    global _state, _pending, _version
+    with _lock:
+        if _state is None or _pending <= 0:
+            return
+        with _file_lock():
+            data = _load_stats()
+            entries = _read_log()
+            _merge_log(data, entries)
+            # 先记录已合并的编号再清空日志：两步之间退出时，重放会跳过这些行
+            data["merged"] = [entry["u"] for entry in entries if entry.get("u")]
+            _save_stats(data)
+            with open(LOG_FILE, "w", encoding="utf-8"):
+                pass
+        _state = data
+        _pending = 0
+        _version += 1
+    _notify_changed()
+
+
+def _compactor_loop():
+    while True:
+        _compact_event.wait(COMPACT_INTERVAL)
+        _compact_event.clear()
+        try:
+            flush()
+        except Exception:
+            pass
+
+
+def _ensure_compactor():
+    global _compactor
+    if _compactor is None:
+        _compactor = threading.Thread(target=_compactor_loop, name="token-cal-compactor", daemon=True)
+        _compactor.start()
+
+
+def add_change_listener(callback):
+    """
+    注册用量变化回调 callback()，每次记录用量后在记录线程中调用。
+    """
+    with _lock:
+        if callback not in _listeners:
+            _listeners.append(callback)
+
+
+def remove_change_listener(callback):
+    with _lock:
+        if callback in _listeners:
+            _listeners.remove(callback)
+
+
+def _notify_changed():
+    with _lock:
+        listeners = list(_listeners)
+    for callback in listeners:
+        try:
+            callback()
+        except Exception:
+            pass
+
+
+def get_stats_version():
+    """
+    返回汇总数据版本号，每记录一次用量加一，供调用方判断缓存是否失效。
+    """
+    return _version
+
+
+atexit.register(flush)
 
 
 def _get_date_keys(now=None):
@@ -127,47 +356,29 @@ def record_usage(usage, session_id=None):
     output_tokens = max(completion_tokens, 0)
     cost = _calc_cost(cached_tokens, input_uncached, output_tokens)
 
-    data = _load_stats()
-    day_key, month_key, year_key = _get_date_keys()
-    total = data.get("total", {"n": 0, "i_c": 0, "i_u": 0, "o": 0, "c": 0.0})
-    total["n"] += 1
-    total["i_c"] += cached_tokens
-    total["i_u"] += input_uncached
-    total["o"] += output_tokens
-    total["c"] = round(total.get("c", 0.0) + cost, 8)
-    data["total"] = total
-
-    day_bucket = _ensure_bucket(data, "daily", day_key)
-    day_bucket["n"] += 1
-    day_bucket["i_c"] += cached_tokens
-    day_bucket["i_u"] += input_uncached
-    day_bucket["o"] += output_tokens
-    day_bucket["c"] = round(day_bucket.get("c", 0.0) + cost, 8)
-
-    month_bucket = _ensure_bucket(data, "monthly", month_key)
-    month_bucket["n"] += 1
-    month_bucket["i_c"] += cached_tokens
-    month_bucket["i_u"] += input_uncached
-    month_bucket["o"] += output_tokens
-    month_bucket["c"] = round(month_bucket.get("c", 0.0) + cost, 8)
-
-    year_bucket = _ensure_bucket(data, "yearly", year_key)
-    year_bucket["n"] += 1
-    year_bucket["i_c"] += cached_tokens
-    year_bucket["i_u"] += input_uncached
-    year_bucket["o"] += output_tokens
-    year_bucket["c"] = round(year_bucket.get("c", 0.0) + cost, 8)
-
-    _save_stats(data)
-
-    if session_id and session_id in _sessions:
-        session_bucket = _sessions[session_id]
-        session_bucket["n"] += 1
-        session_bucket["i_c"] += cached_tokens
-        session_bucket["i_u"] += input_uncached
-        session_bucket["o"] += output_tokens
-        session_bucket["c"] = round(session_bucket.get("c", 0.0) + cost, 8)
-
+    global _pending, _version
+    with _lock:
+        data = _get_state()
+        now = datetime.now()
+        _apply_usage(data, now, cached_tokens, input_uncached, output_tokens, cost)
+        _append_log({
+            "u": uuid.uuid4().hex[:16],
+            "t": now.isoformat(),
+            "i_c": cached_tokens,
+            "i_u": input_uncached,
+            "o": output_tokens,
+            "c": cost
+        })
+        _pending += 1
+        _version += 1
+        _ensure_compactor()
+        if _pending >= COMPACT_EVERY:
+            _compact_event.set()
+
+        if session_id and session_id in _sessions:
+            _add_to_bucket(_sessions[session_id], cached_tokens, input_uncached, output_tokens, cost)
+
+    _notify_changed()
     return {
         "success": True,
         "input_cached": cached_tokens,
@@ -178,8 +389,8 @@ def record_usage(usage, session_id=None):
 
 
 def get_total_summary():
-    data = _load_stats()
-    total = data.get("total", {"n": 0, "i_c": 0, "i_u": 0, "o": 0, "c": 0.0})
+    with _lock:
+        total = dict(_get_state().get("total", {"n": 0, "i_c": 0, "i_u": 0, "o": 0, "c": 0.0}))
     total_tokens = int(total.get("i_c", 0) + total.get("i_u", 0) + total.get("o", 0))
     return {
         "calls": int(total.get("n", 0)),
@@ -187,7 +398,8 @@ def get_total_summary():
         "input_uncached": int(total.get("i_u", 0)),
         "output": int(total.get("o", 0)),
         "tokens": total_tokens,
-        "cost": float(total.get("c", 0.0))
+        "cost": float(total.get("c", 0.0)),
+        "cache_hit_rate": _cache_hit_rate(total)
     }
 
 
@@ -200,17 +412,19 @@ def get_session_summary(session_id):
         "input_uncached": int(session.get("i_u", 0)),
         "output": int(session.get("o", 0)),
         "tokens": total_tokens,
-        "cost": float(session.get("c", 0.0))
+        "cost": float(session.get("c", 0.0)),
+        "cache_hit_rate": _cache_hit_rate(session)
     }
 
 
 def get_compact_memory_summary():
-    data = _load_stats()
-    total = data.get("total", {})
     day_key, month_key, year_key = _get_date_keys()
-    day_bucket = data.get("daily", {}).get(day_key, {})
-    month_bucket = data.get("monthly", {}).get(month_key, {})
-    year_bucket = data.get("yearly", {}).get(year_key, {})
+    with _lock:
+        data = _get_state()
+        total = dict(data.get("total", {}))
+        day_bucket = dict(data.get("daily", {}).get(day_key, {}))
+        month_bucket = dict(data.get("monthly", {}).get(month_key, {}))
+        year_bucket = dict(data.get("yearly", {}).get(year_key, {}))
 
     def _sum_tokens(bucket):
         return int(bucket.get("i_c", 0) + bucket.get("i_u", 0) + bucket.get("o", 0))
@@ -228,7 +442,11 @@ def get_compact_memory_summary():
 
 
 def query_usage(date=None, start_date=None, end_date=None, period="day"):
-    data = _load_stats()
+    with _lock:
+        return _query_usage_locked(_get_state(), date, start_date, end_date, period)
+
+
+def _query_usage_locked(data, date, start_date, end_date, period):
     if period == "total":
         total = data.get("total", {})
         return _normalize_bucket(total)
@@ -261,6 +479,15 @@ def _normalize_period_key(date_str, period):
     return date_str[:10]
 
 
+def _cache_hit_rate(bucket):
+    """
+    输入 token 中命中服务端前缀缓存的比例（0~1），无输入时为 0。
+    """
+    cached = int(bucket.get("i_c", 0))
+    total_input = cached + int(bucket.get("i_u", 0))
+    return round(cached / total_input, 4) if total_input else 0.0
+
+
 def _normalize_bucket(bucket):
     total_tokens = int(bucket.get("i_c", 0) + bucket.get("i_u", 0) + bucket.get("o", 0))
     return {
@@ -270,7 +497,8 @@ def _normalize_bucket(bucket):
         "input_uncached": int(bucket.get("i_u", 0)),
         "output": int(bucket.get("o", 0)),
         "tokens": total_tokens,
-        "cost": float(bucket.get("c", 0.0))
+        "cost": float(bucket.get("c", 0.0)),
+        "cache_hit_rate": _cache_hit_rate(bucket)
     }
 
 
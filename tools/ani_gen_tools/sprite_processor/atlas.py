@@ -0,0 +1,87 @@
+"""
+图集生成模块。
+将处理后的序列帧按网格打包为一张 atlas.png 与描述文件 atlas.json，
+格式与 ani/ani_test/atlas_format.py 一致，可在动画注册表中通过 "atlas" 字段引用。
+"""
+from typing import Dict, List, Tuple
+import json
+import math
+import os
+
+from PIL import Image
+
+ATLAS_JSON_NAME = "atlas.json"
+ATLAS_IMAGE_NAME = "atlas.png"
+MAX_ATLAS_SIDE = 8192
+
+
+def _fit_frame_size(size: Tuple[int, int], max_frame_size: int) -> Tuple[int, int]:
+    """
+    计算缩放后的帧尺寸：max_frame_size > 0 时按比例缩小到长边不超过该值，不放大。
+    """
+    width, height = size
+    if max_frame_size <= 0 or max(width, height) <= max_frame_size:
+        return width, height
+    scale = max_frame_size / float(max(width, height))
+    return max(1, int(round(width * scale))), max(1, int(round(height * scale)))
+
+
+def _grid_columns(count: int, frame_width: int) -> int:
+    """
+    选择接近正方形的列数，并保证图集宽度不超过 MAX_ATLAS_SIDE。
+    """
+    columns = max(1, int(math.ceil(math.sqrt(count))))
+    max_columns = max(1, MAX_ATLAS_SIDE // max(1, frame_width))
+    return min(columns, max_columns)
+
+
+def build_atlas(frame_paths: List[str], output_dir: str, max_frame_size: int = 0) -> Dict:
+    """
+    按顺序将帧图片打包为图集。
+
+    Args:
+        frame_paths: 已对齐的帧图片路径（尺寸一致）。
+        output_dir: 图集输出目录。
+        max_frame_size: 帧长边上限（像素），0 表示保持原尺寸。
+
+    Returns:
+        结果字典：atlas_path、image_path、frames、frame_size。
+    """
+    if not frame_paths:
+        raise ValueError("没有可打包的帧")
+
+    with Image.open(frame_paths[0]) as first:
+        source_size = first.size
+    frame_width, frame_height = _fit_frame_size(source_size, max_frame_size)
+    columns = _grid_columns(len(frame_paths), frame_width)
+    rows = int(math.ceil(len(frame_paths) / float(columns)))
+
+    sheet = Image.new("RGBA", (columns * frame_width, rows * frame_height), (0, 0, 0, 0))
+    frames = []
+    for index, path in enumerate(frame_paths):
+        with Image.open(path) as opened:
+            frame = opened.convert("RGBA")
+        if frame.size != (frame_width, frame_height):
+            frame = frame.resize((frame_width, frame_height), Image.LANCZOS)
+        x = (index % columns) * frame_width
+        y = (index // columns) * frame_height
+        sheet.paste(frame, (x, y))
+        frames.append({"x": x, "y": y, "w": frame_width, "h": frame_height})
+
+    image_path = os.path.join(output_dir, ATLAS_IMAGE_NAME)
+    atlas_path = os.path.join(output_dir, ATLAS_JSON_NAME)
+    sheet.save(image_path, format="PNG")
+    data = {
+        "image": ATLAS_IMAGE_NAME,
+        "source_size": [source_size[0], source_size[1]],
+        "frames": frames
+    }
+    with open(atlas_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False, indent=2)
+
+    return {
+        "atlas_path": atlas_path,
+        "image_path": image_path,
+        "frames": len(frames),
+        "frame_size": (frame_width, frame_height)
+    }
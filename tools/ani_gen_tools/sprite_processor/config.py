@@ -17,5 +17,9 @@ class SpriteProcessorConfig:
     white_threshold: int = 250
     background_color: Tuple[int, int, int] = (255, 255, 255)
     remove_mode: str = "all"
+    engine: str = "auto"
+    workers: int = 1
+    atlas: bool = False
+    atlas_max_frame_size: int = 0
     name_template: str = "frame_{index:03d}.png"
     supported_exts: Tuple[str, ...] = (".png", ".jpg", ".jpeg")
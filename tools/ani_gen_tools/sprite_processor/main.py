@@ -9,14 +9,14 @@ import sys
 try:
     from .config import SpriteProcessorConfig
     from .processor import SpriteProcessor
-    from .utils import parse_color_text, normalize_alignment, normalize_remove_mode
+    from .utils import parse_color_text, normalize_alignment, normalize_remove_mode, normalize_engine
 except Exception:
     current_dir = os.path.dirname(os.path.abspath(__file__))
     if current_dir not in sys.path:
         sys.path.append(current_dir)
     from config import SpriteProcessorConfig
     from processor import SpriteProcessor
-    from utils import parse_color_text, normalize_alignment, normalize_remove_mode
+    from utils import parse_color_text, normalize_alignment, normalize_remove_mode, normalize_engine
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -31,6 +31,10 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument("--bg-color", default=None, help="背景色，格式 255,255,255 或 #FFFFFF")
     parser.add_argument("--name-template", default="frame_{index:03d}.png", help="输出命名模板")
     parser.add_argument("--remove-mode", default="all", help="抠图模式：all 或 edge")
+    parser.add_argument("--workers", type=int, default=1, help="并行进程数：1 为单进程，0 表示使用全部 CPU 核心")
+    parser.add_argument("--atlas", action="store_true", help="额外将输出帧打包为图集 atlas.png + atlas.json")
+    parser.add_argument("--atlas-max-size", type=int, default=0, help="图集中单帧长边上限（像素），0 表示保持原尺寸")
+    parser.add_argument("--engine", default="auto", help="处理引擎：auto、numpy 或 python（python 为逐像素实现，用于结果对比）")
     return parser
 
 
@@ -68,7 +72,11 @@ def main() -> None:
         white_threshold=args.threshold,
         background_color=bg_color,
         name_template=args.name_template,
-        remove_mode=remove_mode
+        remove_mode=remove_mode,
+        engine=normalize_engine(args.engine),
+        workers=args.workers,
+        atlas=args.atlas,
+        atlas_max_frame_size=args.atlas_max_size
     )
     processor = SpriteProcessor(config)
     result = processor.process()
@@ -83,6 +91,8 @@ def main() -> None:
     print("处理完成")
     print(f"输出目录：{result.get('output_dir')}")
     print(f"处理数量：{result.get('processed')}")
+    if result.get("atlas_path"):
+        print(f"图集文件：{result.get('atlas_path')}")
     if result.get("errors"):
         print(f"失败数量：{len(result.get('errors'))}")
 
@@ -184,7 +184,8 @@ class SpriteProcessorUI(QWidget):
             output_dir=output_dir,
             alignment=alignment,
             white_threshold=threshold,
-            remove_mode=remove_mode
+            remove_mode=remove_mode,
+            workers=0
         )
 
         self.start_button.setEnabled(False)
@@ -9,7 +9,7 @@ import random
 from typing import Optional
 
 from PyQt5.QtWidgets import QWidget, QApplication, QMenu
-from PyQt5.QtCore import Qt, QPoint, QSize, QPointF, QTimer
+from PyQt5.QtCore import Qt, QPoint, QSize, QPointF, QTimer, QFileSystemWatcher, pyqtSignal
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(current_dir)
@@ -29,6 +29,16 @@ except Exception:
     get_sequence_items = None
     get_default_sequence_name = None
 
+try:
+    from ani.ani_test.frame_sequence_player import build_scale_levels
+except Exception:
+    build_scale_levels = None
+
+from ani.pet_state_bus import get_pet_state_bus
+
+# 窗口自身写入状态时使用的来源标识，收到自己发出的更新时忽略
+WINDOW_STATE_SOURCE = "animation_window"
+
 
 class RandomSequenceController:
     def __init__(self, widget: QWidget):
@@ -88,7 +98,10 @@ class AnimationLayerWindow(QWidget):
     """
     动画展示层窗口。
     独立于主 UI 启动，始终处于底层显示，但高于主 UI。
+    状态来自宠物状态总线：同进程的控制指令即时推送，快照文件被外部修改时由文件监听触发同步。
     """
+    state_pushed = pyqtSignal(dict)
+
     def __init__(self, parent: Optional[QWidget] = None):
         """
         初始化动画层窗口。
@@ -109,17 +122,48 @@ class AnimationLayerWindow(QWidget):
         self.play_mode = "manual"
         self.state_signature = None
         self.random_controller = None
-        self.state_timer = QTimer(self)
-        self.state_timer.setInterval(1000)
-        self.state_timer.timeout.connect(self.sync_state_from_file)
+        self.state_bus = get_pet_state_bus()
 
         self.init_window_flags()
         self.init_ui()
         self.apply_saved_state()
         self.sync_state_from_file(force=True)
-        self.state_timer.start()
+        self.init_state_channel()
         self.state_ready = True
 
+    def init_state_channel(self) -> None:
+        """
+        订阅状态总线，并监听快照文件的外部修改（替代定时轮询）。
+        总线回调可能来自工作线程，通过信号切回 GUI 线程处理。
+        """
+        self.state_pushed.connect(self.apply_state)
+        unsubscribe = self.state_bus.subscribe(self._on_state_changed)
+        self.destroyed.connect(lambda *_: unsubscribe())
+
+        # 快照写入是“临时文件 + 替换”，短时间内会触发多次变化，合并为一次检查
+        self.snapshot_timer = QTimer(self)
+        self.snapshot_timer.setSingleShot(True)
+        self.snapshot_timer.setInterval(100)
+        self.snapshot_timer.timeout.connect(self._reload_snapshot)
+        self.snapshot_watcher = QFileSystemWatcher(self)
+        self.snapshot_watcher.addPath(os.path.dirname(self.state_bus.state_file))
+        if os.path.exists(self.state_bus.state_file):
+            self.snapshot_watcher.addPath(self.state_bus.state_file)
+        self.snapshot_watcher.fileChanged.connect(lambda _path: self.snapshot_timer.start())
+        self.snapshot_watcher.directoryChanged.connect(lambda _path: self.snapshot_timer.start())
+
+    def _on_state_changed(self, changed: dict, state: dict, source: Optional[str]) -> None:
+        if source == WINDOW_STATE_SOURCE:
+            return
+        self.state_pushed.emit(state)
+
+    def _reload_snapshot(self) -> None:
+        state_file = self.state_bus.state_file
+        # 文件被替换后监听会失效，需要重新添加
+        if os.path.exists(state_file) and state_file not in self.snapshot_watcher.files():
+            self.snapshot_watcher.addPath(state_file)
+        self.state_bus.reload_snapshot()
+
     def init_window_flags(self) -> None:
         """
         设置窗口标志，保证透明背景与底层显示。
@@ -154,6 +198,9 @@ class AnimationLayerWindow(QWidget):
             self.animation_widget.setStyleSheet("background: transparent;")
         else:
             self.animation_widget = QWidget(self)
+        player = getattr(self.animation_widget, "player", None)
+        if player is not None and build_scale_levels is not None:
+            player.set_scale_levels(build_scale_levels(self.min_scale, self.max_scale))
         self.resize_to_frame()
 
     def resize_to_frame(self) -> None:
@@ -171,9 +218,9 @@ class AnimationLayerWindow(QWidget):
             self.base_size = QSize(200, 200)
             self.apply_scale(self.scale_factor)
             return
-        pixmaps = getattr(self.animation_widget.player, "pixmaps", [])
-        if pixmaps:
-            self.base_size = pixmaps[0].size()
+        source_size = self.animation_widget.player.get_source_size()
+        if source_size.isValid():
+            self.base_size = source_size
             self.apply_scale(self.scale_factor)
             return
         self.base_size = QSize(200, 200)
@@ -199,11 +246,10 @@ class AnimationLayerWindow(QWidget):
         self.resize_to_frame()
         self.current_sequence = name
         if self.state_ready:
-            data = self.load_animation_state()
-            data["current_sequence"] = name
-            if "play_mode" not in data:
-                data["play_mode"] = self.play_mode
-            self.save_animation_state(data)
+            delta = {"current_sequence": name}
+            if "play_mode" not in self.load_animation_state():
+                delta["play_mode"] = self.play_mode
+            self.save_animation_state(delta)
 
     def apply_scale(self, scale: float) -> None:
         """
@@ -239,29 +285,15 @@ class AnimationLayerWindow(QWidget):
 
     def load_animation_state(self) -> dict:
         """
-        读取动画窗口状态数据。
+        读取动画窗口状态数据（来自状态总线）。
         """
-        state_file = os.path.join(project_root, "ani", "animation_state.json")
-        if not os.path.exists(state_file):
-            return {}
-        try:
-            with open(state_file, "r", encoding="utf-8") as file:
-                data = json.load(file)
-            return data if isinstance(data, dict) else {}
-        except Exception:
-            return {}
+        return self.state_bus.get_state()
 
     def save_animation_state(self, data: dict) -> None:
         """
-        保存动画窗口状态数据。
+        将状态字段写入状态总线，由总线负责保存快照。
         """
-        state_file = os.path.join(project_root, "ani", "animation_state.json")
-        os.makedirs(os.path.dirname(state_file), exist_ok=True)
-        try:
-            with open(state_file, "w", encoding="utf-8") as file:
-                json.dump(data, file, ensure_ascii=False, separators=(",", ":"))
-        except Exception:
-            pass
+        self.state_bus.update(data, source=WINDOW_STATE_SOURCE)
 
     def save_current_state(self) -> None:
         """
@@ -269,7 +301,7 @@ class AnimationLayerWindow(QWidget):
         """
         if not self.state_ready:
             return
-        data = self.load_animation_state()
+        data = {}
         data["animation_window"] = {
             "x": self.x(),
             "y": self.y(),
@@ -359,7 +391,12 @@ class AnimationLayerWindow(QWidget):
         self.random_controller.update_config(weights=weights, min_seconds=min_seconds, max_seconds=max_seconds)
 
     def sync_state_from_file(self, force: bool = False) -> None:
-        data = self.load_animation_state()
+        self.apply_state(self.load_animation_state(), force=force)
+
+    def apply_state(self, data: dict, force: bool = False) -> None:
+        """
+        应用状态中的播放模式与当前序列，状态签名未变化时跳过。
+        """
         signature = self._build_state_signature(data)
         if not force and signature == self.state_signature:
             return
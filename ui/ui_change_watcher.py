@@ -0,0 +1,152 @@
+"""
+数据变化通知服务。
+模块职责：
+1) 汇总任务数据、Token 用量等数据源的变化，按主题去抖后通知界面订阅者，替代各面板的定时轮询。
+2) 进程内写入通过数据模块的变化回调即时得知；其他进程写入通过 QFileSystemWatcher 监听文件得知。
+3) 数据模块的回调可能来自工作线程，统一经队列信号切回 GUI 线程后再分发。
+"""
+import os
+import sys
+from typing import Callable, Dict, List
+
+from PyQt5.QtCore import QObject, QTimer, QFileSystemWatcher, pyqtSignal, Qt
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+try:
+    from history_data.task_store import get_task_store, DB_FILE, LEGACY_JSON_FILE
+except ImportError:
+    get_task_store = None
+    DB_FILE = None
+    LEGACY_JSON_FILE = None
+
+try:
+    from tools import token_cal
+except ImportError:
+    token_cal = None
+
+# 变化主题
+TOPIC_TASKS = "tasks"
+TOPIC_TOKEN_USAGE = "token_usage"
+
+# 去抖间隔：同一主题在该时间内的多次变化合并为一次通知
+DEFAULT_DEBOUNCE_MS = 150
+
+
+class ChangeWatcher(QObject):
+    """
+    按主题分发数据变化事件的服务，只能在 GUI 线程中创建。
+    changed 信号携带主题名；也可通过 subscribe 注册回调。
+    """
+    changed = pyqtSignal(str)
+    _raw_changed = pyqtSignal(str)
+
+    def __init__(self, debounce_ms: int = DEFAULT_DEBOUNCE_MS, parent=None):
+        super().__init__(parent)
+        self.debounce_ms = debounce_ms
+        self._subscribers: Dict[str, List[Callable[[str], None]]] = {}
+        self._timers: Dict[str, QTimer] = {}
+        self._watched_files: Dict[str, str] = {}
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_file_changed)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+        # 跨线程发射时自动排队到本对象所在的 GUI 线程
+        self._raw_changed.connect(self._schedule, Qt.QueuedConnection)
+
+    def subscribe(self, topic: str, callback: Callable[[str], None]) -> Callable[[], None]:
+        """
+        订阅主题变化，返回取消订阅的函数。回调在 GUI 线程中执行，参数为主题名。
+        """
+        self._subscribers.setdefault(topic, []).append(callback)
+
+        def unsubscribe() -> None:
+            callbacks = self._subscribers.get(topic, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+        return unsubscribe
+
+    def notify(self, topic: str) -> None:
+        """
+        报告主题发生变化，可在任意线程调用。
+        """
+        self._raw_changed.emit(topic)
+
+    def watch_file(self, topic: str, path: str) -> None:
+        """
+        监听文件变化并映射到主题；文件暂不存在时监听其所在目录，创建后自动补上。
+        """
+        if not path:
+            return
+        path = os.path.abspath(path)
+        self._watched_files[path] = topic
+        directory = os.path.dirname(path)
+        if os.path.isdir(directory) and directory not in self._watcher.directories():
+            self._watcher.addPath(directory)
+        if os.path.exists(path) and path not in self._watcher.files():
+            self._watcher.addPath(path)
+
+    def _on_file_changed(self, path: str) -> None:
+        path = os.path.abspath(path)
+        # “临时文件 + 替换”式写入后原监听会失效，需要重新添加
+        if os.path.exists(path) and path not in self._watcher.files():
+            self._watcher.addPath(path)
+        topic = self._watched_files.get(path)
+        if topic:
+            self._schedule(topic)
+
+    def _on_directory_changed(self, directory: str) -> None:
+        directory = os.path.abspath(directory)
+        for path, topic in self._watched_files.items():
+            if os.path.dirname(path) != directory or not os.path.exists(path):
+                continue
+            if path not in self._watcher.files():
+                self._watcher.addPath(path)
+                self._schedule(topic)
+
+    def _schedule(self, topic: str) -> None:
+        timer = self._timers.get(topic)
+        if timer is None:
+            timer = QTimer(self)
+            timer.setSingleShot(True)
+            timer.setInterval(self.debounce_ms)
+            timer.timeout.connect(lambda: self._dispatch(topic))
+            self._timers[topic] = timer
+        if not timer.isActive():
+            timer.start()
+
+    def _dispatch(self, topic: str) -> None:
+        self.changed.emit(topic)
+        for callback in list(self._subscribers.get(topic, [])):
+            try:
+                callback(topic)
+            except RuntimeError:
+                # 订阅者控件已被销毁
+                self._subscribers[topic].remove(callback)
+            except Exception as e:
+                print(f"变化通知回调失败（{topic}）：{e}")
+
+
+_watcher = None
+
+
+def get_change_watcher() -> ChangeWatcher:
+    """
+    获取共享的变化通知服务；首次调用时接入任务存储与 Token 统计的变化回调并监听相关文件。
+    需在 QApplication 创建后于 GUI 线程中调用。
+    """
+    global _watcher
+    if _watcher is None:
+        watcher = ChangeWatcher()
+        if get_task_store is not None:
+            get_task_store().add_change_listener(lambda: watcher.notify(TOPIC_TASKS))
+            # 外部进程写数据库（WAL 模式下先写 -wal 文件）或替换 history_data.json 时同样触发
+            for path in (DB_FILE, f"{DB_FILE}-wal", LEGACY_JSON_FILE):
+                watcher.watch_file(TOPIC_TASKS, path)
+        if token_cal is not None and hasattr(token_cal, "add_change_listener"):
+            token_cal.add_change_listener(lambda: watcher.notify(TOPIC_TOKEN_USAGE))
+        _watcher = watcher
+    return _watcher
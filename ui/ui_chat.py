@@ -4,10 +4,11 @@ import uuid
 import json
 import asyncio
 import time
+import threading
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
                              QTextEdit, QFrame, QApplication, QSizePolicy, QLabel, QCheckBox)
 from PyQt5.QtCore import Qt, pyqtSignal, QThread, QTimer, QObject
-from PyQt5.QtGui import QFont, QTextCursor, QTextCharFormat, QColor
+from PyQt5.QtGui import QFont, QTextCursor, QTextCharFormat, QColor, QTextDocument, QTextDocumentFragment
 
 # 导入 history_data
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -16,6 +17,12 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 UI_STATE_FILE = os.path.join(current_dir, "ui_state.json")
 
+# 流式输出刷新间隔（约 30 帧/秒）
+STREAM_FLUSH_INTERVAL_MS = 33
+# 聊天显示区字符上限：超过后把最早的内容移出文档（滚动到顶部时再逐段取回）
+MAX_DISPLAY_CHARS = 200000
+TRIM_TO_DISPLAY_CHARS = 150000
+
 # 尝试导入 RemoteClient
 RemoteClient = None
 try:
@@ -59,6 +66,16 @@ except ImportError:
             return {"tokens": 0, "cost": 0.0}
     token_cal = MockTokenCal()
 
+from core.stream_tokens import (
+    ControlTokenStream, KIND_THOUGHT, KIND_PROGRESS,
+    THOUGHT_START, THOUGHT_END, PROGRESS_START, PROGRESS_END, FINAL_START, FINAL_END
+)
+
+try:
+    from ui.ui_change_watcher import get_change_watcher, TOPIC_TOKEN_USAGE
+except ImportError:
+    from ui_change_watcher import get_change_watcher, TOPIC_TOKEN_USAGE
+
 try:
     from . import ui_image
 except Exception:
@@ -214,15 +231,65 @@ class RemoteService(QThread):
                 self.loop
             )
 
+class StreamOutputBuffer(QObject):
+    """
+    流式输出缓冲：任意线程写入片段，在 GUI 线程中按固定帧率合并后通过 flushed 信号一次性输出。
+    片段中出现控制标记结尾（]]）时立即刷新，保证区段切换及时显示。
+    """
+    flushed = pyqtSignal(str)
+    _ready = pyqtSignal(bool)
+
+    def __init__(self, interval_ms=STREAM_FLUSH_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self._lock = threading.Lock()
+        self._parts = []
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.flush)
+        self._ready.connect(self._schedule, Qt.QueuedConnection)
+
+    def push(self, text):
+        """写入一个片段，可在工作线程中调用。"""
+        if not text:
+            return
+        with self._lock:
+            was_empty = not self._parts
+            self._parts.append(text)
+        immediate = "]]" in text
+        if was_empty or immediate:
+            self._ready.emit(immediate)
+
+    def _schedule(self, immediate):
+        if immediate:
+            self.flush()
+        elif not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        """立即输出已缓冲的全部内容（GUI 线程）。"""
+        self.timer.stop()
+        with self._lock:
+            text = "".join(self._parts)
+            self._parts = []
+        if text:
+            self.flushed.emit(text)
+
+    def clear(self):
+        self.timer.stop()
+        with self._lock:
+            self._parts = []
+
+
 class ChatWorker(QThread):
-    """后台线程处理 AI 请求"""
-    chunk_received = pyqtSignal(str)
+    """后台线程处理 AI 请求，输出片段写入 StreamOutputBuffer 由界面按帧率合并显示"""
     finished = pyqtSignal()
     
-    def __init__(self, agent, text):
+    def __init__(self, agent, text, output_buffer):
         super().__init__()
         self.agent = agent
         self.text = text
+        self.output_buffer = output_buffer
         self._stop_requested = False
 
     def request_stop(self):
@@ -237,9 +304,9 @@ class ChatWorker(QThread):
                     if hasattr(stream, "close"):
                         stream.close()
                     break
-                self.chunk_received.emit(chunk)
+                self.output_buffer.push(chunk)
         except Exception as e:
-            self.chunk_received.emit(f"Error: {str(e)}")
+            self.output_buffer.push(f"Error: {str(e)}")
         self.finished.emit()
 
 class ChatInputEdit(QTextEdit):
@@ -284,23 +351,27 @@ class ChatPanel(QWidget):
         self.text_color = "white"
         self.border_color = "rgba(255, 255, 255, 50)"
         self.is_light = False
-        self.thought_mode = False
-        self.progress_mode = False
-        self.final_mode = False
-        self.stream_buffer = ""
-        self.thought_start_token = "[[THOUGHT_START]]"
-        self.thought_end_token = "[[THOUGHT_END]]"
-        self.progress_start_token = "[[PROGRESS_START]]"
-        self.progress_end_token = "[[PROGRESS_END]]"
-        self.final_start_token = "[[FINAL_START]]"
-        self.final_end_token = "[[FINAL_END]]"
+        # 流式控制标记解析器（跨块保留被截断的标记），每轮对话重新创建
+        self.stream_parser = ControlTokenStream()
+        self.thought_start_token = THOUGHT_START
+        self.thought_end_token = THOUGHT_END
+        self.progress_start_token = PROGRESS_START
+        self.progress_end_token = PROGRESS_END
+        self.final_start_token = FINAL_START
+        self.final_end_token = FINAL_END
+        # 流式片段先进入缓冲，按帧率合并后再解析与渲染；片段格式按类型缓存
+        self.output_buffer = StreamOutputBuffer(parent=self)
+        self.output_buffer.flushed.connect(self.handle_chunk)
+        self.pending_segments = []
+        self.segment_formats = {}
+        # 超出显示上限而移出文档的早期内容（QTextDocumentFragment，按时间顺序）
+        self.archived_fragments = []
         self.base_font_size = 14
         self.thought_font_size = 12
         self.progress_font_size = max(int(self.base_font_size * 0.8), 7)
         self.session_id = None
-        self.session_timer = QTimer(self)
-        self.session_timer.setInterval(200)
-        self.session_timer.timeout.connect(self.refresh_token_stats)
+        # Token 用量变化时由通知服务触发刷新，替代对话期间的定时轮询
+        get_change_watcher().subscribe(TOPIC_TOKEN_USAGE, lambda _topic: self.refresh_token_stats())
         self.worker = None
         self.is_processing = False
         self.capture_check_timestamp = None
@@ -357,10 +428,11 @@ class ChatPanel(QWidget):
             return
 
         if msg_type == "chunk":
-            self.handle_chunk(content)
+            self.output_buffer.push(content)
         elif msg_type == "end":
             self.handle_finished()
         elif msg_type == "error":
+            self.output_buffer.flush()
             self.append_message("系统", f"云端错误: {content}")
             self.handle_finished()
         
@@ -377,10 +449,8 @@ class ChatPanel(QWidget):
         self.append_message("AI", "")
         
         # 准备新一轮对话的 UI 状态
-        self.stream_buffer = ""
-        self.thought_mode = False
-        self.progress_mode = False
-        self.final_mode = False
+        self.stream_parser = ControlTokenStream()
+        self.output_buffer.clear()
         
         # 如果开启了云端模式且服务可用
         if self.cloud_mode and self.remote_service:
@@ -392,11 +462,9 @@ class ChatPanel(QWidget):
         self.session_id = str(uuid.uuid4())
         token_cal.start_session(self.session_id)
         token_cal.set_active_session(self.session_id)
-        self.session_timer.start()
         self.capture_check_timestamp = time.time()
         
-        self.worker = ChatWorker(self.agent, text)
-        self.worker.chunk_received.connect(self.handle_chunk)
+        self.worker = ChatWorker(self.agent, text, self.output_buffer)
         self.worker.finished.connect(self.handle_finished)
         self.worker.start()
 
@@ -411,15 +479,15 @@ class ChatPanel(QWidget):
 
     def handle_finished(self):
         """处理对话结束"""
+        self.output_buffer.flush()
+        self.flush_stream_render(end_of_stream=True)
         self.is_processing = False
         self._update_send_button_state()
-        self.session_timer.stop()
         if self.remote_service:
             self.remote_service.send_stream_end()
         
         if self.current_feishu_context:
             self.current_feishu_context = None
-        self.session_timer.stop()
         self.refresh_token_stats()
         
         # 如果是飞书触发的对话，提取最终答案并发送回复
@@ -493,6 +561,7 @@ class ChatPanel(QWidget):
         # 聊天记录显示区
         self.chat_display = QTextEdit()
         self.chat_display.setReadOnly(True)
+        self.chat_display.verticalScrollBar().valueChanged.connect(self.on_display_scrolled)
         layout.addWidget(self.chat_display)
 
         self.session_stats_frame = QFrame()
@@ -535,6 +604,7 @@ class ChatPanel(QWidget):
     def clear_chat(self):
         """清空聊天记录显示"""
         self.chat_display.clear()
+        self.archived_fragments = []
         if hasattr(self.agent, 'clear_context'):
             # 同步清空对话记忆文件
             self.agent.clear_context()
@@ -551,8 +621,18 @@ class ChatPanel(QWidget):
 
     def save_chat_history(self):
         """保存聊天记录到文件"""
+        self.flush_stream_render()
         try:
-            html = self.chat_display.toHtml()
+            if self.archived_fragments:
+                # 被移出显示区的早期内容同样需要保存
+                full_document = QTextDocument()
+                cursor = QTextCursor(full_document)
+                for fragment in self.archived_fragments:
+                    cursor.insertFragment(fragment)
+                cursor.insertFragment(QTextDocumentFragment(self.chat_display.document()))
+                html = full_document.toHtml()
+            else:
+                html = self.chat_display.toHtml()
             # 确保目录存在
             os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
             with open(self.history_file, 'w', encoding='utf-8') as f:
@@ -568,6 +648,7 @@ class ChatPanel(QWidget):
                     html = f.read()
                     self.chat_display.setHtml(html)
                     self.chat_display.moveCursor(QTextCursor.End)
+                    self.trim_display()
             except Exception as e:
                 print(f"Error loading chat history: {e}")
 
@@ -601,6 +682,7 @@ class ChatPanel(QWidget):
         
     def append_user_message(self, text, source="本地"):
         """添加用户消息"""
+        self.flush_stream_render()
         self.chat_display.moveCursor(QTextCursor.End)
         self.chat_display.insertPlainText("\n") # 确保换行
         
@@ -625,6 +707,7 @@ class ChatPanel(QWidget):
         
     def append_message(self, sender, text):
         """添加 AI 消息 (如果是 AI，则只添加前缀，内容通过流式追加)"""
+        self.flush_stream_render()
         self.chat_display.moveCursor(QTextCursor.End)
         # 只有当文本不为空时才添加换行符，避免开头的空行
         if self.chat_display.toPlainText().strip():
@@ -653,76 +736,100 @@ class ChatPanel(QWidget):
     
     def process_stream_chunk(self, chunk):
         """
-        处理流式输出的文本块，直接追加到 TextEdit
-        TODO: 支持 Markdown 渲染或者特殊 token 解析 (如 [THOUGHT])
+        处理（已按帧率合并的）流式文本块：增量解析控制标记后一次性插入 TextEdit。
         """
+        segments = self.stream_parser.feed(chunk)
+        if not segments:
+            return
+        self.pending_segments.extend(segments)
+        self.flush_stream_render()
+
+    def flush_stream_render(self, end_of_stream=False):
+        """
+        将待渲染片段一次性插入 TextEdit；end_of_stream 为 True 时同时输出解析器中暂存的内容。
+        """
+        if end_of_stream:
+            self.pending_segments.extend(self.stream_parser.flush())
+        if not self.pending_segments:
+            return
+        segments = self.pending_segments
+        self.pending_segments = []
+
         cursor = self.chat_display.textCursor()
         cursor.movePosition(QTextCursor.End)
-        
-        def build_format():
-            format_text = QTextCharFormat()
-            if self.thought_mode or self.progress_mode:
-                format_text.setForeground(QColor("gray"))
-                format_text.setFontItalic(True)
-                format_text.setFontPointSize(self.thought_font_size if self.thought_mode else self.progress_font_size)
-                return format_text
+        cursor.beginEditBlock()
+        kind = segments[0].kind
+        parts = []
+        for segment in segments:
+            if segment.kind != kind:
+                cursor.insertText("".join(parts), self.get_segment_format(kind))
+                kind = segment.kind
+                parts = []
+            parts.append(segment.text)
+        cursor.insertText("".join(parts), self.get_segment_format(kind))
+        cursor.endEditBlock()
+        self.chat_display.moveCursor(QTextCursor.End)
+        self.trim_display()
+
+    def trim_display(self):
+        """
+        文档超过显示上限时，把最早的内容（整段）移出文档暂存，保持布局与重绘开销有界。
+        用户正在向上查看历史时不裁剪。
+        """
+        document = self.chat_display.document()
+        if document.characterCount() <= MAX_DISPLAY_CHARS:
+            return
+        bar = self.chat_display.verticalScrollBar()
+        if bar.value() < bar.maximum():
+            return
+        cut = document.findBlock(document.characterCount() - TRIM_TO_DISPLAY_CHARS).position()
+        if cut <= 0:
+            return
+        cursor = QTextCursor(document)
+        cursor.setPosition(0)
+        cursor.setPosition(cut, QTextCursor.KeepAnchor)
+        self.archived_fragments.append(cursor.selection())
+        cursor.removeSelectedText()
+        self.chat_display.moveCursor(QTextCursor.End)
+
+    def on_display_scrolled(self, value):
+        """滚动到顶部时取回一段被移出的早期内容，并保持当前可见位置不跳动。"""
+        bar = self.chat_display.verticalScrollBar()
+        if value != bar.minimum() or not self.archived_fragments or bar.maximum() <= 0:
+            return
+        fragment = self.archived_fragments.pop()
+        old_maximum = bar.maximum()
+        cursor = QTextCursor(self.chat_display.document())
+        cursor.setPosition(0)
+        cursor.insertFragment(fragment)
+        bar.setValue(bar.maximum() - old_maximum)
+
+    def get_segment_format(self, kind):
+        """
+        返回片段类型对应的文本格式（按类型缓存，样式变化时清空）。
+        """
+        format_text = self.segment_formats.get(kind)
+        if format_text is not None:
+            return format_text
+        format_text = QTextCharFormat()
+        if kind in (KIND_THOUGHT, KIND_PROGRESS):
+            format_text.setForeground(QColor("gray"))
+            format_text.setFontItalic(True)
+            format_text.setFontPointSize(self.thought_font_size if kind == KIND_THOUGHT else self.progress_font_size)
+        else:
             if self.is_light:
                 format_text.setForeground(QColor("black"))
             else:
                 format_text.setForeground(QColor(self.text_color))
             format_text.setFontPointSize(self.base_font_size)
-            return format_text
+        self.segment_formats[kind] = format_text
+        return format_text
 
-        tokens = [
-            (self.thought_start_token, "thought_start"),
-            (self.thought_end_token, "thought_end"),
-            (self.progress_start_token, "progress_start"),
-            (self.progress_end_token, "progress_end"),
-            (self.final_start_token, "final_start"),
-            (self.final_end_token, "final_end"),
-        ]
-
-        remaining = chunk
-        while remaining:
-            next_index = -1
-            next_token = None
-            next_type = None
-            for token, token_type in tokens:
-                index = remaining.find(token)
-                if index != -1 and (next_index == -1 or index < next_index):
-                    next_index = index
-                    next_token = token
-                    next_type = token_type
-
-            if next_index == -1:
-                cursor.insertText(remaining, build_format())
-                break
-
-            if next_index > 0:
-                cursor.insertText(remaining[:next_index], build_format())
-
-            if next_type == "thought_start":
-                self.thought_mode = True
-            elif next_type == "thought_end":
-                self.thought_mode = False
-            elif next_type == "progress_start":
-                self.progress_mode = True
-            elif next_type == "progress_end":
-                self.progress_mode = False
-            elif next_type == "final_start":
-                self.final_mode = True
-                self.thought_mode = False
-                self.progress_mode = False
-            elif next_type == "final_end":
-                self.final_mode = False
-
-            remaining = remaining[next_index + len(next_token):]
-        self.chat_display.moveCursor(QTextCursor.End)
-        
     def update_style(self, text_color, border_color, is_light):
         self.text_color = text_color
         self.border_color = border_color
         self.is_light = is_light
+        self.segment_formats = {}
         # 刷新现有文本颜色需要重绘，这里暂时只影响新消息
 
     def refresh_token_stats(self):
@@ -759,8 +866,6 @@ class ChatPanel(QWidget):
         self.is_processing = False
         self.input_edit.setReadOnly(False)
         self._update_send_button_state()
-        if self.session_timer.isActive():
-            self.session_timer.stop()
         self.refresh_token_stats()
         self.append_message("System", "[用户已停止生成]")
 
@@ -824,6 +929,7 @@ class ChatPanel(QWidget):
         self.base_font_size = 10
         self.thought_font_size = max(self.base_font_size * 0.8, 7)
         self.progress_font_size = max(self.base_font_size * 0.8, 7)
+        self.segment_formats = {}
         
         bg_color = "rgba(0, 0, 0, 30)" if is_light_theme else "rgba(255, 255, 255, 10)"
         input_bg = "rgba(0, 0, 0, 10)" if is_light_theme else "rgba(255, 255, 255, 20)"
@@ -35,6 +35,11 @@ except ImportError:
             return {"success": True, "tokens": 0, "cost": 0.0}
     token_cal = MockTokenCal()
 
+try:
+    from ui.ui_change_watcher import get_change_watcher, TOPIC_TASKS, TOPIC_TOKEN_USAGE
+except ImportError:
+    from ui_change_watcher import get_change_watcher, TOPIC_TASKS, TOPIC_TOKEN_USAGE
+
 class HistoryPanel(QWidget):
     """
     历史数据展示面板
@@ -48,11 +53,14 @@ class HistoryPanel(QWidget):
         
         self.init_ui()
         
-        # 定时刷新数据 (每次显示时刷新也可以，这里简单用定时器每5秒刷新一次)
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.refresh_data)
-        self.timer.start(5000)
-        
+        # 任务数据或 Token 用量变化时刷新；“今日/本月/今年”统计在日期变化时由零点定时器刷新
+        watcher = get_change_watcher()
+        watcher.subscribe(TOPIC_TASKS, lambda _topic: self.refresh_data())
+        watcher.subscribe(TOPIC_TOKEN_USAGE, lambda _topic: self.refresh_data())
+        self.day_timer = QTimer(self)
+        self.day_timer.setSingleShot(True)
+        self.day_timer.timeout.connect(self.refresh_data)
+
         self.refresh_data()
         self._apply_saved_ui_state()
 
@@ -169,9 +177,19 @@ class HistoryPanel(QWidget):
                     tokens = value.get("tokens", 0)
                     cost = value.get("cost", 0.0)
                     self.stat_labels[key]["value"].setText(f"{tokens}\n{cost:.6f}元")
+                    hit_rate = value.get("cache_hit_rate", 0.0)
+                    self.stat_labels[key]["value"].setToolTip(f"输入缓存命中率：{hit_rate:.1%}")
                 else:
                     self.stat_labels[key]["value"].setText(str(value))
 
+        self._schedule_day_refresh()
+
+    def _schedule_day_refresh(self):
+        """在下一个零点后刷新一次，保证按日期分桶的统计及时切换。"""
+        now = datetime.now()
+        next_day = (now + timedelta(days=1)).replace(hour=0, minute=0, second=1, microsecond=0)
+        self.day_timer.start(int((next_day - now).total_seconds() * 1000))
+
     def _load_ui_state(self):
         if not os.path.exists(UI_STATE_FILE):
             return {}
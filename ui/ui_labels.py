@@ -14,16 +14,19 @@ try:
     from ai_tools import ai_task_manager
     from ai_tools.ai_split_task import split_task
     from ai_tools.task_hierarchy_manager import save_ui_tasks, generate_task_id
+    from history_data.history_data import get_history_version
 except ImportError:
     print("警告：无法导入 ai_tools 模块")
     # 简单兜底，防止程序直接崩溃，但业务功能会失效
     class MockTaskManager:
         def get_task_list(self, filter_status=None): return []
         def save_ui_pending_tasks(self, data): pass
+        def update_task(self, task_id, content=None, status=None): return None
     ai_task_manager = MockTaskManager()
     def split_task(content): return [content]
     def save_ui_tasks(data, current_date=None): return None
     def generate_task_id(): return ""
+    def get_history_version(): return 0
 
 # 导入新的 TaskWidget 和 AutoResizingTextEdit（来自 ui_labels_time）
 try:
@@ -37,6 +40,11 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
 from PyQt5.QtCore import Qt, QSize, pyqtSignal, QTimer
 from PyQt5.QtGui import QColor, QPalette
 
+try:
+    from ui.ui_change_watcher import get_change_watcher, TOPIC_TASKS
+except ImportError:
+    from ui_change_watcher import get_change_watcher, TOPIC_TASKS
+
 # 同步管理器用于避免 AI 操作与 UI 冲突
 try:
     from core.sync_manager import get_sync_manager
@@ -82,13 +90,13 @@ class TaskListManager(QWidget):
         self.init_ui()
 
         # 加载任务
+        self.last_load_version = 0
+        # 编辑期间跳过的外部变更，在编辑结束时补做重载
+        self.reload_pending = False
         self.load_tasks_from_file()
 
-        # 定时刷新任务 (每 2 秒检查一次文件变动)
-        self.refresh_timer = QTimer(self)
-        self.refresh_timer.timeout.connect(self.check_and_reload)
-        self.refresh_timer.start(2000)
-        self.last_load_time = 0
+        # 任务数据变化时由通知服务触发刷新，空闲时不再轮询
+        get_change_watcher().subscribe(TOPIC_TASKS, lambda _topic: self.check_and_reload())
 
         # 定时检查历史归档 (每分钟检查一次)
         self.archive_timer = QTimer(self)
@@ -224,65 +232,106 @@ class TaskListManager(QWidget):
         self.shift_current_date(1)
 
     def load_tasks_from_file(self):
-        """从 ai_task_manager 加载当天任务（包含已完成与未完成）。"""
+        """
+        从 ai_task_manager 加载当天任务（包含已完成与未完成），与当前界面做差异同步：
+        数据未变化的顶层任务控件原样保留，只新增、删除或重建有变化的任务。
+        """
         # 获取全部任务数据，避免已完成任务在界面中消失
         all_tasks = ai_task_manager.get_task_list(filter_status='all')
-        
-        # 安全重置选中状态，防止访问已销毁的对象
-        self.selected_task = None
 
-        # 清空当前显示（保留最后的 stretch）
-        while self.task_layout.count() > 1:
-            item = self.task_layout.itemAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-            self.task_layout.removeItem(item)
-            
         # 只展示当前日期的任务
+        desired = []
         for task_data in all_tasks:
             task_date = self.normalize_date(task_data.get('scheduled_date'))
             if not task_date:
                 task_date = self.current_date
             if task_date != self.current_date:
                 continue
-            task_widget = self.build_task_widget_from_data(task_data)
-            if not task_widget:
+            if not task_data.get('content'):
                 continue
-            count = self.task_layout.count()
-            self.task_layout.insertWidget(count - 1, task_widget)
-            self.apply_task_style(task_widget)
+            desired.append(task_data)
+
+        existing = {}
+        for widget in self.get_top_level_tasks():
+            task_id = getattr(widget, "task_id", None)
+            if task_id and task_id not in existing:
+                existing[task_id] = widget
+
+        kept = set()
+        for index, task_data in enumerate(desired):
+            signature = self.build_task_signature(task_data)
+            widget = existing.get(task_data.get('id'))
+            if widget is not None and getattr(widget, "data_signature", None) == signature:
+                # 数据未变化，复用控件，必要时调整位置
+                if self.task_layout.indexOf(widget) != index:
+                    self.task_layout.removeWidget(widget)
+                    self.task_layout.insertWidget(index, widget)
+            else:
+                new_widget = self.build_task_widget_from_data(task_data)
+                if not new_widget:
+                    continue
+                new_widget.data_signature = signature
+                if widget is not None:
+                    self.discard_task_widget(widget)
+                self.task_layout.insertWidget(index, new_widget)
+                self.apply_task_style(new_widget)
+                widget = new_widget
+            kept.add(id(widget))
+
+        # 移除数据中已不存在的任务（包括界面上残留的无 ID 控件）
+        for widget in self.get_top_level_tasks():
+            if id(widget) not in kept:
+                self.discard_task_widget(widget)
 
         # 主动刷新布局与滚动区域，确保 UI 立即可见
         self.task_container.adjustSize()
         self.task_container.update()
         self.scroll_area.viewport().update()
 
-        self.last_load_time = os.path.getmtime(os.path.join(project_root, "history_data/history_data.json")) if os.path.exists(os.path.join(project_root, "history_data/history_data.json")) else 0
+        self.last_load_version = get_history_version()
+
+    @staticmethod
+    def build_task_signature(task_data):
+        """任务（含子任务）数据的签名，用于判断控件是否需要重建。"""
+        return json.dumps(task_data, ensure_ascii=False, sort_keys=True, default=str)
+
+    def discard_task_widget(self, widget):
+        """从列表中移除并销毁任务控件，若为选中项则清除选中状态。"""
+        if self.selected_task is not None:
+            try:
+                selected = self.selected_task
+                while selected is not None and selected is not widget:
+                    selected = selected.parent_task
+                if selected is widget:
+                    self.selected_task = None
+            except RuntimeError:
+                self.selected_task = None
+        self.task_layout.removeWidget(widget)
+        widget.deleteLater()
 
     def save_tasks_to_file(self):
         """将当前 UI 中的任务树保存到数据文件。"""
         if self.sync_manager.is_ai_processing():
             return
+        if self.reload_pending:
+            # 界面上的任务树已过期，整体保存会覆盖外部修改：只保存正在编辑的任务内容，然后重载
+            self.save_edited_task_and_reload()
+            return
         top_level_tasks = self.get_top_level_tasks()
         save_ui_tasks(top_level_tasks, current_date=self.current_date)
         
-        # 更新 last_load_time
-        history_path = os.path.join(project_root, "history_data/history_data.json")
-        if os.path.exists(history_path):
-             self.last_load_time = os.path.getmtime(history_path)
+        # 更新 last_load_version
+        self.last_load_version = get_history_version()
 
     def check_and_reload(self):
-        """检查文件是否被外部修改并刷新显示。"""
-        history_path = os.path.join(project_root, "history_data/history_data.json")
-        if not os.path.exists(history_path):
-            return
-            
-        mtime = os.path.getmtime(history_path)
-        if mtime > self.last_load_time:
-            # 文件有变动，重新加载
+        """检查任务数据是否被外部修改并刷新显示。"""
+        version = get_history_version()
+        if version != self.last_load_version:
+            # 数据有变动，重新加载
             try:
                 # 只有当选中任务处于编辑模式时才跳过重载，避免打断用户输入
                 if self.selected_task and not self.selected_task.text_edit.isReadOnly():
+                    self.reload_pending = True
                     return
             except RuntimeError:
                 # 如果 selected_task 已经销毁，视为没有选中，继续重载
@@ -291,8 +340,24 @@ class TaskListManager(QWidget):
                 self.selected_task = None
             
             # 否则（未选中，或选中但只是查看），都进行重载
+            self.reload_pending = False
             self.load_tasks_from_file()
 
+    def save_edited_task_and_reload(self):
+        """编辑结束时处理被跳过的重载：按 ID 单独保存选中任务的文本，再从数据文件重载。"""
+        self.reload_pending = False
+        widget = self.selected_task
+        try:
+            task_id = getattr(widget, "task_id", None) if widget is not None else None
+            content = widget.text_edit.toPlainText().strip() if task_id else None
+        except RuntimeError:
+            task_id, content = None, None
+        if task_id and content is not None:
+            result = ai_task_manager.update_task(task_id, content=content)
+            if isinstance(result, dict) and result.get("status") != "success":
+                print(f"保存编辑内容失败：{result.get('message')}")
+        self.load_tasks_from_file()
+
     def add_task(self):
         """添加一个新的任务框。"""
         if self.sync_manager.is_ai_processing():